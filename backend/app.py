@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import sqlite3
 import jwt
@@ -7,35 +8,144 @@ import secrets
 import json
 from datetime import datetime, timedelta
 import os
-from functools import wraps
+from collections import defaultdict, namedtuple
+from werkzeug.http import parse_etags
 import threading
 import glob
+import time
+import re
+import atexit
+from catalog_loader import CONTENT_COLUMNS, iter_parsed_files, read_catalog_items
+from suggest_index import SuggestIndex
+from category_rankings import CategoryRankings, page_etag
+from view_buffer import ViewBuffer
+from recommendation_cache import MemoryStore, SQLiteStore, RecommendationCache
+from db_pool import ReadPool, WriteQueue, PoolTimeout
+from content_cards import ContentCard, card_columns, card_cursor, fetch_cards, cards_json
+from trending import TrendingEngine
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics, cache_families
+from catalog_bundle import BUNDLE_COLUMNS, CatalogBundle, delta_body
+from url_templates import TemplateCache, TemplateRegistry, encode_episode, expand_episode, template_ids
+import json_backend
+
+class AppJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by json_backend (orjson when installed)"""
+    
+    # json_backend always writes UTF-8 rather than \u escapes
+    ensure_ascii = False
+    
+    def dumps(self, obj, **kwargs):
+        # jsonify() passes compact separators, or indent=2 in debug mode;
+        # anything other than compact output keeps the stdlib encoder
+        compact = tuple(kwargs.get('separators', (',', ':'))) == (',', ':')
+        if not compact or kwargs.get('indent') is not None or kwargs.get('ensure_ascii'):
+            return super().dumps(obj, **kwargs)
+        return json_backend.dumps(obj, default=kwargs.get('default', self.default),
+                                  sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return json_backend.loads(s)
+    
+    def response_bytes(self, obj):
+        """Body bytes of a compact jsonify() response"""
+        return json_backend.dumps(obj, default=self.default, newline=True)
 
 app = Flask(__name__)
+app.json = AppJSONProvider(app)
 # CORS enabled for all origins - frontend will be hosted separately
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Configuration
 BASE_DIR = os.path.dirname(__file__)
-DATABASE_PATH = os.path.join(BASE_DIR, 'streaming.db')
-JSON_DATA_PATH = os.path.join(BASE_DIR, 'jsons')
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, 'streaming.db'))
+JSON_DATA_PATH = os.getenv('JSON_DATA_PATH', os.path.join(BASE_DIR, 'jsons'))
+# Read-only connections shared by request threads (requests beyond this wait
+# up to DB_POOL_TIMEOUT seconds, then get a 503) and per-connection tuning;
+# all writes go through a single writer connection
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+# Seconds a cached detail response may be served before it is rebuilt; bounds
+# how stale watch_count gets when another worker process records views
+CONTENT_CACHE_TTL = int(os.getenv('CONTENT_CACHE_TTL', 300))
+# Seconds between full rebuilds of the in-memory category rankings; local
+# views are applied immediately, this picks up other workers' views
+CATEGORY_REFRESH_SECONDS = int(os.getenv('CATEGORY_REFRESH_SECONDS', 60))
+# Trending windows: name -> (hours, decay half-life in hours). Views are read
+# from user_watches right after local flushes and at least every
+# TRENDING_REFRESH_SECONDS for other workers' views.
+TRENDING_WINDOWS = {'24h': (24, 6), '7d': (168, 36)}
+TRENDING_DEFAULT_WINDOW = '24h'
+TRENDING_MAX_LIMIT = 100
+TRENDING_REFRESH_SECONDS = int(os.getenv('TRENDING_REFRESH_SECONDS', 30))
+# track-view writes are buffered and flushed every VIEW_FLUSH_INTERVAL_MS or
+# after VIEW_FLUSH_MAX_EVENTS views, whichever comes first (0 = write inline)
+VIEW_FLUSH_INTERVAL_MS = int(os.getenv('VIEW_FLUSH_INTERVAL_MS', 500))
+VIEW_FLUSH_MAX_EVENTS = int(os.getenv('VIEW_FLUSH_MAX_EVENTS', 200))
+# Views that cannot be written even one at a time are kept here and queued
+# again on the next start
+VIEW_QUARANTINE_PATH = os.getenv('VIEW_QUARANTINE_PATH', os.path.join(BASE_DIR, 'view_quarantine.jsonl'))
+# Cache-Control max-age (seconds) for read-only content endpoints
+TRENDING_MAX_AGE = 60
+CATEGORY_MAX_AGE = 60
+DETAIL_MAX_AGE = 300
+WEEKLY_MAX_AGE = 300
+HERO_MAX_AGE = 300
+BUNDLE_MAX_AGE = 300
+# Search ranking: bm25 column weights (title, description, cast, director,
+# genres) and how much a saturating watch_count boost can lift a result
+SEARCH_BM25_WEIGHTS = (10.0, 1.0, 3.0, 3.0, 2.0)
+SEARCH_POPULARITY_WEIGHT = 2.0
+SEARCH_MAX_LIMIT = 100
+# Personalized recommendations: titles returned, recent watches considered and
+# how much each older watch counts relative to the next newer one
+RECOMMENDATION_LIMIT = 20
+RECOMMENDATION_HISTORY = 20
+RECOMMENDATION_DECAY = 0.9
+# Per-user recommendation cache: 'memory' (per process) or 'sqlite' (shared by
+# all workers through a cache database kept apart from DATABASE_PATH, so cache
+# writes never contend with the database writer)
+RECOMMENDATION_CACHE_STORE = os.getenv('RECOMMENDATION_CACHE_STORE', 'memory')
+RECOMMENDATION_CACHE_PATH = os.getenv('RECOMMENDATION_CACHE_PATH',
+                                      os.path.join(BASE_DIR, 'recommendation_cache.db'))
+RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', 600))
+RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 10000))
+SUGGEST_DEFAULT_LIMIT = int(os.getenv('SUGGEST_DEFAULT_LIMIT', 8))
+SUGGEST_MAX_LIMIT = 20
 JWT_SECRET = os.getenv('JWT_SECRET', 'kabhinakabhi892828u8u8uhhjsnjnuwhsuhsu2hiuwhkjb')
 
-# Thread-local storage for database connections
-local = threading.local()
+# Request, SQLite and cache metrics served by /api/metrics
+metrics = Metrics()
+
+def connect_db(readonly=False):
+    """Open a tuned connection for the read pool or (readonly=False) the writer"""
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, factory=metrics.connection_class)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size={-DB_CACHE_SIZE_KB}')
+    if readonly:
+        conn.execute('PRAGMA query_only=ON')
+    else:
+        conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+db_pool = ReadPool(lambda: connect_db(readonly=True), DB_POOL_SIZE, DB_POOL_TIMEOUT)
+db_writer = WriteQueue(connect_db)
+atexit.register(db_writer.stop)
 
 def get_db():
-    """Get database connection for current thread"""
-    if not hasattr(local, 'db'):
-        local.db = sqlite3.connect(DATABASE_PATH)
-        local.db.row_factory = sqlite3.Row
-    return local.db
+    """Read-only connection borrowed by the current thread (see db_pool.reading)"""
+    return db_pool.current()
 
 def init_database():
     """Initialize the database with required tables"""
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
+    # Readers keep serving while the writer commits
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -113,6 +223,162 @@ def init_database():
     ''')
     
     # Create indexes
+    # Catalog sync manifest: per-file fingerprints and per-item row hashes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_files (
+            path TEXT PRIMARY KEY,
+            mtime REAL,
+            size INTEGER,
+            content_hash TEXT,
+            synced_at TIMESTAMP
+        )
+    ''')
+    
+    # One row per file providing an id; ids listed in several files keep a
+    # row for each. Databases from before that had one row per id and are
+    # rebuilt by the forced re-ingest of the next loader version.
+    cursor.execute("SELECT COUNT(*) FROM pragma_table_info('sync_items') WHERE pk > 0")
+    if cursor.fetchone()[0] == 1:
+        cursor.execute('DROP TABLE sync_items')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_items (
+            content_id TEXT NOT NULL,
+            source_file TEXT NOT NULL,
+            item_hash TEXT NOT NULL,
+            PRIMARY KEY (content_id, source_file)
+        ) WITHOUT ROWID
+    ''')
+    
+    # The SQLite recommendation cache used to live in this file; it now has
+    # a database of its own (RECOMMENDATION_CACHE_PATH)
+    cursor.execute('DROP TABLE IF EXISTS recommendation_cache')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    
+    # Version counters behind the ETags of read-only endpoints; kept in the
+    # database so every worker process sees the same values
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Catalog version at which each title last changed or was removed;
+    # /api/catalog/bundle?since=<version> deltas are read from here
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_changes (
+            content_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            removed INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_catalog_changes_version ON catalog_changes(version)')
+    
+    # Full-text search index over the catalog, stored as an external-content
+    # index on the content table and maintained by the catalog loader.
+    # Search falls back to LIKE when SQLite is built without FTS5.
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+                title, description, "cast", director, genres,
+                content = 'content', content_rowid = 'rowid',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 unavailable, search will use LIKE: {e}")
+    
+    # Normalized genre/cast/director lookups maintained by the catalog loader;
+    # the primary keys double as the browse indexes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_genres (
+            genre TEXT NOT NULL COLLATE NOCASE,
+            content_id TEXT NOT NULL,
+            PRIMARY KEY (genre, content_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_cast (
+            name TEXT NOT NULL COLLATE NOCASE,
+            content_id TEXT NOT NULL,
+            position INTEGER DEFAULT 0,
+            PRIMARY KEY (name, content_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_directors (
+            name TEXT NOT NULL COLLATE NOCASE,
+            content_id TEXT NOT NULL,
+            PRIMARY KEY (name, content_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # One row per episode, in catalog order, so episode lists can be paged
+    # without loading a per-title blob; data is the episode JSON with its
+    # links template-encoded (see url_templates)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_episodes (
+            content_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            episode_number INTEGER,
+            title TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (content_id, position)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Streaming/download link templates shared by content_episodes rows.
+    # Rows are only ever added, so ids stay valid for cached lookups.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS url_templates (
+            id INTEGER PRIMARY KEY,
+            template TEXT NOT NULL UNIQUE
+        )
+    ''')
+    
+    # Per-user watchlist and watch history, one row per title. These replace
+    # the users.watchlist / users.history JSON columns; rowid order is the
+    # order entries were first added.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_watchlist (
+            user_id INTEGER NOT NULL,
+            content_id TEXT NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, content_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_history (
+            user_id INTEGER NOT NULL,
+            content_id TEXT NOT NULL,
+            progress INTEGER DEFAULT 0,
+            timestamp TEXT,
+            PRIMARY KEY (user_id, content_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Item-to-item neighbours written by the offline job in recommender.py:
+    # a JSON list of [neighbor_id, score] pairs per title, best first
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS content_neighbors (
+            content_id TEXT PRIMARY KEY,
+            neighbors TEXT NOT NULL
+        )
+    ''')
+    
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_title ON content(title)')
@@ -121,67 +387,527 @@ def init_database():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_industry ON content(industry)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_watches_user_id ON user_watches(user_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_watches_content_id ON user_watches(content_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_watches_watched_at ON user_watches(watched_at)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_weekly_assignments_week_day ON weekly_assignments(week, day)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_hero_carousel_active ON hero_carousel(is_active)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_genres_content_id ON content_genres(content_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_cast_content_id ON content_cast(content_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_directors_content_id ON content_directors(content_id)')
+    
+    migrate_user_lists(cursor)
     
     conn.commit()
     conn.close()
 
-def sync_content_from_json():
-    """Sync content from JSON files to database"""
+def migrate_user_lists(cursor):
+    """One-shot copy of the users.watchlist / users.history blobs into their tables"""
+    if get_sync_meta(cursor, 'user_lists_migrated'):
+        return
+    
+    cursor.execute("SELECT id, watchlist, history FROM users")
+    users = cursor.fetchall()
+    for user_id, watchlist, history in users:
+        watchlist = parse_json_field(watchlist, [])
+        cursor.executemany('''
+            INSERT OR IGNORE INTO user_watchlist (user_id, content_id) VALUES (?, ?)
+        ''', [(user_id, content_id) for content_id in watchlist if content_id])
+        
+        history = parse_json_field(history, [])
+        cursor.executemany(HISTORY_UPSERT_SQL, [
+            (user_id, item.get('contentId'), item.get('progress', 0), item.get('timestamp'))
+            for item in history
+            if isinstance(item, dict) and item.get('contentId')
+        ])
+    
+    set_sync_meta(cursor, 'user_lists_migrated', 1)
+    if users:
+        print(f"✅ Migrated watchlists and history of {len(users)} users")
+
+# Keep the last HISTORY_LIMIT titles per user
+HISTORY_LIMIT = 100
+
+HISTORY_UPSERT_SQL = '''
+    INSERT INTO user_history (user_id, content_id, progress, timestamp)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, content_id) DO UPDATE SET
+        progress = excluded.progress, timestamp = excluded.timestamp
+'''
+
+HISTORY_TRIM_SQL = '''
+    DELETE FROM user_history
+    WHERE user_id = ? AND rowid < (
+        SELECT rowid FROM user_history WHERE user_id = ?
+        ORDER BY rowid DESC LIMIT 1 OFFSET ?
+    )
+'''
+
+# Bump whenever the loader starts deriving new data from the catalog so that
+# existing databases get a full re-ingest on their next boot.
+CATALOG_LOADER_VERSION = 8
+
+# Rows per executemany() call during catalog ingestion
+SYNC_BATCH_SIZE = 1000
+
+# Catalog parser processes; files are parsed in parallel only when there is
+# enough changed JSON to amortize starting the pool
+SYNC_WORKERS = int(os.getenv('SYNC_WORKERS', os.cpu_count() or 1))
+SYNC_PARALLEL_MIN_BYTES = int(os.getenv('SYNC_PARALLEL_MIN_BYTES', 16 * 1024 * 1024))
+
+CONTENT_UPSERT_SQL = '''
+    INSERT INTO content (%s, updated_at)
+    VALUES (%s, ?)
+    ON CONFLICT(id) DO UPDATE SET %s, updated_at = excluded.updated_at
+''' % (
+    ', '.join(CONTENT_COLUMNS),
+    ', '.join('?' for _ in CONTENT_COLUMNS),
+    ', '.join(f'{col} = excluded.{col}' for col in CONTENT_COLUMNS[1:])
+)
+
+SYNC_ITEM_INSERT_SQL = 'INSERT INTO sync_items (content_id, source_file, item_hash) VALUES (?, ?, ?)'
+
+def get_sync_meta(cursor, key, default=None):
+    """Read a value from the sync metadata table"""
+    cursor.execute('SELECT value FROM sync_meta WHERE key = ?', (key,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+def set_sync_meta(cursor, key, value):
+    """Write a value to the sync metadata table"""
+    cursor.execute('''
+        INSERT INTO sync_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    ''', (key, str(value)))
+
+def bump_cache_version(cursor, name):
+    """Increment a version counter inside the caller's transaction"""
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''', (name,))
+
+def get_cache_versions():
+    """Current catalog/views/assignments version counters"""
+    cursor = get_db().cursor()
+    cursor.execute('SELECT name, version FROM cache_versions')
+    versions = {'catalog': 0, 'views': 0, 'assignments': 0}
+    versions.update((row[0], row[1]) for row in cursor.fetchall())
+    return versions
+
+CATALOG_CHANGE_SQL = '''
+    INSERT INTO catalog_changes (content_id, version, removed)
+    VALUES (?, (SELECT version FROM cache_versions WHERE name = 'catalog'), ?)
+    ON CONFLICT(content_id) DO UPDATE SET version = excluded.version, removed = excluded.removed
+'''
+
+def record_catalog_changes(cursor, changed_ids, removed_ids):
+    """Stamp changed/removed titles with the (already bumped) catalog version"""
+    cursor.executemany(CATALOG_CHANGE_SQL, [(content_id, 0) for content_id in changed_ids])
+    cursor.executemany(CATALOG_CHANGE_SQL, [(content_id, 1) for content_id in removed_ids])
+
+def remove_synced_items(cursor, content_ids):
+    """Delete catalog items that disappeared from their source file"""
+    fts = has_fts_index(cursor)
+    for content_id in content_ids:
+        if fts:
+            cursor.execute(FTS_DELETE_SQL, (content_id,))
+        for table in RELATION_TABLES:
+            cursor.execute(f'DELETE FROM {table} WHERE content_id = ?', (content_id,))
+        cursor.execute('DELETE FROM content WHERE id = ?', (content_id,))
+        cursor.execute('DELETE FROM sync_items WHERE content_id = ?', (content_id,))
+    prune_neighbors(cursor, content_ids)
+
+def prune_neighbors(cursor, content_ids):
+    """Drop removed titles from content_neighbors, as rows and as list entries"""
+    removed = set(content_ids)
+    if not removed:
+        return
+    cursor.executemany('DELETE FROM content_neighbors WHERE content_id = ?',
+                       [(content_id,) for content_id in removed])
+    
+    # Only rows that list a removed title are parsed and rewritten
+    cursor.execute('''
+        SELECT content_id, neighbors FROM content_neighbors n
+        WHERE EXISTS (SELECT 1 FROM json_each(n.neighbors) e
+                      WHERE json_extract(e.value, '$[0]') IN (SELECT value FROM json_each(?)))
+    ''', (json.dumps(sorted(removed)),))
+    rewrites = [(json.dumps([pair for pair in parse_json_field(neighbors, []) if pair[0] not in removed]),
+                 content_id)
+                for content_id, neighbors in cursor.fetchall()]
+    cursor.executemany('UPDATE content_neighbors SET neighbors = ? WHERE content_id = ?', rewrites)
+
+FTS_DELETE_SQL = 'DELETE FROM content_fts WHERE rowid = (SELECT rowid FROM content WHERE id = ?)'
+
+FTS_INSERT_SQL = '''
+    INSERT INTO content_fts (rowid, title, description, "cast", director, genres)
+    SELECT rowid, title, description, "cast", director, genres FROM content WHERE id = ?
+'''
+
+RELATION_TABLES = ('content_genres', 'content_cast', 'content_directors', 'content_episodes')
+
+# Lazily detected: None until checked, then True/False
+fts_state = {'available': None}
+
+def has_fts_index(cursor):
+    """Whether the content_fts table exists in this database"""
+    if fts_state['available'] is None:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'content_fts'")
+        fts_state['available'] = cursor.fetchone() is not None
+    return fts_state['available']
+
+def flush_sync_batch(cursor, content_rows, relations, template_id):
+    """Write a batch of changed catalog items with executemany.
+
+    relations maps content id to its (genres, cast, directors, episodes)
+    rows from content_relations_from_item; episode links are encoded with
+    template_id (a TemplateRegistry). The search index and join tables are
+    updated row by row; old search entries must be removed before the
+    upsert since the external-content index reads the old column values
+    from the content table. Full re-ingests use stage_sync_batch instead.
+    """
+    if content_rows:
+        # A batch can hold the same id twice when it is duplicated across files
+        ids = [(content_id,) for content_id in relations]
+        index_fts = has_fts_index(cursor)
+        if index_fts:
+            cursor.executemany(FTS_DELETE_SQL, ids)
+        cursor.executemany(CONTENT_UPSERT_SQL, content_rows)
+        if index_fts:
+            cursor.executemany(FTS_INSERT_SQL, ids)
+        
+        for table in RELATION_TABLES:
+            cursor.executemany(f'DELETE FROM {table} WHERE content_id = ?', ids)
+        genres, cast, directors, episodes = [], [], [], []
+        for content_id, (genre_names, cast_names, director_names, episode_rows) in relations.items():
+            genres.extend((genre, content_id) for genre in genre_names)
+            cast.extend((name, content_id, position) for position, name in enumerate(cast_names))
+            directors.extend((name, content_id) for name in director_names)
+            episodes.extend(
+                (content_id, position, season, number, title,
+                 json_backend.dumps_column(encode_episode(episode, template_id)))
+                for position, season, number, title, episode in episode_rows)
+        cursor.executemany('INSERT OR IGNORE INTO content_genres (genre, content_id) VALUES (?, ?)', genres)
+        cursor.executemany('INSERT OR IGNORE INTO content_cast (name, content_id, position) VALUES (?, ?, ?)', cast)
+        cursor.executemany('INSERT OR IGNORE INTO content_directors (name, content_id) VALUES (?, ?)', directors)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO content_episodes
+                (content_id, position, season, episode_number, title, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', episodes)
+        
+        content_rows.clear()
+        relations.clear()
+
+# Full re-ingests stage each title's names as JSON arrays (the last copy of
+# a duplicated id replaces earlier ones) and fill the name tables from the
+# stage with one INSERT ... SELECT each once every file is read
+SYNC_STAGE_SQL = '''
+    CREATE TEMP TABLE IF NOT EXISTS sync_stage (
+        content_id TEXT PRIMARY KEY,
+        genres TEXT NOT NULL,
+        "cast" TEXT NOT NULL,
+        directors TEXT NOT NULL
+    )
+'''
+
+RELATION_REBUILD_SQL = (
+    '''
+    INSERT OR IGNORE INTO content_genres (genre, content_id)
+    SELECT j.value, s.content_id FROM sync_stage s, json_each(s.genres) j
+    ''',
+    '''
+    INSERT OR IGNORE INTO content_cast (name, content_id, position)
+    SELECT j.value, s.content_id, j.key FROM sync_stage s, json_each(s."cast") j
+    ''',
+    '''
+    INSERT OR IGNORE INTO content_directors (name, content_id)
+    SELECT j.value, s.content_id FROM sync_stage s, json_each(s.directors) j
+    ''',
+)
+
+def stage_sync_batch(cursor, content_rows, relations, template_id):
+    """Upsert a batch of content rows and stage their relations (full re-ingest).
+
+    Episodes are written straight away: unpacking staged episode arrays
+    with json_extract is slower than binding the rows. An id seen in an
+    earlier batch drops the episodes that batch wrote.
+    """
+    if content_rows:
+        ids = [(content_id,) for content_id in relations]
+        cursor.executemany(CONTENT_UPSERT_SQL, content_rows)
+        dumps = json_backend.dumps_column
+        cursor.executemany('''
+            INSERT OR REPLACE INTO sync_stage (content_id, genres, "cast", directors)
+            VALUES (?, ?, ?, ?)
+        ''', [(content_id, dumps(genre_names), dumps(cast_names), dumps(director_names))
+              for content_id, (genre_names, cast_names, director_names, _) in relations.items()])
+        
+        cursor.executemany('DELETE FROM content_episodes WHERE content_id = ?', ids)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO content_episodes
+                (content_id, position, season, episode_number, title, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (content_id, position, season, number, title, dumps(encode_episode(episode, template_id)))
+            for content_id, (_, _, _, episode_rows) in relations.items()
+            for position, season, number, title, episode in episode_rows
+        ])
+        
+        content_rows.clear()
+        relations.clear()
+
+def rebuild_relations(cursor):
+    """Fill the (cleared) name tables and the search index after staged batches"""
+    for sql in RELATION_REBUILD_SQL:
+        cursor.execute(sql)
+    cursor.execute('DELETE FROM sync_stage')
+    if has_fts_index(cursor):
+        # One pass over the content table beats per-row index updates
+        cursor.execute("INSERT INTO content_fts (content_fts) VALUES ('rebuild')")
+
+def set_bulk_load_pragmas(db):
+    """Switch the connection to WAL with relaxed fsyncs and a large page cache.
+
+    Returns the previous synchronous/cache_size values so they can be restored.
+    """
+    previous = (db.execute('PRAGMA synchronous').fetchone()[0],
+                db.execute('PRAGMA cache_size').fetchone()[0])
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute('PRAGMA cache_size=-65536')
+    return previous
+
+def restore_pragmas(db, previous):
+    """Restore pragmas saved by set_bulk_load_pragmas"""
+    synchronous, cache_size = previous
+    db.execute(f'PRAGMA synchronous={int(synchronous)}')
+    db.execute(f'PRAGMA cache_size={int(cache_size)}')
+
+# Outcome of the most recent sync in this process, for /api/metrics
+last_sync = {'finished_at': None, 'duration': None, 'synced': 0, 'removed': 0}
+
+def sync_content_from_json(force=False):
+    """Incrementally sync content from JSON files to database.
+
+    Files whose mtime/size or content hash match the manifest are skipped
+    without parsing, and unchanged items inside changed files are skipped by
+    their row hash. Changed files are parsed (in a process pool when there
+    is enough of them) as a single job on the database writer, so request
+    writes queue behind it. Changed items are upserted so watch_count and
+    created_at survive re-syncs, and all writes are batched with
+    executemany inside a single transaction.
+    """
     print("🔄 Syncing content from JSON files...")
+    started = time.perf_counter()
     
-    db = get_db()
+    stats, changed_ids, removed = db_writer.run(write_catalog_sync, force)
+    
+    elapsed = time.perf_counter() - started
+    
+    content_cache.invalidate(changed_ids)
+    content_cache.invalidate(removed)
+    with db_pool.reading():
+        stats['cached'] = warm_content_cache()
+        if changed_ids or removed or not len(suggest_index):
+            rebuild_suggest_index()
+        rebuild_category_rankings()
+        catalog_bundle_snapshot()
+        refresh_trending(wait=True)
+    
+    stats['duration_ms'] = round(elapsed * 1000, 1)
+    stats['rows_per_sec'] = round(stats['synced'] / elapsed) if elapsed > 0 else 0
+    last_sync.update(finished_at=time.time(), duration=elapsed, synced=stats['synced'],
+                     removed=stats['removed'])
+    print(f"✅ Synced {stats['synced']} content items to database "
+          f"({stats['unchanged']} unchanged, {stats['removed']} removed, "
+          f"{stats['skipped_files']}/{stats['files']} files skipped, {stats['workers']} parser(s)) "
+          f"in {stats['duration_ms']}ms ({stats['rows_per_sec']} rows/sec), "
+          f"{stats['cached']} detail responses cached")
+    return stats
+
+def write_catalog_sync(db, force):
+    """Writer job for sync_content_from_json; returns (stats, changed_ids, removed).
+    
+    When an id is listed in several files the last file in sorted order
+    wins, as in a full load. If the winning file drops the id or stops
+    being the winner, the row is re-read from the file that now wins; the
+    id is removed only once no file provides it.
+    """
+    previous_pragmas = set_bulk_load_pragmas(db)
     cursor = db.cursor()
     
+    if get_sync_meta(cursor, 'loader_version') != str(CATALOG_LOADER_VERSION):
+        force = True
+    
+    cursor.execute('SELECT path, mtime, size, content_hash FROM sync_files')
+    known_files = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+    # content id -> {source file: item hash} for every file providing it
+    providers = defaultdict(dict)
+    cursor.execute('SELECT content_id, source_file, item_hash FROM sync_items')
+    for content_id, source_file, item_hash in cursor.fetchall():
+        providers[content_id][source_file] = item_hash
+    # File each stored content row was written from, and that row's hash
+    row_source = {content_id: max(files) for content_id, files in providers.items()}
+    stored_hash = {content_id: providers[content_id][source] for content_id, source in row_source.items()}
+    
     # Load all JSON files from jsons folder
-    json_files = glob.glob(os.path.join(JSON_DATA_PATH, '*.json'))
+    json_files = sorted(glob.glob(os.path.join(JSON_DATA_PATH, '*.json')))
+    current_files = {os.path.basename(path) for path in json_files}
+    synced_at = datetime.utcnow().isoformat()
     
-    total_synced = 0
+    stats = {'files': len(json_files), 'skipped_files': 0, 'synced': 0,
+             'unchanged': 0, 'removed': 0, 'missing_id': 0}
+    
+    # Files whose mtime/size changed (or everything when forced) get parsed
+    jobs = []
     for json_file in json_files:
+        name = os.path.basename(json_file)
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # Handle both array and object formats
-                content_list = data if isinstance(data, list) else data.get('movies', [])
-                
-                for item in content_list:
-                    try:
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO content 
-                            (id, title, year, image, description, genres, cast, director, 
-                             rating, duration, type, industry, episodes, urls, download_links, updated_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            item.get('id'),
-                            item.get('title'),
-                            item.get('year'),
-                            item.get('image'),
-                            item.get('description'),
-                            json.dumps(item.get('genres', [])),
-                            json.dumps(item.get('cast', [])),
-                            item.get('director'),
-                            item.get('rating'),
-                            item.get('duration'),
-                            item.get('type', 'movie'),
-                            item.get('industry', 'Unknown'),
-                            json.dumps(item.get('episodes', [])),
-                            json.dumps(item.get('urls', {})),
-                            json.dumps(item.get('download_links', {})),
-                            datetime.utcnow().isoformat()
-                        ))
-                        total_synced += 1
-                    except Exception as e:
-                        print(f"Error syncing item {item.get('id', 'unknown')}: {e}")
-                        continue
-                        
-        except Exception as e:
+            st = os.stat(json_file)
+        except OSError as e:
             print(f"Error loading JSON file {json_file}: {e}")
             continue
+        known = known_files.get(name)
+        if not force and known and known[0] == st.st_mtime and known[1] == st.st_size:
+            stats['skipped_files'] += 1
+            continue
+        jobs.append((json_file, name, st, None if force or not known else known[2]))
+    
+    changed_bytes = sum(st.st_size for _, _, st, _ in jobs)
+    workers = min(SYNC_WORKERS, len(jobs)) if changed_bytes >= SYNC_PARALLEL_MIN_BYTES else 1
+    job_names = {name for _, name, _, _ in jobs}
+    
+    content_rows = []
+    relations = {}
+    # Per job: {content id: item hash} for the items the file now lists
+    seen_items = [{} for _ in jobs]
+    parsed = [False] * len(jobs)
+    # File index that last wrote each id this run - later files win on duplicates
+    written_by = {}
+    changed_ids = set()
+    # Full re-ingests stage relations and rebuild the join tables at the end
+    flush_batch = stage_sync_batch if force else flush_sync_batch
+    
+    cursor.execute('BEGIN')
+    try:
+        templates = TemplateRegistry(cursor)
+        if force:
+            # Every row is rewritten - clearing beats per-row deletes
+            for table in RELATION_TABLES:
+                cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(SYNC_STAGE_SQL)
+            cursor.execute('DELETE FROM sync_stage')
+        
+        messages = iter_parsed_files([(path, known_hash) for path, _, _, known_hash in jobs], workers)
+        for index, kind, payload in messages:
+            json_file, name, st, _ = jobs[index]
+            
+            if kind == 'rows':
+                seen = seen_items[index]
+                for row, item_hash, item_relations in payload:
+                    content_id = row[0]
+                    seen[content_id] = item_hash
+                    if written_by.get(content_id, -1) > index:
+                        continue
+                    if any(source > name and source in current_files and source not in job_names
+                           for source in providers.get(content_id, ())):
+                        # A later file that is not being re-parsed still wins
+                        continue
+                    written_by[content_id] = index
+                    if (not force and row_source.get(content_id) == name
+                            and providers[content_id].get(name) == item_hash):
+                        stats['unchanged'] += 1
+                        continue
+                    
+                    content_rows.append(row + (synced_at,))
+                    relations[content_id] = item_relations
+                    row_source[content_id] = name
+                    changed_ids.add(content_id)
+                    stats['synced'] += 1
+                if len(content_rows) >= SYNC_BATCH_SIZE:
+                    flush_batch(cursor, content_rows, relations, templates)
+            
+            elif kind == 'done':
+                if payload['unchanged']:
+                    # Touched but not modified - just refresh the fingerprint
+                    cursor.execute('UPDATE sync_files SET mtime = ?, size = ? WHERE path = ?',
+                                   (st.st_mtime, st.st_size, name))
+                    stats['skipped_files'] += 1
+                    continue
+                
+                parsed[index] = True
+                stats['missing_id'] += payload['missing_id']
+                cursor.execute('''
+                    INSERT INTO sync_files (path, mtime, size, content_hash, synced_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size,
+                        content_hash = excluded.content_hash, synced_at = excluded.synced_at
+                ''', (name, st.st_mtime, st.st_size, payload['content_hash'], synced_at))
+            
+            else:
+                print(f"Error loading JSON file {json_file}: {payload}")
+        
+        flush_batch(cursor, content_rows, relations, templates)
+        
+        # Re-parsed files replace their manifest entries; files deleted from
+        # the jsons folder drop theirs
+        reparsed = {jobs[i][1]: seen_items[i] for i in range(len(jobs)) if parsed[i]}
+        dropped_files = set()
+        for files in providers.values():
+            for source in [source for source in files if source in reparsed or source not in current_files]:
+                del files[source]
+                dropped_files.add(source)
+        for source, items in reparsed.items():
+            for content_id, item_hash in items.items():
+                providers[content_id][source] = item_hash
+        
+        # Rows last written from a file that no longer wins are re-read from
+        # the one that does
+        stale = defaultdict(set)
+        for content_id, files in providers.items():
+            if files and row_source.get(content_id) != max(files):
+                stale[max(files)].add(content_id)
+        for source, content_ids in stale.items():
+            items = read_catalog_items(os.path.join(JSON_DATA_PATH, source), content_ids)
+            for content_id, (row, item_hash, item_relations) in items.items():
+                content_rows.append(row + (synced_at,))
+                relations[content_id] = item_relations
+                changed_ids.add(content_id)
+                stats['synced'] += 1
+                if len(content_rows) >= SYNC_BATCH_SIZE:
+                    flush_batch(cursor, content_rows, relations, templates)
+        flush_batch(cursor, content_rows, relations, templates)
+        
+        removed = [content_id for content_id, files in providers.items() if not files]
+        remove_synced_items(cursor, removed)
+        stats['removed'] = len(removed)
+        for source in dropped_files | set(reparsed):
+            cursor.execute('DELETE FROM sync_items WHERE source_file = ?', (source,))
+        cursor.executemany(SYNC_ITEM_INSERT_SQL, [
+            (content_id, source, item_hash)
+            for source, items in reparsed.items() for content_id, item_hash in items.items()])
+        for name in set(known_files) - current_files:
+            cursor.execute('DELETE FROM sync_files WHERE path = ?', (name,))
+        
+        if force:
+            rebuild_relations(cursor)
+        if changed_ids or removed:
+            bump_cache_version(cursor, 'catalog')
+            # Bundle deltas only list rows whose content differs; ids that
+            # were merely rewritten (a forced sync, a re-resolved winner with
+            # the same data) keep their previous stamp
+            modified = [content_id for content_id in changed_ids
+                        if stored_hash.get(content_id) != providers[content_id][max(providers[content_id])]]
+            record_catalog_changes(cursor, modified, removed)
+        set_sync_meta(cursor, 'loader_version', CATALOG_LOADER_VERSION)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        restore_pragmas(db, previous_pragmas)
     
-    db.commit()
-    print(f"✅ Synced {total_synced} content items to database")
+    stats['workers'] = workers
+    return stats, changed_ids, removed
 
 def hash_pin(pin):
     """Hash a PIN for secure storage"""
@@ -212,24 +938,17 @@ def verify_jwt(token):
     except jwt.InvalidTokenError:
         raise Exception("Invalid token")
 
-def auth_required(f):
-    """Decorator for protected routes"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'No token provided'}), 401
-        
-        try:
-            token = auth_header.split(' ')[1]
-            payload = verify_jwt(token)
-            request.user_id = payload['userId']
-            request.username = payload['username']
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({'error': str(e)}), 401
+def authenticate(auth_header):
+    """Return (user_id, username) for a Bearer Authorization header"""
+    if not auth_header or not auth_header.startswith('Bearer '):
+        raise ApiError(401, 'No token provided')
     
-    return decorated_function
+    try:
+        token = auth_header.split(' ')[1]
+        payload = verify_jwt(token)
+        return payload['userId'], payload['username']
+    except Exception as e:
+        raise ApiError(401, str(e))
 
 def dict_from_row(row):
     """Convert sqlite3.Row to dict"""
@@ -240,443 +959,1021 @@ def parse_json_field(value, default=None):
     if not value:
         return default or []
     try:
-        return json.loads(value)
+        return json_backend.loads(value)
     except json.JSONDecodeError:
         return default or []
 
-# ============= API ROUTES =============
-# Note: Frontend will be hosted separately and call these APIs
+def json_response_bytes(obj):
+    """Serialize obj exactly as jsonify() would, for caching response bodies"""
+    return app.json.response_bytes(obj)
 
-# Auth Routes
-@app.route('/api/auth/signup', methods=['POST'])
-def signup():
-    """User registration"""
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        username = data.get('username')
-        pin = data.get('pin')
-        profile_image = data.get('profile_image', '')
-        
-        if not email or not username or not pin:
-            return jsonify({'error': 'Email, username and PIN required'}), 400
-        
-        db = get_db()
-        cursor = db.cursor()
-        
-        cursor.execute('SELECT id FROM users WHERE email = ? OR username = ?', (email, username))
-        if cursor.fetchone():
-            return jsonify({'error': 'User already exists'}), 409
-        
-        hashed_pin = hash_pin(pin)
-        cursor.execute('''
-            INSERT INTO users (email, username, pin, profile_image)
-            VALUES (?, ?, ?, ?)
-        ''', (email, username, hashed_pin, profile_image))
-        
-        db.commit()
-        return jsonify({'success': True}), 201
-        
-    except Exception as e:
-        app.logger.error(f"Signup error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+# Card projection column lists (see content_cards)
+CARD_SELECT = card_columns()
+CARD_SELECT_ALIASED = card_columns('c')
 
-@app.route('/api/auth/login', methods=['POST'])
-def login():
-    """User login"""
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        pin = data.get('pin')
-        
-        if not email or not pin:
-            return jsonify({'error': 'Email and PIN required'}), 400
-        
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
-        
-        if not user or not verify_pin(user['pin'], pin):
-            return jsonify({'error': 'Invalid credentials'}), 401
-        
-        user_dict = dict_from_row(user)
-        token = generate_jwt({
-            'userId': str(user_dict['id']),
-            'username': user_dict['username']
-        })
-        
-        return jsonify({
-            'user': {
-                'id': str(user_dict['id']),
-                'username': user_dict['username'],
-                'email': user_dict['email'],
-                'profile_image': user_dict.get('profile_image', '')
-            },
-            'token': token
-        }), 200
-        
-    except Exception as e:
-        app.logger.error(f"Login error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+# Detail columns: everything but the episodes blob, which is paged from
+# content_episodes by /api/content/<id>/episodes. Quoted, as cast is a
+# keyword in SQLite expressions
+DETAIL_SELECT = ', '.join(
+    f'"{column}"' for column in CONTENT_COLUMNS + ('watch_count', 'created_at', 'updated_at')
+    if column != 'episodes')
 
-@app.route('/api/auth/verify', methods=['GET'])
-@auth_required
-def verify_auth():
-    """Verify authentication"""
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        user_dict = dict_from_row(user)
-        return jsonify({
-            'id': str(user_dict['id']),
-            'username': user_dict['username'],
-            'email': user_dict['email']
-        }), 200
-        
-    except Exception as e:
-        app.logger.error(f"Auth verification error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+def episode_season_counts(cursor, content_id=None):
+    """{content_id: [{season, episodes}]} from content_episodes, for one id or all"""
+    query = 'SELECT content_id, season, COUNT(*) FROM content_episodes'
+    params = ()
+    if content_id is not None:
+        query += ' WHERE content_id = ?'
+        params = (content_id,)
+    cursor.execute(query + ' GROUP BY content_id, season ORDER BY content_id, season', params)
+    
+    seasons = defaultdict(list)
+    for row_id, season, count in cursor.fetchall():
+        seasons[row_id].append({'season': season, 'episodes': count})
+    return seasons
 
-# Content Routes
-@app.route('/api/content/trending', methods=['GET'])
-def get_trending():
-    """Get trending content IDs based on watch count"""
+def content_detail_from_row(row, seasons):
+    """Decode a content row into the detail response shape.
+    
+    seasons is the title's list from episode_season_counts(); episodes
+    themselves are not included.
+    """
+    item = dict_from_row(row)
+    item['genres'] = parse_json_field(item['genres'], [])
+    item['cast'] = parse_json_field(item['cast'], [])
+    item['urls'] = parse_json_field(item['urls'], {})
+    item['download_links'] = parse_json_field(item['download_links'], {})
+    item['seasons'] = seasons
+    item['episode_count'] = sum(season['episodes'] for season in seasons)
+    return item
+
+# ============= SERVICE LAYER =============
+# Route handlers are framework-neutral: they take an ApiRequest and return
+# JSON-serializable data or an ApiResult, and raise ApiError for error
+# responses. api_route() mounts them on the Flask app and records them in
+# API_ROUTES, from which asgi_app.py builds the native ASGI app.
+
+class ApiError(Exception):
+    """Error response rendered as {'error': message}"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class ApiResult:
+    """Successful response with optional status, headers and HTTP caching.
+
+    Exactly one of payload (serialized like jsonify), body (pre-serialized
+    JSON bytes) or build (called for the payload or body bytes only when
+    the response is not a 304) is used.
+    """
+    
+    def __init__(self, payload=None, status=200, headers=None, etag=None, max_age=None,
+                 body=None, build=None):
+        self.payload = payload
+        self.status = status
+        self.headers = headers or {}
+        self.etag = etag
+        self.max_age = max_age
+        self.body = body
+        self.build = build
+    
+    def render_body(self):
+        if self.body is not None:
+            return self.body
+        payload = self.build() if self.build else self.payload
+        return payload if isinstance(payload, bytes) else json_response_bytes(payload)
+
+class ApiRequest:
+    """The parts of an HTTP request route handlers use"""
+    
+    def __init__(self, args, headers, load_json):
+        self.args = args
+        self.headers = headers
+        self._load_json = load_json
+        self.user_id = None
+        self.username = None
+    
+    def get_json(self):
+        return self._load_json()
+
+ApiRoute = namedtuple('ApiRoute', 'rule methods handler label auth expose_errors before_read')
+
+API_ROUTES = []
+
+def int_arg(args, name, default):
+    """Integer query arg, falling back to default when missing or malformed"""
     try:
-        db = get_db()
-        cursor = db.cursor()
-        limit = request.args.get('limit', 20)
-        
-        cursor.execute('''
-            SELECT id FROM content 
-            ORDER BY watch_count DESC, created_at DESC 
-            LIMIT ?
-        ''', (limit,))
-        
-        trending_ids = [row['id'] for row in cursor.fetchall()]
-        
-        return jsonify(trending_ids), 200
-        
-    except Exception as e:
-        app.logger.error(f"Trending error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
 
-@app.route('/api/content/by-category/<category>', methods=['GET'])
-def get_by_category(category):
-    """Get content by category (industry or type)"""
+# Largest value SQLite stores as an INTEGER
+SQLITE_MAX_INT = 2 ** 63 - 1
+
+def int_field(data, name, default=0):
+    """Non-negative integer JSON body field (numbers or numeric strings); 400 otherwise"""
+    value = data.get(name, default)
     try:
-        db = get_db()
-        cursor = db.cursor()
-        limit = request.args.get('limit', 50)
-        
-        cursor.execute('''
-            SELECT * FROM content 
-            WHERE industry = ? OR type = ?
-            ORDER BY watch_count DESC, created_at DESC 
-            LIMIT ?
-        ''', (category, category, limit))
-        
-        content = []
-        for row in cursor.fetchall():
-            item = dict_from_row(row)
-            item['genres'] = parse_json_field(item['genres'], [])
-            content.append(item)
-        
-        return jsonify(content), 200
-        
-    except Exception as e:
-        app.logger.error(f"Category error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        value = int(float(value)) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ApiError(400, f'{name} must be a number')
+    if not 0 <= value <= SQLITE_MAX_INT:
+        raise ApiError(400, f'{name} out of range')
+    return value
 
-@app.route('/api/content/detail/<content_id>', methods=['GET'])
-def get_content_detail(content_id):
-    """Get detailed content information"""
+def handle_api_request(route, req, path_params):
+    """Run a route handler on a pooled read connection; returns (status, body, headers)"""
+    started = metrics.start_request(route.rule)
+    status = 500
     try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT * FROM content WHERE id = ?', (content_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            return jsonify({'error': 'Content not found'}), 404
-        
-        item = dict_from_row(row)
-        item['genres'] = parse_json_field(item['genres'], [])
-        item['cast'] = parse_json_field(item['cast'], [])
-        item['episodes'] = parse_json_field(item['episodes'], [])
-        item['urls'] = parse_json_field(item['urls'], {})
-        item['download_links'] = parse_json_field(item['download_links'], {})
-        
-        return jsonify(item), 200
-        
-    except Exception as e:
-        app.logger.error(f"Content detail error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        error = prepare_api_request(route, req)
+        if error is not None:
+            status, body, headers = error
+        else:
+            with db_pool.reading():
+                status, body, headers = run_api_handler(route, req, path_params)
+    except PoolTimeout as e:
+        app.logger.warning(f"{route.label}: {e}")
+        status, body, headers = 503, json_response_bytes({'error': 'Server busy'}), {'Retry-After': '1'}
+    finally:
+        metrics.finish_request(route.rule, route.methods[0], status, started)
+    return status, body, headers
 
-@app.route('/api/content/search', methods=['GET'])
-def search_content():
-    """Search content"""
+def prepare_api_request(route, req):
+    """Authenticate and run the route's before_read hook, both without a read
+    connection; returns an error response tuple or None
+    """
     try:
-        query = request.args.get('q', '')
-        if not query:
-            return jsonify([]), 200
-        
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('''
-            SELECT * FROM content 
-            WHERE title LIKE ? OR genres LIKE ? OR description LIKE ?
-            ORDER BY watch_count DESC
-            LIMIT 50
-        ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
-        
-        results = []
-        for row in cursor.fetchall():
-            item = dict_from_row(row)
-            item['genres'] = parse_json_field(item['genres'], [])
-            results.append(item)
-        
-        return jsonify(results), 200
-        
-    except Exception as e:
-        app.logger.error(f"Search error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        if route.auth:
+            req.user_id, req.username = authenticate(req.headers.get('Authorization'))
+        if route.before_read is not None:
+            route.before_read(req)
+    except ApiError as e:
+        return e.status, json_response_bytes({'error': e.message}), {}
+    return None
 
-# User Routes
-@app.route('/api/user/watchlist', methods=['GET'])
-@auth_required
-def get_watchlist():
-    """Get user watchlist IDs"""
+def run_api_handler(route, req, path_params):
+    """The route handler on the connection borrowed by handle_api_request"""
     try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT watchlist FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
-            return jsonify([]), 200
-        
-        watchlist_ids = parse_json_field(user['watchlist'], [])
-        
-        return jsonify(watchlist_ids), 200
-        
+        result = route.handler(req, **path_params)
+    except ApiError as e:
+        return e.status, json_response_bytes({'error': e.message}), {}
     except Exception as e:
-        app.logger.error(f"Watchlist error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        app.logger.error(f"{route.label} error: {e}")
+        message = str(e) if route.expose_errors else 'Internal server error'
+        return 500, json_response_bytes({'error': message}), {}
+    
+    if not isinstance(result, ApiResult):
+        return 200, json_response_bytes(result), {}
+    
+    headers = {}
+    if result.etag is not None:
+        headers['ETag'] = f'"{result.etag}"'
+        headers['Cache-Control'] = f'public, max-age={result.max_age}'
+        # Weak comparison: compressed responses carry W/ ETags
+        if parse_etags(req.headers.get('If-None-Match')).contains_weak(result.etag):
+            return 304, b'', headers
+    headers.update(result.headers)
+    return result.status, result.render_body(), headers
 
-@app.route('/api/user/watchlist/add', methods=['POST'])
-@auth_required
-def add_to_watchlist():
-    """Add content to watchlist"""
-    try:
-        data = request.get_json()
-        content_id = data.get('contentId')
-        
-        if not content_id:
-            return jsonify({'error': 'contentId required'}), 400
-        
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT watchlist FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if user:
-            watchlist = parse_json_field(user['watchlist'], [])
-            if content_id not in watchlist:
-                watchlist.append(content_id)
-                cursor.execute('UPDATE users SET watchlist = ? WHERE id = ?', 
-                             (json.dumps(watchlist), request.user_id))
-                db.commit()
-        
-        return jsonify({'success': True}), 200
-        
-    except Exception as e:
-        app.logger.error(f"Add watchlist error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+def flask_view(route):
+    """Flask view function serving an ApiRoute"""
+    def view(**path_params):
+        req = ApiRequest(request.args, request.headers, request.get_json)
+        status, body, headers = handle_api_request(route, req, path_params)
+        # mimetype would override a Content-Type set by the handler
+        mimetype = None if 'Content-Type' in headers else 'application/json'
+        return app.response_class(body, status=status, headers=headers, mimetype=mimetype)
+    return view
 
-@app.route('/api/user/watchlist/remove', methods=['POST'])
-@auth_required
-def remove_from_watchlist():
-    """Remove content from watchlist"""
+def api_route(rule, label, methods=('GET',), auth=False, expose_errors=False, before_read=None):
+    """Register a handler on the Flask app and in API_ROUTES.
+
+    label prefixes logged errors; auth requires a valid Bearer token and
+    sets req.user_id/req.username; expose_errors returns the exception text
+    instead of a generic message on 500s; before_read(req) runs after auth
+    and before a read connection is borrowed, for work that may wait on
+    threads holding one.
+    """
+    def decorator(handler):
+        route = ApiRoute(rule, tuple(methods), handler, label, auth, expose_errors, before_read)
+        API_ROUTES.append(route)
+        app.add_url_rule(rule, handler.__name__, flask_view(route), methods=list(methods))
+        return handler
+    return decorator
+
+# ============= CONTENT CACHE =============
+
+class ContentCache:
+    """Process-wide cache of serialized detail responses keyed by content id.
+
+    Entries are built at sync time and dropped per item whenever the sync or
+    a write (e.g. a watch_count bump) changes that item.
+    """
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, content_id):
+        """Return (body, etag) or None"""
+        entry = self.entries.get(content_id)
+        if entry is None or entry[2] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0], entry[1]
+    
+    def put(self, content_id, body):
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            self.entries[content_id] = (body, etag, time.monotonic() + self.ttl)
+        return body, etag
+    
+    def invalidate(self, content_ids):
+        with self.lock:
+            for content_id in content_ids:
+                self.entries.pop(content_id, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def stats(self):
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+content_cache = ContentCache(CONTENT_CACHE_TTL)
+
+# Episode link templates by id, for expanding content_episodes rows
+url_template_cache = TemplateCache()
+
+def warm_content_cache():
+    """Serialize every content row that is not cached yet; returns the cache size"""
+    db = get_db()
+    cursor = db.cursor()
+    seasons = episode_season_counts(cursor)
+    cursor.execute(f'SELECT {DETAIL_SELECT} FROM content')
+    
+    for row in cursor:
+        if row['id'] not in content_cache.entries:
+            detail = content_detail_from_row(row, seasons.get(row['id'], []))
+            content_cache.put(row['id'], json_response_bytes(detail))
+    return len(content_cache.entries)
+
+# ============= SUGGEST INDEX =============
+
+suggest_index = SuggestIndex()
+
+def rebuild_suggest_index():
+    """Rebuild the in-memory title suggestion index from the content table"""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('SELECT id, title, year, image, type, watch_count FROM content')
+    suggest_index.rebuild(
+        ({'id': row['id'], 'title': row['title'], 'year': row['year'],
+          'image': row['image'], 'type': row['type']}, row['title'], row['watch_count'])
+        for row in cursor
+    )
+
+# ============= CATALOG BUNDLE =============
+
+catalog_bundle = CatalogBundle()
+
+BUNDLE_SELECT = ', '.join(BUNDLE_COLUMNS)
+BUNDLE_SELECT_ALIASED = ', '.join('c.' + column for column in BUNDLE_COLUMNS)
+
+def catalog_bundle_snapshot():
+    """Full bundle body for the current catalog version, built once per version"""
+    version = get_cache_versions()['catalog']
+    
+    def load_rows():
+        cursor = card_cursor(get_db())
+        cursor.execute(f'SELECT {BUNDLE_SELECT} FROM content ORDER BY rowid')
+        return cursor
+    
+    return version, catalog_bundle.snapshot(version, load_rows)
+
+def catalog_delta(since, version):
+    """Delta body with the titles changed or removed after catalog version `since`"""
+    cursor = card_cursor(get_db())
+    cursor.execute(f'''
+        SELECT {BUNDLE_SELECT_ALIASED} FROM catalog_changes ch
+        JOIN content c ON c.id = ch.content_id
+        WHERE ch.version > ? AND ch.removed = 0
+        ORDER BY c.rowid
+    ''', (since,))
+    rows = cursor.fetchall()
+    
+    cursor.execute('''
+        SELECT content_id FROM catalog_changes WHERE version > ? AND removed = 1
+    ''', (since,))
+    removed = [row[0] for row in cursor.fetchall()]
+    
+    return delta_body(version, since, rows, removed)
+
+# ============= CATEGORY RANKINGS =============
+
+category_rankings = CategoryRankings(CATEGORY_REFRESH_SECONDS)
+category_rebuild_lock = threading.Lock()
+
+def rebuild_category_rankings():
+    """Rebuild the per-industry/per-type ranked lists from the content table"""
+    cursor = card_cursor(get_db())
+    cursor.execute(f'SELECT {CARD_SELECT}, created_at FROM content')
+    category_rankings.rebuild((ContentCard(*row[:-1]), row[-1]) for row in cursor)
+
+def refresh_category_rankings():
+    """Rebuild the rankings when older than CATEGORY_REFRESH_SECONDS"""
+    if category_rankings.is_stale() and category_rebuild_lock.acquire(blocking=False):
+        try:
+            rebuild_category_rankings()
+        finally:
+            category_rebuild_lock.release()
+
+# ============= TRENDING =============
+
+trending = TrendingEngine(TRENDING_WINDOWS, TRENDING_MAX_LIMIT, TRENDING_REFRESH_SECONDS)
+trending_refresh_lock = threading.Lock()
+
+def refresh_trending(wait=False):
+    """Fold user_watches rows not seen yet into the trending engine.
+    
+    Requests refresh it at most every TRENDING_REFRESH_SECONDS without
+    waiting for a refresh already running; wait=True (after a local view
+    flush or catalog sync) always refreshes.
+    """
+    if not wait and not trending.is_stale():
+        return
+    if not trending_refresh_lock.acquire(blocking=wait):
+        return
     try:
-        data = request.get_json()
-        content_id = data.get('contentId')
-        
-        if not content_id:
-            return jsonify({'error': 'contentId required'}), 400
-        
-        db = get_db()
+        with db_pool.reading() as db:
+            cursor = db.cursor()
+            catalog_version = get_cache_versions()['catalog']
+            if catalog_version != trending.catalog_version:
+                cursor.execute('SELECT id FROM content')
+                trending.set_catalog(catalog_version, [row[0] for row in cursor.fetchall()])
+            
+            # Lifetime order pads windows with too few viewed titles
+            cursor.execute('''
+                SELECT id FROM content
+                ORDER BY watch_count DESC, created_at DESC
+                LIMIT ?
+            ''', (TRENDING_MAX_LIMIT,))
+            trending.set_fallback([row[0] for row in cursor.fetchall()])
+            
+            cutoff = datetime.utcfromtimestamp(trending.cutoff()).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute('''
+                SELECT id, content_id, CAST(strftime('%s', watched_at) AS INTEGER)
+                FROM user_watches
+                WHERE id > ? AND watched_at >= ?
+                ORDER BY id
+            ''', (trending.last_id, cutoff))
+            trending.ingest(cursor.fetchall())
+    finally:
+        trending_refresh_lock.release()
+
+def trending_ids(limit, window=TRENDING_DEFAULT_WINDOW):
+    """Trending content IDs for a window, highest decayed view count first"""
+    refresh_trending()
+    ids, _ = trending.top(window, max(1, limit))
+    return list(ids)
+
+# ============= VIEW BUFFER =============
+
+def write_view_batch(db, batch):
+    """Writer job for apply_view_batch"""
+    cursor = db.cursor()
+    cursor.executemany('UPDATE content SET watch_count = watch_count + ? WHERE id = ?',
+                       [(count, content_id) for content_id, count in batch['views'].items()])
+    bump_cache_version(cursor, 'views')
+    
+    cursor.executemany('''
+        INSERT INTO user_watches (user_id, content_id, watch_time, progress)
+        VALUES (?, ?, ?, ?)
+    ''', batch['watches'])
+    
+    # Existing entries keep their position, new ones are appended
+    cursor.executemany(HISTORY_UPSERT_SQL, [
+        (user_id, content_id, progress, timestamp)
+        for user_id, entries in batch['history'].items()
+        for content_id, (progress, timestamp) in entries.items()
+    ])
+    cursor.executemany(HISTORY_TRIM_SQL, [
+        (user_id, user_id, HISTORY_LIMIT - 1) for user_id in batch['history']
+    ])
+
+def apply_view_batch(batch):
+    """Write a batch of buffered views in one transaction"""
+    db_writer.run(write_view_batch, batch)
+
+def after_view_batch(batch):
+    """Bring in-memory views of the data up to date with a written batch"""
+    views = batch['views']
+    refresh_trending(wait=True)
+    
+    # watch_count is part of the detail response and the category order
+    content_cache.invalidate(list(views))
+    for content_id, count in views.items():
+        category_rankings.bump(content_id, count)
+    
+    with db_pool.reading() as db:
         cursor = db.cursor()
-        cursor.execute('SELECT watchlist FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if user:
-            watchlist = parse_json_field(user['watchlist'], [])
-            if content_id in watchlist:
-                watchlist.remove(content_id)
-                cursor.execute('UPDATE users SET watchlist = ? WHERE id = ?', 
-                             (json.dumps(watchlist), request.user_id))
-                db.commit()
-        
-        return jsonify({'success': True}), 200
-        
-    except Exception as e:
-        app.logger.error(f"Remove watchlist error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        for user_id, entries in batch['history'].items():
+            recommendation_cache.record_watches(
+                user_id, list(entries),
+                lambda: genre_profile(cursor, recent_watched_ids(cursor, user_id)))
 
-@app.route('/api/user/track-view', methods=['POST'])
-@auth_required
-def track_view():
-    """Track content view and update watch count"""
-    try:
-        data = request.get_json()
-        content_id = data.get('contentId')
-        watch_time = data.get('watchTime', 0)
-        progress = data.get('progress', 0)
-        
-        if not content_id:
-            return jsonify({'error': 'contentId required'}), 400
-        
-        db = get_db()
+view_buffer = ViewBuffer(apply_view_batch, VIEW_FLUSH_INTERVAL_MS, VIEW_FLUSH_MAX_EVENTS,
+                         after_flush=after_view_batch, quarantine_path=VIEW_QUARANTINE_PATH)
+atexit.register(view_buffer.stop)
+
+# ============= API ROUTES =============
+# Note: Frontend will be hosted separately and call these APIs
+
+# Auth Routes
+@api_route('/api/auth/signup', 'Signup', methods=['POST'])
+def signup(req):
+    """User registration"""
+    data = req.get_json()
+    email = data.get('email')
+    username = data.get('username')
+    pin = data.get('pin')
+    profile_image = data.get('profile_image', '')
+    
+    if not email or not username or not pin:
+        raise ApiError(400, 'Email, username and PIN required')
+    
+    hashed_pin = hash_pin(pin)
+    
+    def insert_user(db):
         cursor = db.cursor()
+        cursor.execute('SELECT id FROM users WHERE email = ? OR username = ?', (email, username))
+        if cursor.fetchone():
+            raise ApiError(409, 'User already exists')
         
-        # Update content watch count
-        cursor.execute('UPDATE content SET watch_count = watch_count + 1 WHERE id = ?', (content_id,))
-        
-        # Track user watch
         cursor.execute('''
-            INSERT INTO user_watches (user_id, content_id, watch_time, progress)
+            INSERT INTO users (email, username, pin, profile_image)
             VALUES (?, ?, ?, ?)
-        ''', (request.user_id, content_id, watch_time, progress))
-        
-        # Update user history
-        cursor.execute('SELECT history FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if user:
-            history = parse_json_field(user['history'], [])
-            
-            # Update or add history entry
-            found = False
-            for item in history:
-                if item.get('contentId') == content_id:
-                    item['progress'] = progress
-                    item['timestamp'] = datetime.utcnow().isoformat()
-                    found = True
-                    break
-            
-            if not found:
-                history.append({
-                    'contentId': content_id,
-                    'progress': progress,
-                    'timestamp': datetime.utcnow().isoformat()
-                })
-            
-            # Keep last 100 entries
-            history = history[-100:]
-            
-            cursor.execute('UPDATE users SET history = ? WHERE id = ?', 
-                         (json.dumps(history), request.user_id))
-        
-        db.commit()
-        return jsonify({'success': True}), 200
-        
-    except Exception as e:
-        app.logger.error(f"Track view error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        ''', (email, username, hashed_pin, profile_image))
+    
+    db_writer.run(insert_user)
+    return ApiResult({'success': True}, status=201)
 
-@app.route('/api/user/recommendations', methods=['GET'])
-@auth_required
-def get_recommendations():
-    """Get personalized recommendation IDs based on watch history"""
-    try:
+@api_route('/api/auth/login', 'Login', methods=['POST'])
+def login(req):
+    """User login"""
+    data = req.get_json()
+    email = data.get('email')
+    pin = data.get('pin')
+    
+    if not email or not pin:
+        raise ApiError(400, 'Email and PIN required')
+    
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+    user = cursor.fetchone()
+    
+    if not user or not verify_pin(user['pin'], pin):
+        raise ApiError(401, 'Invalid credentials')
+    
+    user_dict = dict_from_row(user)
+    token = generate_jwt({
+        'userId': str(user_dict['id']),
+        'username': user_dict['username']
+    })
+    
+    return {
+        'user': {
+            'id': str(user_dict['id']),
+            'username': user_dict['username'],
+            'email': user_dict['email'],
+            'profile_image': user_dict.get('profile_image', '')
+        },
+        'token': token
+    }
+
+@api_route('/api/auth/verify', 'Auth verification', auth=True)
+def verify_auth(req):
+    """Verify authentication"""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('SELECT * FROM users WHERE id = ?', (req.user_id,))
+    user = cursor.fetchone()
+    
+    if not user:
+        raise ApiError(404, 'User not found')
+    
+    user_dict = dict_from_row(user)
+    return {
+        'id': str(user_dict['id']),
+        'username': user_dict['username'],
+        'email': user_dict['email']
+    }
+
+# Content Routes
+@api_route('/api/content/trending', 'Trending')
+def get_trending(req):
+    """Get trending content IDs for ?window=24h|7d (default 24h).
+    
+    Served from the in-memory trending engine: views in the window count
+    with exponential decay, padded with the most watched titles overall.
+    """
+    window = req.args.get('window', TRENDING_DEFAULT_WINDOW)
+    if window not in TRENDING_WINDOWS:
+        raise ApiError(400, 'Invalid window')
+    limit = max(1, min(int_arg(req.args, 'limit', 20), TRENDING_MAX_LIMIT))
+    
+    refresh_trending()
+    ids, etag = trending.top(window, limit)
+    return ApiResult(etag=etag, max_age=TRENDING_MAX_AGE, build=lambda: list(ids))
+
+@api_route('/api/content/by-category/<category>', 'Category')
+def get_by_category(req, category):
+    """Get content by category (industry or type).
+    
+    Served from the materialized rankings; pass ?after=<id> (the
+    X-Next-After header of the previous page) for the next page.
+    """
+    limit = max(1, int_arg(req.args, 'limit', 50))
+    after = req.args.get('after')
+    
+    refresh_category_rankings()
+    
+    cards, next_after = category_rankings.page(category, after, limit)
+    headers = {'X-Next-After': next_after} if next_after else {}
+    etag = page_etag(get_cache_versions()['catalog'], cards, next_after)
+    return ApiResult(headers=headers, etag=etag, max_age=CATEGORY_MAX_AGE,
+                     build=lambda: cards_json(cards))
+
+BROWSE_MAX_LIMIT = 100
+
+def browse_args(args):
+    """limit/offset query args for browse endpoints"""
+    limit = max(1, min(int_arg(args, 'limit', 50), BROWSE_MAX_LIMIT))
+    offset = max(0, int_arg(args, 'offset', 0))
+    return limit, offset
+
+@api_route('/api/content/by-genre/<genre>', 'Genre')
+def get_by_genre(req, genre):
+    """Get content for a genre via the content_genres index"""
+    limit, offset = browse_args(req.args)
+    
+    cursor = card_cursor(get_db())
+    cursor.execute(f'''
+        SELECT {CARD_SELECT_ALIASED} FROM content_genres g
+        JOIN content c ON c.id = g.content_id
+        WHERE g.genre = ?
+        ORDER BY c.watch_count DESC, c.created_at DESC
+        LIMIT ? OFFSET ?
+    ''', (genre, limit, offset))
+    cards = fetch_cards(cursor)
+    # Tagged by content: watch counts move on every view flush
+    etag = page_etag(get_cache_versions()['catalog'], cards, offset, 'genre')
+    return ApiResult(etag=etag, max_age=CATEGORY_MAX_AGE, build=lambda: cards_json(cards))
+
+@api_route('/api/content/by-person/<name>', 'Person')
+def get_by_person(req, name):
+    """Get content featuring a cast member or director (?role=cast|director)"""
+    role = req.args.get('role')
+    if role not in (None, 'cast', 'director'):
+        raise ApiError(400, 'Invalid role')
+    
+    limit, offset = browse_args(req.args)
+    lookups = []
+    params = []
+    if role in (None, 'cast'):
+        lookups.append('SELECT content_id FROM content_cast WHERE name = ?')
+        params.append(name)
+    if role in (None, 'director'):
+        lookups.append('SELECT content_id FROM content_directors WHERE name = ?')
+        params.append(name)
+    
+    cursor = card_cursor(get_db())
+    cursor.execute(f'''
+        SELECT {CARD_SELECT} FROM content
+        WHERE id IN ({' UNION '.join(lookups)})
+        ORDER BY watch_count DESC, created_at DESC
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    cards = fetch_cards(cursor)
+    etag = page_etag(get_cache_versions()['catalog'], cards, offset, 'person')
+    return ApiResult(etag=etag, max_age=CATEGORY_MAX_AGE, build=lambda: cards_json(cards))
+
+@api_route('/api/content/detail/<content_id>', 'Content detail')
+def get_content_detail(req, content_id):
+    """Get detailed content information"""
+    cached = content_cache.get(content_id)
+    if cached is None:
         db = get_db()
         cursor = db.cursor()
+        cursor.execute(f'SELECT {DETAIL_SELECT} FROM content WHERE id = ?', (content_id,))
+        row = cursor.fetchone()
         
-        # Get user's watch history
-        cursor.execute('''
-            SELECT content_id FROM user_watches 
-            WHERE user_id = ? 
-            ORDER BY watched_at DESC 
-            LIMIT 20
-        ''', (request.user_id,))
-        
-        watched_ids = [row['content_id'] for row in cursor.fetchall()]
-        
-        if not watched_ids:
-            # Return trending if no history
-            return get_trending()
-        
-        # Get genres from watched content
-        placeholders = ','.join(['?' for _ in watched_ids])
-        cursor.execute(f'SELECT genres FROM content WHERE id IN ({placeholders})', watched_ids)
-        
-        genre_counts = {}
-        for row in cursor.fetchall():
-            genres = parse_json_field(row['genres'], [])
-            for genre in genres:
-                genre_counts[genre] = genre_counts.get(genre, 0) + 1
-        
-        # Get top 3 genres
-        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        preferred_genres = [genre for genre, _ in top_genres]
-        
-        if not preferred_genres:
-            return get_trending()
-        
-        # Find similar content
-        genre_conditions = ' OR '.join(['genres LIKE ?' for _ in preferred_genres])
-        genre_params = [f'%"{genre}"%' for genre in preferred_genres]
-        
-        # Exclude already watched
-        exclude_conditions = ' AND ' + ' AND '.join(['id != ?' for _ in watched_ids])
+        if not row:
+            raise ApiError(404, 'Content not found')
         
+        seasons = episode_season_counts(cursor, content_id).get(content_id, [])
+        cached = content_cache.put(content_id,
+                                   json_response_bytes(content_detail_from_row(row, seasons)))
+    
+    body, etag = cached
+    return ApiResult(body=body, etag=etag, max_age=DETAIL_MAX_AGE)
+
+EPISODES_MAX_LIMIT = 100
+
+@api_route('/api/content/<content_id>/episodes', 'Episodes')
+def get_content_episodes(req, content_id):
+    """One page of a title's episodes in catalog order, optionally for one ?season=.
+    
+    X-Total-Count carries the number of episodes matching the filter.
+    """
+    limit = max(1, min(int_arg(req.args, 'limit', 50), EPISODES_MAX_LIMIT))
+    offset = max(0, int_arg(req.args, 'offset', 0))
+    season = req.args.get('season')
+    
+    where = 'content_id = ?'
+    params = [content_id]
+    if season is not None:
+        try:
+            params.append(int(season))
+        except ValueError:
+            raise ApiError(400, 'Invalid season')
+        where += ' AND season = ?'
+    
+    cursor = get_db().cursor()
+    cursor.execute('SELECT 1 FROM content WHERE id = ?', (content_id,))
+    if cursor.fetchone() is None:
+        raise ApiError(404, 'Content not found')
+    
+    cursor.execute(f'SELECT COUNT(*) FROM content_episodes WHERE {where}', params)
+    total = cursor.fetchone()[0]
+    
+    def build():
         cursor.execute(f'''
-            SELECT id FROM content 
-            WHERE ({genre_conditions}) {exclude_conditions}
-            ORDER BY CAST(rating AS REAL) DESC, watch_count DESC 
-            LIMIT 20
-        ''', genre_params + watched_ids)
-        
-        recommendation_ids = [row['id'] for row in cursor.fetchall()]
-        
-        return jsonify(recommendation_ids), 200
+            SELECT data FROM content_episodes WHERE {where}
+            ORDER BY position LIMIT ? OFFSET ?
+        ''', params + [limit, offset])
+        episodes = [json_backend.loads(row[0]) for row in cursor.fetchall()]
+        ids = set().union(*map(template_ids, episodes))
+        templates = url_template_cache.lookup(cursor, ids) if ids else {}
+        return [expand_episode(episode, templates) for episode in episodes]
+    
+    version = get_cache_versions()['catalog']
+    return ApiResult(headers={'X-Total-Count': str(total)}, etag=f"episodes-{version}",
+                     max_age=DETAIL_MAX_AGE, build=build)
+
+def like_pattern(query):
+    """A LIKE pattern matching query literally anywhere (use with ESCAPE '\\')"""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def fts_match_query(query):
+    """Turn free text into an FTS5 MATCH expression of quoted prefix terms"""
+    tokens = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+@api_route('/api/content/search', 'Search')
+def search_content(req):
+    """Search content with full-text ranking blended with popularity"""
+    query = req.args.get('q', '')
+    if not query:
+        return []
+    
+    limit = max(1, min(int_arg(req.args, 'limit', 50), SEARCH_MAX_LIMIT))
+    offset = max(0, int_arg(req.args, 'offset', 0))
+    
+    cursor = card_cursor(get_db())
+    
+    if has_fts_index(cursor):
+        match = fts_match_query(query)
+        if not match:
+            return []
         
-    except Exception as e:
-        app.logger.error(f"Recommendations error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        weights = ', '.join(str(w) for w in SEARCH_BM25_WEIGHTS)
+        cursor.execute(f'''
+            SELECT {CARD_SELECT_ALIASED} FROM content_fts
+            JOIN content c ON c.rowid = content_fts.rowid
+            WHERE content_fts MATCH ?
+            ORDER BY bm25(content_fts, {weights})
+                - ? * c.watch_count / (c.watch_count + 100.0)
+            LIMIT ? OFFSET ?
+        ''', (match, SEARCH_POPULARITY_WEIGHT, limit, offset))
+    else:
+        pattern = like_pattern(query)
+        cursor.execute(f'''
+            SELECT {CARD_SELECT} FROM content
+            WHERE title LIKE ? ESCAPE '\\' OR genres LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\'
+            ORDER BY watch_count DESC
+            LIMIT ? OFFSET ?
+        ''', (pattern, pattern, pattern, limit, offset))
+    
+    return ApiResult(body=cards_json(fetch_cards(cursor)))
+
+@api_route('/api/content/suggest', 'Suggest')
+def suggest_content(req):
+    """Typo-tolerant title autocomplete served from the in-memory index"""
+    query = req.args.get('q', '')
+    if not query:
+        return []
+    
+    limit = max(1, min(int_arg(req.args, 'limit', SUGGEST_DEFAULT_LIMIT), SUGGEST_MAX_LIMIT))
+    return suggest_index.suggest(query, limit)
+
+@api_route('/api/catalog/bundle', 'Catalog bundle')
+def get_catalog_bundle(req):
+    """Card-only snapshot of the whole catalog, or the changes after ?since=<version>.
+    
+    Clients keep the returned version and send it as since on refresh. A
+    since ahead of the server's version (e.g. a rebuilt database) gets the
+    full snapshot again.
+    """
+    since = req.args.get('since')
+    version = get_cache_versions()['catalog']
+    
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            raise ApiError(400, 'Invalid since')
+        if since <= version:
+            return ApiResult(etag=f"catalog-{version}-since-{since}", max_age=BUNDLE_MAX_AGE,
+                             build=lambda: catalog_delta(since, version))
+    
+    version, body = catalog_bundle_snapshot()
+    return ApiResult(body=body, etag=f"catalog-{version}", max_age=BUNDLE_MAX_AGE)
+
+# User Routes
+@api_route('/api/user/watchlist', 'Watchlist', auth=True)
+def get_watchlist(req):
+    """Get user watchlist IDs"""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT content_id FROM user_watchlist WHERE user_id = ? ORDER BY rowid
+    ''', (req.user_id,))
+    return [row[0] for row in cursor.fetchall()]
+
+@api_route('/api/user/watchlist/add', 'Add watchlist', methods=['POST'], auth=True)
+def add_to_watchlist(req):
+    """Add content to watchlist"""
+    data = req.get_json()
+    content_id = data.get('contentId')
+    
+    if not content_id:
+        raise ApiError(400, 'contentId required')
+    
+    db_writer.run(lambda db: db.execute('''
+        INSERT OR IGNORE INTO user_watchlist (user_id, content_id) VALUES (?, ?)
+    ''', (req.user_id, content_id)))
+    
+    return {'success': True}
+
+@api_route('/api/user/watchlist/remove', 'Remove watchlist', methods=['POST'], auth=True)
+def remove_from_watchlist(req):
+    """Remove content from watchlist"""
+    data = req.get_json()
+    content_id = data.get('contentId')
+    
+    if not content_id:
+        raise ApiError(400, 'contentId required')
+    
+    db_writer.run(lambda db: db.execute(
+        'DELETE FROM user_watchlist WHERE user_id = ? AND content_id = ?',
+        (req.user_id, content_id)))
+    
+    return {'success': True}
+
+@api_route('/api/user/track-view', 'Track view', methods=['POST'], auth=True)
+def track_view(req):
+    """Track content view and update watch count"""
+    data = req.get_json()
+    content_id = data.get('contentId')
+    
+    if not content_id:
+        raise ApiError(400, 'contentId required')
+    # A value SQLite cannot bind would fail every flush of the shared buffer
+    if not isinstance(content_id, str):
+        raise ApiError(400, 'contentId must be a string')
+    watch_time = int_field(data, 'watchTime')
+    progress = int_field(data, 'progress')
+    
+    # Watch count, watch row and history are written by the view buffer
+    view_buffer.record(req.user_id, content_id, watch_time, progress,
+                       datetime.utcnow().isoformat())
+    
+    return {'success': True}
+
+if RECOMMENDATION_CACHE_STORE == 'sqlite':
+    recommendation_store = SQLiteStore(RECOMMENDATION_CACHE_PATH)
+else:
+    recommendation_store = MemoryStore(RECOMMENDATION_CACHE_SIZE)
+recommendation_cache = RecommendationCache(recommendation_store, RECOMMENDATION_CACHE_TTL)
+
+def recent_watched_ids(cursor, user_id):
+    """Distinct ids of the user's most recent watches, newest first"""
+    cursor.execute('''
+        SELECT content_id FROM user_watches
+        WHERE user_id = ?
+        ORDER BY watched_at DESC, id DESC
+        LIMIT ?
+    ''', (user_id, RECOMMENDATION_HISTORY))
+    
+    return list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+
+def genre_profile(cursor, watched_ids):
+    """The three genres the user watched most, sorted by name"""
+    if not watched_ids:
+        return []
+    
+    placeholders = ','.join(['?' for _ in watched_ids])
+    cursor.execute(f'''
+        SELECT genre, COUNT(*) AS watched FROM content_genres
+        WHERE content_id IN ({placeholders})
+        GROUP BY genre
+        ORDER BY watched DESC, genre
+        LIMIT 3
+    ''', watched_ids)
+    
+    return sorted(row[0] for row in cursor.fetchall())
+
+def neighbor_recommendations(cursor, watched_ids):
+    """Merge the precomputed neighbour lists of recently watched titles"""
+    placeholders = ','.join(['?' for _ in watched_ids])
+    cursor.execute(f'''
+        SELECT content_id, neighbors FROM content_neighbors
+        WHERE content_id IN ({placeholders})
+    ''', watched_ids)
+    
+    # Newer watches weigh more; titles similar to several watches add up
+    weights = {content_id: RECOMMENDATION_DECAY ** i for i, content_id in enumerate(watched_ids)}
+    watched = set(watched_ids)
+    scores = {}
+    for content_id, neighbors in cursor.fetchall():
+        weight = weights[content_id]
+        for neighbor_id, score in parse_json_field(neighbors, []):
+            if neighbor_id not in watched:
+                scores[neighbor_id] = scores.get(neighbor_id, 0.0) + score * weight
+    
+    if not scores:
+        return []
+    
+    # A neighbour build that raced a catalog sync can still list removed titles
+    candidates = list(scores)
+    placeholders = ','.join(['?' for _ in candidates])
+    cursor.execute(f'SELECT id FROM content WHERE id IN ({placeholders})', candidates)
+    live = {row[0] for row in cursor.fetchall()}
+    return sorted((content_id for content_id in scores if content_id in live),
+                  key=scores.get, reverse=True)[:RECOMMENDATION_LIMIT]
+
+def genre_recommendations(cursor, watched_ids, preferred_genres):
+    """Top-rated titles in the user's preferred genres"""
+    if not preferred_genres:
+        return []
+    
+    # Find similar content through the genre index, excluding already watched
+    placeholders = ','.join(['?' for _ in watched_ids])
+    genre_placeholders = ','.join(['?' for _ in preferred_genres])
+    cursor.execute(f'''
+        SELECT c.id FROM content c
+        WHERE c.id IN (SELECT content_id FROM content_genres WHERE genre IN ({genre_placeholders}))
+          AND c.id NOT IN ({placeholders})
+        ORDER BY CAST(c.rating AS REAL) DESC, c.watch_count DESC
+        LIMIT ?
+    ''', preferred_genres + watched_ids + [RECOMMENDATION_LIMIT])
+    
+    return [row['id'] for row in cursor.fetchall()]
+
+def flush_pending_views(req):
+    """before_read hook: read-your-writes for views still sitting in the buffer"""
+    if view_buffer.has_pending(req.user_id):
+        view_buffer.flush()
 
-@app.route('/api/user/history', methods=['GET'])
-@auth_required
-def get_history():
+@api_route('/api/user/recommendations', 'Recommendations', auth=True, before_read=flush_pending_views)
+def get_recommendations(req):
+    """Get personalized recommendation IDs based on watch history"""
+    cached = recommendation_cache.get(req.user_id)
+    if cached is not None:
+        return cached
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    # Get user's watch history
+    watched_ids = recent_watched_ids(cursor, req.user_id)
+    
+    if not watched_ids:
+        # Return trending if no history
+        return trending_ids(int_arg(req.args, 'limit', 20))
+    
+    profile = genre_profile(cursor, watched_ids)
+    recommendation_ids = neighbor_recommendations(cursor, watched_ids)
+    if len(recommendation_ids) < RECOMMENDATION_LIMIT:
+        # Titles without precomputed neighbours yet: pad from the genre index
+        for content_id in genre_recommendations(cursor, watched_ids, profile):
+            if content_id not in recommendation_ids:
+                recommendation_ids.append(content_id)
+    
+    if not recommendation_ids:
+        return trending_ids(int_arg(req.args, 'limit', 20))
+    
+    recommendation_ids = recommendation_ids[:RECOMMENDATION_LIMIT]
+    recommendation_cache.put(req.user_id, recommendation_ids, profile)
+    
+    return recommendation_ids
+
+@api_route('/api/user/history', 'History', auth=True, before_read=flush_pending_views)
+def get_history(req):
     """Get user watch history with IDs and progress"""
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT history FROM users WHERE id = ?', (request.user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
-            return jsonify([]), 200
-        
-        history = parse_json_field(user['history'], [])
-        
-        return jsonify(history), 200
-        
-    except Exception as e:
-        app.logger.error(f"History error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT content_id, progress, timestamp FROM user_history
+        WHERE user_id = ? ORDER BY rowid
+    ''', (req.user_id,))
+    return [
+        {'contentId': row[0], 'progress': row[1], 'timestamp': row[2]}
+        for row in cursor.fetchall()
+    ]
 
 # Health check
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()}), 200
+@api_route('/api/health', 'Health')
+def health_check(req):
+    database = database_health()
+    payload = {
+        'status': 'healthy' if database['ok'] else 'unhealthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': database,
+        'viewBuffer': view_buffer.stats(),
+        'trending': trending.stats(),
+        'recommendationCache': recommendation_cache.stats()
+    }
+    return ApiResult(payload, status=200 if database['ok'] else 503)
+
+def database_health():
+    """Probe the pooled read connection and the writer; include pool metrics"""
+    try:
+        get_db().execute('SELECT 1').fetchone()
+        readable = True
+    except sqlite3.Error:
+        readable = False
+    
+    return {
+        'ok': readable and db_writer.is_alive(),
+        'readPool': db_pool.stats(),
+        'writer': db_writer.stats()
+    }
+
+@api_route('/api/metrics', 'Metrics')
+def get_metrics(req):
+    """Prometheus text exposition of request, SQLite, cache and catalog metrics"""
+    return ApiResult(body=metrics.render(), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+def collect_app_metrics():
+    """Scrape-time metric families from the pool, writer, caches and catalog"""
+    pool = db_pool.stats()
+    writer = db_writer.stats()
+    views = view_buffer.stats()
+    recommendations = recommendation_cache.stats()
+    detail = content_cache.stats()
+    
+    yield ('db_pool_connections', 'gauge', 'Read pool connections by state.',
+           [({'state': 'idle'}, pool['idle']), ({'state': 'in_use'}, pool['inUse'])])
+    yield ('db_pool_checkouts_total', 'counter', 'Read connection checkouts.', [({}, pool['checkouts'])])
+    yield ('db_pool_waits_total', 'counter', 'Checkouts that waited for a free connection.',
+           [({}, pool['waits'])])
+    yield ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up (503 responses).',
+           [({}, pool['timeouts'])])
+    yield ('db_writer_jobs_total', 'counter', 'Write jobs by outcome.',
+           [({'result': 'ok'}, writer['writes'] - writer['failures']),
+            ({'result': 'failed'}, writer['failures'])])
+    yield ('db_writer_queue_depth', 'gauge', 'Write jobs waiting for the writer.',
+           [({}, writer['queueDepth'])])
+    yield ('view_buffer_pending', 'gauge', 'Buffered views not yet written.', [({}, views['queueDepth'])])
+    yield ('view_buffer_quarantined_total', 'counter', 'Views that failed even when written on their own.',
+           [({}, views['eventsQuarantined'])])
+    yield from cache_families({
+        'detail': (detail['hits'], detail['misses']),
+        'recommendations': (recommendations['hits'], recommendations['misses']),
+    })
+    yield ('catalog_items', 'gauge', 'Titles in the catalog.', [({}, category_rankings.stats()['items'])])
+    yield ('catalog_version', 'gauge', 'Catalog version of the served bundle.',
+           [({}, catalog_bundle.stats()['version'] or 0)])
+    if last_sync['finished_at'] is not None:
+        yield ('catalog_sync_duration_seconds', 'gauge', 'Duration of the last catalog sync.',
+               [({}, last_sync['duration'])])
+        yield ('catalog_sync_timestamp_seconds', 'gauge', 'Unix time the last catalog sync finished.',
+               [({}, last_sync['finished_at'])])
+        yield ('catalog_sync_items', 'gauge', 'Items written or removed by the last catalog sync.',
+               [({'change': 'synced'}, last_sync['synced']), ({'change': 'removed'}, last_sync['removed'])])
+
+metrics.register(collect_app_metrics)
 
 # ============= WEEKLY ASSIGNMENTS ROUTES =============
 
@@ -686,6 +1983,8 @@ weekly_cache = {
     'assignments': {}
 }
 
+WEEKLY_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'series']
+
 def get_current_week():
     """Get current ISO week number"""
     return datetime.utcnow().strftime('%Y-%W')
@@ -694,112 +1993,92 @@ def get_current_day():
     """Get current day name (lowercase)"""
     return datetime.utcnow().strftime('%A').lower()
 
-@app.route('/api/content/weekly/<day>', methods=['GET'])
-def get_weekly_content(day):
-    """Get content IDs for a specific day of the week"""
-    try:
-        valid_days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'series']
-        if day.lower() not in valid_days:
-            return jsonify({'error': 'Invalid day'}), 400
-        
+def weekly_content(day):
+    """Cacheable result with the content IDs assigned to a day this week"""
+    if day.lower() not in WEEKLY_DAYS:
+        raise ApiError(400, 'Invalid day')
+    
+    current_week = get_current_week()
+    etag = f"weekly-{current_week}-{day.lower()}-{get_cache_versions()['assignments']}"
+    
+    def build():
         db = get_db()
         cursor = db.cursor()
-        
-        current_week = get_current_week()
-        
         cursor.execute('''
-            SELECT content_id FROM weekly_assignments 
+            SELECT content_id FROM weekly_assignments
             WHERE week = ? AND day = ?
             ORDER BY id ASC
         ''', (current_week, day.lower()))
         
-        content_ids = [row['content_id'] for row in cursor.fetchall() if row['content_id']]
-        
-        return jsonify(content_ids), 200
-        
-    except Exception as e:
-        app.logger.error(f"Weekly content error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return [row['content_id'] for row in cursor.fetchall() if row['content_id']]
+    
+    return ApiResult(etag=etag, max_age=WEEKLY_MAX_AGE, build=build)
 
-@app.route('/api/content/weekly/today', methods=['GET'])
-def get_today_content():
+@api_route('/api/content/weekly/today', 'Today content')
+def get_today_content(req):
     """Get content IDs for today"""
-    try:
-        current_day = get_current_day()
-        return get_weekly_content(current_day)
-    except Exception as e:
-        app.logger.error(f"Today content error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+    return weekly_content(get_current_day())
+
+@api_route('/api/content/weekly/<day>', 'Weekly content')
+def get_weekly_content(req, day):
+    """Get content IDs for a specific day of the week"""
+    return weekly_content(day)
+
+def weekly_assignments_by_day(cursor):
+    """Group fetched (day, content_id) rows into the per-day response shape"""
+    result = {day: [] for day in WEEKLY_DAYS}
+    for row in cursor.fetchall():
+        day = row['day']
+        content_id = row['content_id']
+        if day in result and content_id:
+            result[day].append(content_id)
+    return result
 
-@app.route('/api/content/weekly/all', methods=['GET'])
-def get_all_weekly_content():
+@api_route('/api/content/weekly/all', 'All weekly content')
+def get_all_weekly_content(req):
     """Get all weekly assignments"""
-    try:
+    current_week = get_current_week()
+    etag = f"weekly-{current_week}-all-{get_cache_versions()['assignments']}"
+    
+    def build():
         db = get_db()
         cursor = db.cursor()
-        
-        current_week = get_current_week()
-        
         cursor.execute('''
-            SELECT day, content_id FROM weekly_assignments 
+            SELECT day, content_id FROM weekly_assignments
             WHERE week = ?
             ORDER BY id ASC
         ''', (current_week,))
-        
-        result = {
-            'monday': [],
-            'tuesday': [],
-            'wednesday': [],
-            'thursday': [],
-            'friday': [],
-            'saturday': [],
-            'sunday': [],
-            'series': []
-        }
-        
-        for row in cursor.fetchall():
-            day = row['day']
-            content_id = row['content_id']
-            if day in result and content_id:
-                result[day].append(content_id)
-        
-        return jsonify(result), 200
-        
-    except Exception as e:
-        app.logger.error(f"All weekly content error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return weekly_assignments_by_day(cursor)
+    
+    return ApiResult(etag=etag, max_age=WEEKLY_MAX_AGE, build=build)
 
 # ============= HERO CAROUSEL ROUTES =============
 
-@app.route('/api/hero/carousel', methods=['GET'])
-def get_hero_carousel():
+@api_route('/api/hero/carousel', 'Hero carousel')
+def get_hero_carousel(req):
     """Get hero carousel content IDs"""
-    try:
+    etag = f"hero-{get_cache_versions()['assignments']}"
+    
+    def build():
         db = get_db()
         cursor = db.cursor()
-        
         cursor.execute('''
-            SELECT content_id FROM hero_carousel 
+            SELECT content_id FROM hero_carousel
             WHERE is_active = 1
             ORDER BY position ASC
         ''')
         
-        content_ids = [row['content_id'] for row in cursor.fetchall() if row['content_id']]
-        
-        return jsonify(content_ids), 200
-        
-    except Exception as e:
-        app.logger.error(f"Hero carousel error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return [row['content_id'] for row in cursor.fetchall() if row['content_id']]
+    
+    return ApiResult(etag=etag, max_age=HERO_MAX_AGE, build=build)
 
-@app.route('/api/admin/hero/carousel', methods=['POST'])
-def update_hero_carousel():
+@api_route('/api/admin/hero/carousel', 'Update hero carousel', methods=['POST'])
+def update_hero_carousel(req):
     """Update hero carousel content IDs"""
-    try:
-        data = request.get_json()
-        content_ids = data.get('content_ids', [])
-        
-        db = get_db()
+    data = req.get_json()
+    content_ids = data.get('content_ids', [])
+    
+    def replace_carousel(db):
         cursor = db.cursor()
         
         # Clear existing
@@ -813,71 +2092,45 @@ def update_hero_carousel():
                     VALUES (?, ?, 1)
                 ''', (content_id, position))
         
-        db.commit()
-        return jsonify({'success': True}), 200
-        
-    except Exception as e:
-        app.logger.error(f"Update hero carousel error: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        bump_cache_version(cursor, 'assignments')
+    
+    db_writer.run(replace_carousel)
+    return {'success': True}
 
 # ============= ADMIN ROUTES =============
 
-@app.route('/api/admin/weekly-assignments', methods=['GET'])
-def get_admin_weekly_assignments():
+@api_route('/api/admin/weekly-assignments', 'Admin weekly', expose_errors=True)
+def get_admin_weekly_assignments(req):
     """Get all weekly assignments for admin"""
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        
-        current_week = get_current_week()
-        
-        cursor.execute('''
-            SELECT * FROM weekly_assignments WHERE week = ?
-        ''', (current_week,))
-        
-        result = {
-            'monday': [],
-            'tuesday': [],
-            'wednesday': [],
-            'thursday': [],
-            'friday': [],
-            'saturday': [],
-            'sunday': [],
-            'series': []
-        }
-        
-        for row in cursor.fetchall():
-            day = row['day']
-            content_id = row['content_id']
-            if day in result and content_id:
-                result[day].append(content_id)
-        
-        return jsonify(result), 200
-        
-    except Exception as e:
-        app.logger.error(f"Admin weekly error: {e}")
-        return jsonify({'error': str(e)}), 500
+    db = get_db()
+    cursor = db.cursor()
+    
+    current_week = get_current_week()
+    
+    cursor.execute('''
+        SELECT * FROM weekly_assignments WHERE week = ?
+    ''', (current_week,))
+    
+    return weekly_assignments_by_day(cursor)
 
-@app.route('/api/admin/weekly-assignments', methods=['POST'])
-def post_admin_weekly_assignments():
+@api_route('/api/admin/weekly-assignments', 'Post weekly', methods=['POST'], expose_errors=True)
+def post_admin_weekly_assignments(req):
     """Update weekly assignments for a specific day"""
-    try:
-        data = request.get_json()
-        day = data.get('day')
-        content_ids = data.get('content_ids', [])
-        
-        valid_days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'series']
-        if day not in valid_days:
-            return jsonify({'error': 'Invalid day'}), 400
-        
-        db = get_db()
+    data = req.get_json()
+    day = data.get('day')
+    content_ids = data.get('content_ids', [])
+    
+    if day not in WEEKLY_DAYS:
+        raise ApiError(400, 'Invalid day')
+    
+    current_week = get_current_week()
+    
+    def replace_assignments(db):
         cursor = db.cursor()
         
-        current_week = get_current_week()
-        
         # Clear existing assignments for this day and week
         cursor.execute('''
-            DELETE FROM weekly_assignments 
+            DELETE FROM weekly_assignments
             WHERE week = ? AND day = ?
         ''', (current_week, day))
         
@@ -889,19 +2142,17 @@ def post_admin_weekly_assignments():
                     VALUES (?, ?, ?)
                 ''', (current_week, day, content_id.strip()))
         
-        db.commit()
-        
-        # Update cache
-        weekly_cache['week'] = current_week
-        if 'assignments' not in weekly_cache:
-            weekly_cache['assignments'] = {}
-        weekly_cache['assignments'][day] = content_ids
-        
-        return jsonify({'success': True}), 200
-        
-    except Exception as e:
-        app.logger.error(f"Post weekly error: {e}")
-        return jsonify({'error': str(e)}), 500
+        bump_cache_version(cursor, 'assignments')
+    
+    db_writer.run(replace_assignments)
+    
+    # Update cache
+    weekly_cache['week'] = current_week
+    if 'assignments' not in weekly_cache:
+        weekly_cache['assignments'] = {}
+    weekly_cache['assignments'][day] = content_ids
+    
+    return {'success': True}
 
 # Admin Weekly Editor Page
 @app.route('/admin/weekly-editor', methods=['GET'])
@@ -1166,14 +2417,15 @@ def admin_weekly_editor():
     '''
 
 if __name__ == '__main__':
-    # Initialize database
+    # Initialize database (idempotent - also creates tables added since first boot)
     if not os.path.exists(DATABASE_PATH):
         print("🔨 Initializing database...")
-        init_database()
+    init_database()
     
     # Sync content
     if os.path.exists(JSON_DATA_PATH):
         sync_content_from_json()
+    view_buffer.replay_quarantined()
     
     print("🚀 Starting Flask server on http://0.0.0.0:8001")
     print("📁 Serving frontend from:", app.static_folder)
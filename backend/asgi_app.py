@@ -0,0 +1,61 @@
+# Native ASGI application serving the same routes as the Flask app, built
+# from app.API_ROUTES. Route handlers block on SQLite, so they run on a
+# bounded thread pool while the event loop keeps serving connections.
+# server.py exposes it when SERVER_MODE=asgi.
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Route
+
+import app as core
+
+# Threads running route handlers. Handlers borrow read connections from
+# app.db_pool and queue writes on app.db_writer, so this only bounds how
+# many handlers run at once
+ASGI_DB_THREADS = int(os.getenv('ASGI_DB_THREADS', 8))
+
+db_executor = ThreadPoolExecutor(max_workers=ASGI_DB_THREADS, thread_name_prefix='sqlite')
+
+
+async def run_blocking(func, *args):
+    """Run func(*args) on the database thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
+
+def asgi_endpoint(route):
+    """Starlette endpoint serving an ApiRoute"""
+    async def endpoint(request):
+        body = await request.body() if request.method == 'POST' else b''
+        req = core.ApiRequest(request.query_params, request.headers, lambda: core.app.json.loads(body))
+        status, content, headers = await run_blocking(
+            core.handle_api_request, route, req, request.path_params)
+        return Response(content, status_code=status, headers=headers, media_type='application/json')
+    return endpoint
+
+
+async def admin_weekly_editor(request):
+    return HTMLResponse(core.admin_weekly_editor())
+
+
+def starlette_path(rule):
+    """Flask '<name>' URL rule -> Starlette '{name}' path"""
+    return re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', rule)
+
+
+# Starlette matches in order while Werkzeug prefers static rules, so rules
+# without parameters go first (/weekly/all must win over /weekly/{day})
+api_routes = sorted(core.API_ROUTES, key=lambda route: '<' in route.rule)
+routes = [Route(starlette_path(route.rule), asgi_endpoint(route), methods=list(route.methods))
+          for route in api_routes]
+routes.append(Route('/admin/weekly-editor', admin_weekly_editor, methods=['GET']))
+
+# Same policy as CORS(app, resources={r"/*": {"origins": "*"}}) in app.py
+middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+
+app = Starlette(routes=routes, middleware=middleware)
@@ -0,0 +1,65 @@
+# Versioned card-only catalog snapshot for /api/catalog/bundle. The whole
+# catalog is serialized once per catalog version as a columnar document
+# (column names once, one array per title) and reused until the version
+# changes; ?since=<version> deltas are assembled from catalog_changes.
+import threading
+
+import json_backend
+
+BUNDLE_COLUMNS = ('id', 'title', 'year', 'image', 'type', 'industry', 'genres', 'rating',
+                  'duration')
+
+# Column holding raw JSON text in the content table
+_GENRES = BUNDLE_COLUMNS.index('genres')
+
+
+def bundle_row(row):
+    """List for one BUNDLE_COLUMNS tuple, with the stored genres JSON decoded"""
+    values = list(row)
+    try:
+        values[_GENRES] = json_backend.loads(values[_GENRES] or '[]')
+    except ValueError:
+        values[_GENRES] = []
+    return values
+
+
+def delta_body(version, since, rows, removed):
+    """Delta document: titles changed after `since` and ids removed since then"""
+    return json_backend.dumps({
+        'version': version,
+        'since': since,
+        'columns': BUNDLE_COLUMNS,
+        'changed': [bundle_row(row) for row in rows],
+        'removed': removed,
+    }, newline=True)
+
+
+class CatalogBundle:
+    """Full snapshot body, rebuilt only when the catalog version moves"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (version, body), swapped as one reference
+        self.current = (None, None)
+        self.builds = 0
+
+    def snapshot(self, version, load_rows):
+        """Snapshot body for `version`; load_rows() yields BUNDLE_COLUMNS tuples"""
+        built_version, body = self.current
+        if built_version == version:
+            return body
+        with self.lock:
+            built_version, body = self.current
+            if built_version != version:
+                body = json_backend.dumps({
+                    'version': version,
+                    'columns': BUNDLE_COLUMNS,
+                    'items': [bundle_row(row) for row in load_rows()],
+                }, newline=True)
+                self.current = (version, body)
+                self.builds += 1
+            return body
+
+    def stats(self):
+        version, body = self.current
+        return {'version': version, 'bytes': len(body) if body else 0, 'builds': self.builds}
@@ -0,0 +1,400 @@
+# Catalog loader: streaming JSON parsing and parallel row building for
+# sync_content_from_json(). Kept free of Flask imports so it can run inside
+# worker processes.
+import hashlib
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from json_backend import dumps_column, loads
+
+CONTENT_COLUMNS = ('id', 'title', 'year', 'image', 'description', 'genres', 'cast', 'director',
+                   'rating', 'duration', 'type', 'industry', 'episodes', 'urls', 'download_links')
+
+# Characters read per chunk while streaming a catalog file
+READ_CHUNK_SIZE = 64 * 1024
+
+# Files up to this size are decoded in one go, which is several times faster
+# than streaming with the stdlib decoder; larger ones are streamed
+WHOLE_FILE_MAX_BYTES = 8 * 1024 * 1024
+
+# Rows per batch handed from a parser to the writer
+PARSE_BATCH_SIZE = 500
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+def dump_json_field(value, empty):
+    """Serialize a JSON column, skipping the encoder for empty values"""
+    if not value:
+        return empty
+    return dumps_column(value)
+
+
+def content_row_from_item(item):
+    """Build the content column values for a catalog item.
+
+    Episodes are stored in content_episodes, so the episodes column is
+    left empty.
+    """
+    get = item.get
+    return (
+        get('id'),
+        get('title'),
+        get('year'),
+        get('image'),
+        get('description'),
+        dump_json_field(get('genres'), '[]'),
+        dump_json_field(get('cast'), '[]'),
+        get('director'),
+        get('rating'),
+        get('duration'),
+        get('type', 'movie'),
+        get('industry', 'Unknown'),
+        None,
+        dump_json_field(get('urls'), '{}'),
+        dump_json_field(get('download_links'), '{}')
+    )
+
+
+def split_names(value):
+    """Normalize a genres/cast/director field to a de-duplicated list of names.
+
+    Accepts lists as well as comma-separated strings (directors are stored
+    as "A, B" in most catalog files).
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    names = []
+    for name in value:
+        if isinstance(name, str):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+_SEASON_TITLE = re.compile(r'\(Season (\d+)\)', re.IGNORECASE)
+
+
+def episode_rows_from_item(item):
+    """(position, season, episode_number, title, episode) rows for content_episodes.
+
+    Catalog files hold one season per item, so episodes without their own
+    season take the item's season field or a "(Season N)" title suffix,
+    defaulting to 1. The writer encodes each episode dict's links (see
+    url_templates) before storing it.
+    """
+    episodes = item.get('episodes')
+    if not isinstance(episodes, list):
+        return []
+    item_season = str(item.get('season') or '').strip()
+    if not item_season.isdigit():
+        match = _SEASON_TITLE.search(item.get('title') or '')
+        item_season = match.group(1) if match else '1'
+    item_season = int(item_season)
+    rows = []
+    for position, episode in enumerate(episodes):
+        if not isinstance(episode, dict):
+            continue
+        season = episode.get('season')
+        number = episode.get('episode_number')
+        rows.append((
+            position,
+            season if isinstance(season, int) else item_season,
+            number if isinstance(number, int) else None,
+            episode.get('title'),
+            episode,
+        ))
+    return rows
+
+
+def content_relations_from_item(item):
+    """(genres, cast, directors, episodes) rows for the normalized tables"""
+    return (split_names(item.get('genres')),
+            split_names(item.get('cast')),
+            split_names(item.get('director')),
+            episode_rows_from_item(item))
+
+
+def hash_content_row(row, episodes=None):
+    """Fingerprint a content row and its episodes so unchanged items can be skipped"""
+    values = row + (dump_json_field(episodes, '[]'),)
+    return hashlib.sha1('\x1f'.join('' if v is None else str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+def hash_file(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _JSONStream:
+    """Incremental reader over a text file for decoding one value at a time"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        if self.pos > READ_CHUNK_SIZE and self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ''
+            self._fill(READ_CHUNK_SIZE)
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next complete JSON value, reading more input as needed"""
+        self.peek()
+        size = READ_CHUNK_SIZE
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Value straddles the buffer end; grow reads so huge items stay linear
+                self._fill(size)
+                size *= 2
+                continue
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                # A number may continue past the buffer end
+                self._fill(READ_CHUNK_SIZE)
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        """Yield the elements of the array starting at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos - 1}")
+
+
+def _load_catalog_items(path):
+    """Items of a whole catalog file, or None if it needs the streaming decoder"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        value = loads(data)
+    except ValueError:
+        # orjson rejects NaN and very large integers that json accepts;
+        # the streaming path decides whether the file is really invalid
+        return None
+    if isinstance(value, dict):
+        value = value.get('movies', [])
+        return value if isinstance(value, list) else []
+    return value if isinstance(value, list) else None
+
+
+def iter_catalog_items(path):
+    """Stream catalog items from a JSON file one at a time.
+
+    Handles both top-level arrays and objects holding a 'movies' array.
+    Files above WHOLE_FILE_MAX_BYTES are streamed so only one item is
+    materialized at a time regardless of file size.
+    """
+    if os.path.getsize(path) <= WHOLE_FILE_MAX_BYTES:
+        items = _load_catalog_items(path)
+        if items is not None:
+            yield from items
+            return
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JSONStream(f)
+        first = stream.peek()
+        if first == '[':
+            yield from stream.iter_array()
+            return
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(':')
+            if key == 'movies' and stream.peek() == '[':
+                yield from stream.iter_array()
+            else:
+                stream.decode()
+            char = stream.peek()
+            stream.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' at offset {stream.pos - 1}")
+
+
+def _last_positions(items):
+    """{id: position of its last copy} over catalog items"""
+    last = {}
+    for position, item in enumerate(items):
+        content_id = item.get('id') if isinstance(item, dict) else None
+        if content_id:
+            last[content_id] = position
+    return last
+
+
+def iter_last_copies(path):
+    """Catalog items of path, keeping only the last copy of an id the file
+    lists more than once (the copy a full load ends up with).
+
+    Small files are decoded once; streamed files are read twice, the first
+    pass only noting where each id last appears.
+    """
+    items = None
+    if os.path.getsize(path) <= WHOLE_FILE_MAX_BYTES:
+        items = _load_catalog_items(path)
+    if items is None:
+        last = _last_positions(iter_catalog_items(path))
+        items = iter_catalog_items(path)
+    else:
+        last = _last_positions(items)
+    for position, item in enumerate(items):
+        content_id = item.get('id') if isinstance(item, dict) else None
+        if not content_id or last[content_id] == position:
+            yield item
+
+
+def parse_catalog_file(path, known_hash=None, batch_size=PARSE_BATCH_SIZE):
+    """Parse one catalog file into batches of (row, item_hash, relations) tuples.
+
+    Ids listed more than once in the file yield only their last copy.
+    Yields ('rows', batch) messages followed by a final ('done', info)
+    message. When the file content hash equals known_hash the file is not
+    parsed and info['unchanged'] is True.
+    """
+    content_hash = hash_file(path)
+    info = {'content_hash': content_hash, 'unchanged': content_hash == known_hash,
+            'missing_id': 0, 'errors': 0}
+    if info['unchanged']:
+        yield 'done', info
+        return
+
+    batch = []
+    for item in iter_last_copies(path):
+        try:
+            row = content_row_from_item(item)
+            relations = content_relations_from_item(item)
+        except Exception as e:
+            print(f"Error syncing item {item.get('id', 'unknown') if isinstance(item, dict) else 'unknown'}: {e}")
+            info['errors'] += 1
+            continue
+        if not row[0]:
+            info['missing_id'] += 1
+            continue
+        batch.append((row, hash_content_row(row, item.get('episodes')), relations))
+        if len(batch) >= batch_size:
+            yield 'rows', batch
+            batch = []
+    if batch:
+        yield 'rows', batch
+    yield 'done', info
+
+
+def read_catalog_items(path, content_ids):
+    """Re-parse path for the given ids; {id: (row, item_hash, relations)}"""
+    found = {}
+    for kind, payload in parse_catalog_file(path):
+        if kind == 'rows':
+            for row, item_hash, relations in payload:
+                if row[0] in content_ids:
+                    found[row[0]] = (row, item_hash, relations)
+    return found
+
+
+_worker_queue = None
+
+
+def _init_worker(queue):
+    global _worker_queue
+    _worker_queue = queue
+
+
+def _parse_worker(index, path, known_hash, batch_size):
+    """Process-pool entry point: stream a file's batches onto the shared queue"""
+    try:
+        for kind, payload in parse_catalog_file(path, known_hash, batch_size):
+            _worker_queue.put((index, kind, payload))
+    except Exception as e:
+        _worker_queue.put((index, 'error', str(e)))
+
+
+def iter_parsed_files(jobs, workers=None, batch_size=PARSE_BATCH_SIZE):
+    """Parse catalog files, yielding (index, kind, payload) messages.
+
+    jobs is a list of (path, known_hash). With more than one worker the
+    files are parsed concurrently in a process pool while the caller (the
+    single SQLite writer) consumes batches as they arrive; the bounded queue
+    keeps memory flat when parsing outruns writing.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for index, (path, known_hash) in enumerate(jobs):
+            try:
+                for kind, payload in parse_catalog_file(path, known_hash, batch_size):
+                    yield index, kind, payload
+            except Exception as e:
+                yield index, 'error', str(e)
+        return
+
+    # Fork avoids re-importing the app's main module in every worker; the
+    # workers never touch inherited SQLite handles
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    queue = ctx.Queue(maxsize=workers * 4)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(queue,)) as pool:
+        futures = [pool.submit(_parse_worker, index, path, known_hash, batch_size)
+                   for index, (path, known_hash) in enumerate(jobs)]
+        pending = len(jobs)
+        while pending:
+            try:
+                index, kind, payload = queue.get(timeout=1)
+            except queue_module.Empty:
+                # Surface worker crashes instead of waiting forever
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise future.exception()
+                continue
+            if kind in ('done', 'error'):
+                pending -= 1
+            yield index, kind, payload
+        for future in futures:
+            future.result()
@@ -0,0 +1,108 @@
+# Materialized per-category ranked lists for /api/content/by-category.
+# Each industry and type value gets a list ordered like the old query
+# (watch_count DESC, created_at DESC) so a rail is a slice of an array.
+import bisect
+import hashlib
+import threading
+import time
+
+
+def page_etag(catalog_version, cards, next_after, kind='category'):
+    """ETag derived from a page's content, so every worker tags equal bodies
+    alike. Card fields other than watch_count only change with the catalog
+    version.
+    """
+    digest = hashlib.sha1(f"{catalog_version}|{next_after}".encode('utf-8'))
+    for card in cards:
+        digest.update(f"|{card.id}:{card.watch_count}".encode('utf-8'))
+    return f"{kind}-{digest.hexdigest()[:16]}"
+
+
+class CategoryRankings:
+    """In-memory ranked lists per industry/type with cursor pagination.
+
+    Every item has one sort key (-watch_count, -created order, id) shared by
+    all lists it belongs to, so a cursor id can be turned back into a bisect
+    position in O(log n) and a watch_count change repositions the item
+    without re-sorting.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.lists = {}
+        self.keys = {}
+        self.items = {}
+        self.memberships = {}
+        self.built_at = None
+        # Bumped on every change (reported in stats)
+        self.generation = 0
+
+    def rebuild(self, items):
+        """Rebuild from (card, created_at) pairs of content_cards.ContentCard"""
+        items = list(items)
+        # created_at DESC becomes an ascending integer so keys stay numeric
+        by_created = sorted(range(len(items)), key=lambda i: items[i][1] or '', reverse=True)
+        created_rank = {items[i][0].id: rank for rank, i in enumerate(by_created)}
+
+        lists = {}
+        keys = {}
+        by_id = {}
+        memberships = {}
+        for item, _ in items:
+            content_id = item.id
+            key = (-item.watch_count, created_rank[content_id], content_id)
+            keys[content_id] = key
+            by_id[content_id] = item
+            categories = {item.industry, item.type} - {None}
+            memberships[content_id] = categories
+            for category in categories:
+                lists.setdefault(category, []).append(key)
+        for ranked in lists.values():
+            ranked.sort()
+
+        with self.lock:
+            self.lists, self.keys, self.items, self.memberships = lists, keys, by_id, memberships
+            self.built_at = time.monotonic()
+            self.generation += 1
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def page(self, category, after=None, limit=50):
+        """Items of a category after the cursor id; returns (items, next_cursor)"""
+        with self.lock:
+            ranked = self.lists.get(category)
+            if not ranked:
+                return [], None
+            start = 0
+            if after:
+                key = self.keys.get(after)
+                if key is None:
+                    return [], None
+                start = bisect.bisect_right(ranked, key)
+            window = ranked[start:start + limit]
+            page = [self.items[key[2]] for key in window]
+            has_more = start + limit < len(ranked)
+        return page, (window[-1][2] if window and has_more else None)
+
+    def bump(self, content_id, delta=1):
+        """Apply a watch_count change by moving the item within its lists"""
+        with self.lock:
+            old_key = self.keys.get(content_id)
+            if old_key is None:
+                return
+            new_key = (old_key[0] - delta,) + old_key[1:]
+            for category in self.memberships[content_id]:
+                ranked = self.lists[category]
+                index = bisect.bisect_left(ranked, old_key)
+                if index < len(ranked) and ranked[index] == old_key:
+                    del ranked[index]
+                bisect.insort(ranked, new_key)
+            self.keys[content_id] = new_key
+            self.items[content_id] = self.items[content_id].with_watch_count(-new_key[0])
+            self.generation += 1
+
+    def stats(self):
+        return {'categories': len(self.lists), 'items': len(self.items),
+                'generation': self.generation}
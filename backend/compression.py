@@ -0,0 +1,188 @@
+# ASGI response compression for server.py. Negotiates br (when the brotli
+# package is installed) or gzip from Accept-Encoding. Responses carrying an
+# ETag are compressed once per (URL, ETag, encoding) and the compressed
+# bytes are kept in a byte-bounded LRU, so repeated catalog responses are
+# served without recompressing.
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+# Per-response effort: cached bodies are compressed once, so they can
+# afford a slower, denser setting than bodies compressed on every request
+GZIP_LEVEL = 6
+GZIP_CACHED_LEVEL = 9
+BROTLI_QUALITY = 5
+BROTLI_CACHED_QUALITY = 9
+
+
+def parse_accept_encoding(value):
+    """{coding: q} from an Accept-Encoding header value"""
+    codings = {}
+    for part in value.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding):
+    """Best supported coding for an Accept-Encoding value, or None"""
+    codings = parse_accept_encoding(accept_encoding)
+    wildcard = codings.get('*', 0.0)
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding, cached=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_CACHED_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+def weaken_etag(headers):
+    """Headers with a strong ETag turned into a weak one"""
+    return [(name, b'W/' + value if name.lower() == b'etag' and not value.startswith(b'W/')
+             else value) for name, value in headers]
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size,
+                'hits': self.hits, 'misses': self.misses}
+
+
+class CompressionMiddleware:
+    """Compress compressible 200 responses of at least minimum_size bytes.
+
+    The ETag of a compressed response is made weak (as nginx does), so
+    If-None-Match revalidation keeps working for every encoding.
+    """
+
+    def __init__(self, app, minimum_size=1024, cache_bytes=32 * 1024 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache(cache_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                encoding = choose_encoding(value.decode('latin-1'))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                headers = {name.lower(): value for name, value in message.get('headers', [])}
+                if message['status'] == 304:
+                    # Revalidation of a body this client received compressed
+                    await send({**message, 'headers': weaken_etag(message.get('headers', []))})
+                    return
+                content_type = headers.get(b'content-type', b'').decode('latin-1')
+                if (message['status'] != 200 or b'content-encoding' in headers
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    await send(message)
+                    return
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            await self.send_response(scope, encoding, start, b''.join(chunks), send)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def send_response(self, scope, encoding, start, body, send):
+        headers = [(name, value) for name, value in start.get('headers', [])
+                   if name.lower() not in (b'content-length', b'vary')]
+        vary = [value for name, value in start.get('headers', []) if name.lower() == b'vary']
+        headers.append((b'vary', b', '.join(vary + [b'Accept-Encoding'])))
+
+        if len(body) < self.minimum_size:
+            headers.append((b'content-length', str(len(body)).encode()))
+            await send({**start, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        etag = next((value for name, value in headers if name.lower() == b'etag'), None)
+        if etag is not None:
+            key = (scope['path'], scope.get('query_string', b''), etag, encoding)
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = compress(body, encoding, cached=True)
+                self.cache.put(key, compressed)
+            headers = weaken_etag(headers)
+        else:
+            compressed = compress(body, encoding)
+
+        headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'content-length', str(len(compressed)).encode()))
+        await send({**start, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': compressed})
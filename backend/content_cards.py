@@ -0,0 +1,74 @@
+# Card projection for list endpoints (by-category, by-genre, by-person,
+# search). Only the columns a content card shows are selected, rows are
+# fetched as plain tuples into __slots__ records, and a page is serialized
+# by splicing strings instead of building a dict per row. The large
+# episodes/urls/download_links blobs stay behind /api/content/detail.
+from json import dumps
+from json.encoder import encode_basestring
+
+CARD_COLUMNS = ('id', 'title', 'year', 'image', 'type', 'industry', 'genres', 'rating',
+                'duration', 'watch_count')
+
+
+def card_columns(alias=None):
+    """SELECT list for the card columns, optionally qualified by a table alias"""
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(prefix + column for column in CARD_COLUMNS)
+
+
+def card_cursor(db):
+    """Cursor that yields tuples instead of sqlite3.Row objects"""
+    cursor = db.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def json_value(value):
+    """JSON for a scalar column, as the app's JSON provider writes it"""
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return encode_basestring(value)
+    return dumps(value)
+
+
+class ContentCard:
+    """One content row in card projection; built from a CARD_COLUMNS tuple"""
+
+    __slots__ = CARD_COLUMNS
+
+    def __init__(self, id, title, year, image, type, industry, genres, rating, duration,
+                 watch_count):
+        self.id = id
+        self.title = title
+        self.year = year
+        self.image = image
+        self.type = type
+        self.industry = industry
+        # Raw JSON text as written by the catalog loader
+        self.genres = genres or '[]'
+        self.rating = rating
+        self.duration = duration
+        self.watch_count = watch_count or 0
+
+    def with_watch_count(self, watch_count):
+        return ContentCard(self.id, self.title, self.year, self.image, self.type, self.industry,
+                           self.genres, self.rating, self.duration, watch_count)
+
+    def to_json(self):
+        # Keys in sorted order, matching the app's JSON provider
+        return (f'{{"duration":{json_value(self.duration)},"genres":{self.genres},'
+                f'"id":{json_value(self.id)},"image":{json_value(self.image)},'
+                f'"industry":{json_value(self.industry)},"rating":{json_value(self.rating)},'
+                f'"title":{json_value(self.title)},"type":{json_value(self.type)},'
+                f'"watch_count":{self.watch_count},"year":{json_value(self.year)}}}')
+
+
+def fetch_cards(cursor):
+    """ContentCards for the remaining rows of a card_cursor() query"""
+    return [ContentCard(*row) for row in cursor]
+
+
+def cards_json(cards):
+    """Response body for a list of cards, formatted like jsonify()"""
+    return ('[' + ','.join([card.to_json() for card in cards]) + ']\n').encode('utf-8')
@@ -0,0 +1,209 @@
+# SQLite connection management: a bounded pool of read-only connections
+# and a single writer thread that applies every mutation in order. With the
+# database in WAL mode readers never wait on the writer, and funnelling
+# writes through one connection avoids SQLITE_BUSY between request threads.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No read connection became free within the pool timeout"""
+
+
+class ReadPool:
+    """At most `size` read connections, borrowed per thread with reading().
+
+    connect() opens a new connection; connections are created on demand
+    and the most recently returned one is handed out first so its page
+    cache is warm. Borrowing is reentrant: nested reading() blocks in the
+    same thread share the outer connection.
+    """
+
+    def __init__(self, connect, size, timeout):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.opened = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def current(self):
+        """The connection borrowed by this thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            raise RuntimeError('No database connection borrowed by this thread')
+        return conn
+
+    @contextmanager
+    def reading(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self.local.conn = conn
+        try:
+            yield conn
+        finally:
+            self.local.conn = None
+            self._release(conn)
+
+    def _acquire(self):
+        with self.lock:
+            self.checkouts += 1
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            create = self.opened < self.size
+            if create:
+                self.opened += 1
+        if create:
+            try:
+                return self.connect()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self.lock:
+                self.timeouts += 1
+            raise PoolTimeout(f'No database connection free after {self.timeout}s')
+        waited = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.waits += 1
+            self.total_wait_ms += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self.idle.put(conn)
+
+    def close(self):
+        """Close idle connections (borrowed ones are closed when returned later)"""
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            with self.lock:
+                self.opened -= 1
+            conn.close()
+
+    def stats(self):
+        with self.lock:
+            idle = self.idle.qsize()
+            return {
+                'size': self.size,
+                'open': self.opened,
+                'idle': idle,
+                'inUse': self.opened - idle,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avgWaitMs': round(self.total_wait_ms / self.waits, 2) if self.waits else 0.0,
+                'maxWaitMs': round(self.max_wait_ms, 2),
+            }
+
+
+class WriteQueue:
+    """Applies write jobs one at a time on a dedicated thread and connection.
+
+    run(fn, *args) queues fn(conn, *args), waits for it and returns its
+    result. The job's changes are committed when it returns and rolled back
+    when it raises; the exception is re-raised in the caller. Jobs queued
+    from inside a job run inline.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.conn = None
+        self.writes = 0
+        self.failures = 0
+        self.last_write_ms = 0.0
+        self.max_write_ms = 0.0
+        self.total_write_ms = 0.0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self.thread.start()
+
+    def run(self, fn, *args):
+        if threading.current_thread() is self.thread:
+            return fn(self.conn, *args)
+        if self.thread is None:
+            self.start()
+        future = Future()
+        self.jobs.put((fn, args, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            fn, args, future = job
+            start = time.perf_counter()
+            try:
+                if self.conn is None:
+                    self.conn = self.connect()
+                result = fn(self.conn, *args)
+                self.conn.commit()
+            except BaseException as e:
+                if self.conn is not None:
+                    self.conn.rollback()
+                self.failures += 1
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.writes += 1
+            self.last_write_ms = elapsed
+            self.max_write_ms = max(self.max_write_ms, elapsed)
+            self.total_write_ms += elapsed
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def is_alive(self):
+        """False only when the writer thread was started and has died"""
+        return self.thread is None or self.thread.is_alive()
+
+    def stop(self):
+        """Finish queued jobs and stop the writer thread (used at exit)"""
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def stats(self):
+        return {
+            'queueDepth': self.jobs.qsize(),
+            'writes': self.writes,
+            'failures': self.failures,
+            'lastWriteMs': round(self.last_write_ms, 2),
+            'maxWriteMs': round(self.max_write_ms, 2),
+            'avgWriteMs': round(self.total_write_ms / self.writes, 2) if self.writes else 0.0,
+            'alive': self.is_alive(),
+        }
@@ -0,0 +1,53 @@
+# JSON encoding shared by the API responses and the catalog loader. Uses
+# orjson when it is installed and the stdlib json module otherwise; both
+# paths produce the same compact UTF-8 output. Kept free of Flask imports
+# so the catalog loader can use it inside worker processes.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+if orjson is not None:
+    # Dates go through the caller's default() so responses keep the
+    # HTTP-date format of Flask's provider
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    _SORTED = orjson.OPT_SORT_KEYS
+    _NEWLINE = orjson.OPT_APPEND_NEWLINE
+
+
+def _stdlib_dumps(obj, default, sort_keys, newline):
+    text = json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False,
+                      separators=(',', ':'))
+    return (text + '\n' if newline else text).encode('utf-8')
+
+
+def dumps(obj, default=None, sort_keys=True, newline=False):
+    """Compact UTF-8 JSON bytes for obj"""
+    if orjson is None:
+        return _stdlib_dumps(obj, default, sort_keys, newline)
+    option = _OPTIONS
+    if sort_keys:
+        option |= _SORTED
+    if newline:
+        option |= _NEWLINE
+    try:
+        return orjson.dumps(obj, default=default, option=option)
+    except TypeError:
+        # Values orjson rejects, e.g. integers wider than 64 bits
+        return _stdlib_dumps(obj, default, sort_keys, newline)
+
+
+def loads(data):
+    """Decode JSON from str or bytes; raises json.JSONDecodeError (a ValueError)"""
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def dumps_column(value):
+    """JSON text for a catalog column, keys in their original order"""
+    return dumps(value, sort_keys=False).decode('utf-8')
@@ -0,0 +1,261 @@
+# In-process metrics served in the Prometheus text format by /api/metrics.
+# Recording is lock-free: every thread writes only to its own shard (request
+# counts, latency histograms, SQLite query counts and time), and a scrape
+# sums the shards. Shards are registered once per thread and kept after the
+# thread exits so counters never go backwards. Gauges that already live
+# elsewhere (pool, caches, catalog) come from collectors called at scrape
+# time.
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latency histogram bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Route label for queries run outside a request (writer thread, sync, timers)
+BACKGROUND = 'background'
+
+
+class _Shard:
+    """Counters owned and written by a single thread"""
+
+    def __init__(self, thread_name, bucket_count):
+        self.thread = thread_name
+        self.bucket_count = bucket_count
+        self.route = None
+        # (route, method, status) -> count
+        self.requests = {}
+        # (route, method) -> [count per bucket..., count above the last bound, sum]
+        self.latency = {}
+        # route -> [queries, seconds]
+        self.queries = {}
+        self.connections_opened = 0
+        # Opening thread name -> connections this thread closed
+        self.connections_closed = {}
+
+
+class Metrics:
+    """Per-thread request and SQLite counters plus scrape-time collectors.
+
+    collectors registered with register() return (name, type, help,
+    samples) tuples, samples being (labels dict, value) pairs.
+    """
+
+    def __init__(self, namespace='streaming', buckets=LATENCY_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.local = threading.local()
+        # Guards shard registration and the collector list only
+        self.lock = threading.Lock()
+        self.shards = []
+        self.collectors = []
+        self.connection_class = connection_class(self)
+
+    def shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = _Shard(threading.current_thread().name, len(self.buckets) + 1)
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def register(self, collect):
+        with self.lock:
+            self.collectors.append(collect)
+
+    def start_request(self, route):
+        """Attribute this thread's queries to route until finish_request()"""
+        shard = self.shard()
+        shard.route = route
+        return time.perf_counter()
+
+    def finish_request(self, route, method, status, started):
+        seconds = time.perf_counter() - started
+        shard = self.shard()
+        shard.route = None
+        key = (route, method)
+        entry = shard.latency.get(key)
+        if entry is None:
+            entry = shard.latency[key] = [0] * shard.bucket_count + [0.0]
+        entry[bisect_left(self.buckets, seconds)] += 1
+        entry[-1] += seconds
+        key = (route, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+
+    def observe_query(self, seconds):
+        shard = self.shard()
+        route = shard.route or BACKGROUND
+        entry = shard.queries.get(route)
+        if entry is None:
+            entry = shard.queries[route] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def connection_opened(self):
+        """Count a new connection; returns the opening thread's name"""
+        shard = self.shard()
+        shard.connections_opened += 1
+        return shard.thread
+
+    def connection_closed(self, opened_by):
+        closed = self.shard().connections_closed
+        closed[opened_by] = closed.get(opened_by, 0) + 1
+
+    def families(self):
+        """(name, type, help, samples) for every metric, shards summed"""
+        with self.lock:
+            shards = list(self.shards)
+            collectors = list(self.collectors)
+
+        requests = {}
+        latency = {}
+        queries = {}
+        connections = {}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, so the owner can keep writing
+            for key, count in shard.requests.copy().items():
+                requests[key] = requests.get(key, 0) + count
+            for key, entry in shard.latency.copy().items():
+                total = latency.setdefault(key, [0] * len(entry))
+                for i, value in enumerate(list(entry)):
+                    total[i] += value
+            for route, (count, seconds) in shard.queries.copy().items():
+                total = queries.setdefault(route, [0, 0.0])
+                total[0] += count
+                total[1] += seconds
+            connections[shard.thread] = connections.get(shard.thread, 0) + shard.connections_opened
+            for thread, count in shard.connections_closed.copy().items():
+                connections[thread] = connections.get(thread, 0) - count
+
+        yield ('http_requests_total', 'counter', 'API requests by route, method and status.',
+               [({'route': route, 'method': method, 'status': str(status)}, count)
+                for (route, method, status), count in sorted(requests.items())])
+        yield ('http_request_duration_seconds', 'histogram',
+               'API handler latency including the database connection checkout.',
+               [({'route': route, 'method': method}, entry)
+                for (route, method), entry in sorted(latency.items())])
+        yield ('sqlite_queries_total', 'counter', 'SQLite statements executed, by route.',
+               [({'route': route}, entry[0]) for route, entry in sorted(queries.items())])
+        yield ('sqlite_query_seconds_total', 'counter',
+               'Time spent in SQLite execute calls, by route.',
+               [({'route': route}, entry[1]) for route, entry in sorted(queries.items())])
+        yield ('sqlite_connections', 'gauge', 'Open SQLite connections by the thread that opened them.',
+               [({'thread': thread}, count) for thread, count in sorted(connections.items()) if count])
+        for collect in collectors:
+            yield from collect()
+
+    def render(self):
+        """Prometheus text exposition of all metrics"""
+        # Collectors may each contribute samples to the same family
+        merged = {}
+        for name, kind, help_text, samples in self.families():
+            merged.setdefault(name, (kind, help_text, []))[2].extend(samples)
+        lines = []
+        for name, (kind, help_text, samples) in merged.items():
+            name = f'{self.namespace}_{name}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if kind == 'histogram':
+                    lines.extend(self._histogram_lines(name, labels, value))
+                else:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _histogram_lines(self, name, labels, entry):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), entry):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            yield f'{name}_bucket{_labels(dict(labels, le=le))} {cumulative}'
+        yield f'{name}_sum{_labels(labels)} {_number(entry[-1])}'
+        yield f'{name}_count{_labels(labels)} {cumulative}'
+
+
+def cache_families(caches):
+    """Lookup counters and hit ratios for {cache name: (hits, misses)}"""
+    lookups = []
+    ratios = []
+    for cache, (hits, misses) in sorted(caches.items()):
+        lookups.append(({'cache': cache, 'result': 'hit'}, hits))
+        lookups.append(({'cache': cache, 'result': 'miss'}, misses))
+        ratios.append(({'cache': cache}, hits / (hits + misses) if hits + misses else 0.0))
+    yield ('cache_lookups_total', 'counter', 'Cache lookups by result.', lookups)
+    yield ('cache_hit_ratio', 'gauge', 'Cache hits over lookups since start.', ratios)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def connection_class(metrics):
+    """sqlite3.Connection subclass (for connect(factory=...)) recording
+    every statement and the opening thread in metrics
+    """
+
+    class Cursor(sqlite3.Cursor):
+        def execute(self, sql, parameters=()):
+            started = time.perf_counter()
+            try:
+                return super().execute(sql, parameters)
+            finally:
+                metrics.observe_query(time.perf_counter() - started)
+
+        def executemany(self, sql, seq_of_parameters):
+            started = time.perf_counter()
+            try:
+                return super().executemany(sql, seq_of_parameters)
+            finally:
+                metrics.observe_query(time.perf_counter() - started)
+
+        def executescript(self, sql_script):
+            started = time.perf_counter()
+            try:
+                return super().executescript(sql_script)
+            finally:
+                metrics.observe_query(time.perf_counter() - started)
+
+    class Connection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.opened_by = metrics.connection_opened()
+
+        def cursor(self, factory=Cursor):
+            return super().cursor(factory)
+
+        # The shortcuts below create their cursor without calling cursor()
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+        def executescript(self, sql_script):
+            return self.cursor().executescript(sql_script)
+
+        def close(self):
+            if self.opened_by is not None:
+                metrics.connection_closed(self.opened_by)
+                self.opened_by = None
+            super().close()
+
+    return Connection
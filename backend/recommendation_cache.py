@@ -0,0 +1,153 @@
+# Per-user cache of /api/user/recommendations id lists. Entries carry the
+# genre profile they were computed from so that new watches only invalidate
+# them when the profile actually changes. Stores are pluggable: an
+# in-process LRU, or a SQLite cache file shared by every worker on the host.
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryStore:
+    """Bounded in-process LRU of key -> (value, expires)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires):
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteStore:
+    """key -> (value, expires) rows in a SQLite table shared between processes.
+
+    path should be a database of its own: the store writes on its own
+    connections, outside the application's single database writer.
+    """
+
+    # Expired rows are purged every PRUNE_EVERY writes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, table='recommendation_cache'):
+        self.path = path
+        self.table = table
+        self.local = threading.local()
+        self.writes = 0
+        self._conn().execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        ''')
+
+    def _conn(self):
+        if not hasattr(self.local, 'conn'):
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Entries can be recomputed, so losing the tail on a crash is fine
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self.local.conn = conn
+        return self.local.conn
+
+    def get(self, key):
+        row = self._conn().execute(f'SELECT value, expires FROM {self.table} WHERE key = ?',
+                                   (str(key),)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, expires):
+        conn = self._conn()
+        conn.execute(f'INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)',
+                     (str(key), json.dumps(value), expires))
+        self.writes += 1
+        if self.writes % self.PRUNE_EVERY == 0:
+            conn.execute(f'DELETE FROM {self.table} WHERE expires < ?', (time.time(),))
+
+    def delete(self, key):
+        self._conn().execute(f'DELETE FROM {self.table} WHERE key = ?', (str(key),))
+
+    def __len__(self):
+        return self._conn().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class RecommendationCache:
+    """TTL cache of (ids, profile) per user with hit/miss counters"""
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, user_id):
+        entry = self.store.get(user_id)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry
+
+    def get(self, user_id):
+        """Cached id list for the user, or None"""
+        entry = self._get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0][0]
+
+    def put(self, user_id, ids, profile):
+        self.store.set(user_id, [list(ids), list(profile)], time.time() + self.ttl)
+
+    def invalidate(self, user_id):
+        self.store.delete(user_id)
+        self.invalidations += 1
+
+    def record_watches(self, user_id, content_ids, load_profile):
+        """Apply new watches: drop the entry if the genre profile moved,
+        otherwise just remove the watched titles from the cached list.
+
+        load_profile() returns the user's current profile; it is only
+        called when the user has a live entry.
+        """
+        entry = self._get(user_id)
+        if entry is None:
+            return
+        (ids, cached_profile), expires = entry
+        if list(load_profile()) != cached_profile:
+            self.invalidate(user_id)
+            return
+        watched = set(content_ids)
+        remaining = [content_id for content_id in ids if content_id not in watched]
+        if len(remaining) != len(ids):
+            self.store.set(user_id, [remaining, cached_profile], expires)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.store),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRatio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,320 @@
+# Offline item-to-item recommendation model. Scores title pairs by shared
+# genres, cast and directors plus co-watch signals from user_watches and
+# writes the top-K neighbours of every title to content_neighbors (one row
+# per title holding a JSON list of [neighbor_id, score] pairs), which
+# get_recommendations() merges per request.
+#
+#   python recommender.py [--db streaming.db] [--top-k 20] [--cowatch-window N]
+#
+# Every signal is a sparse item x feature matrix (a user counts as a feature
+# of the titles they watched). Rows are TF-IDF weighted and L2-normalized per
+# signal, so a pair's score is the weighted sum of per-signal cosine
+# similarities. Pairs are generated by walking feature postings in blocks of
+# source titles with plain NumPy; postings are capped to the most popular
+# titles per feature so the work stays linear in the catalog size.
+import argparse
+import gc
+import itertools
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'streaming.db')
+DEFAULT_TOP_K = 20
+
+# Weight of each signal's cosine similarity in the final score
+SIGNAL_WEIGHTS = {'genre': 1.0, 'cast': 1.0, 'director': 1.0, 'cowatch': 2.0}
+
+# Candidate titles walked per feature (most popular first)
+MAX_POSTINGS = {'genre': 40, 'cast': 40, 'director': 40, 'cowatch': 20}
+
+# Co-watch sampling: the most recent distinct titles per user and the most
+# recent viewers per title are kept. The whole watch history is read unless
+# --cowatch-window limits it to the newest rows (reading rows out of SQLite
+# dominates the build on large histories)
+MAX_USER_ITEMS = 20
+MAX_ITEM_USERS = 50
+
+# Source titles scored per block; bounds peak memory
+BLOCK_SIZE = 2048
+
+SIGNAL_QUERIES = {
+    'genre': 'SELECT content_id, genre FROM content_genres',
+    'cast': 'SELECT content_id, name FROM content_cast',
+    'director': 'SELECT content_id, name FROM content_directors',
+}
+
+
+def ragged_arange(starts, counts):
+    """Concatenation of arange(start, start + count) for every pair"""
+    total = int(counts.sum())
+    ends = np.cumsum(counts)
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(ends - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def group_starts(keys):
+    """Start offset of every run of equal values in a sorted array"""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def rank_within_groups(keys):
+    """0-based position of each element within its run of a sorted key array"""
+    starts = group_starts(keys)
+    lengths = np.diff(np.r_[starts, len(keys)])
+    return np.arange(len(keys)) - np.repeat(starts, lengths)
+
+
+def load_items(conn):
+    """Catalog ids in a stable order and their watch counts"""
+    rows = conn.execute('SELECT id, watch_count FROM content ORDER BY rowid').fetchall()
+    ids = [row[0] for row in rows]
+    popularity = np.array([row[1] or 0 for row in rows], dtype=np.float64)
+    return ids, popularity
+
+
+def load_signal(conn, query, index):
+    """(item, feature) index arrays for a content_id/name relation"""
+    rows = conn.execute(query).fetchall()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, 0
+    content_ids, names = zip(*rows)
+    items = np.array(list(map(index.get, content_ids, itertools.repeat(-1))), dtype=np.int64)
+    # setdefault with a running counter interns names in C; unique() then
+    # renumbers the first-seen codes densely
+    features = {}
+    codes = list(map(features.setdefault, map(str.lower, names), itertools.count()))
+    _, codes = np.unique(np.array(codes, dtype=np.int64), return_inverse=True)
+    known = items >= 0
+    return items[known], codes[known], len(features)
+
+
+def load_cowatch(conn, index, window=0):
+    """(item, user) index arrays sampled from the watch history.
+
+    Keeps each user's MAX_USER_ITEMS most recently watched distinct titles
+    and each title's MAX_ITEM_USERS most recent viewers. A non-zero window
+    reads only that many of the newest watch rows.
+    """
+    users, items = [], []
+    get = index.get
+    cursor = conn.execute('SELECT user_id, content_id FROM user_watches ORDER BY id DESC LIMIT ?',
+                          (window or -1,))
+    while True:
+        rows = cursor.fetchmany(100000)
+        if not rows:
+            break
+        chunk_users, chunk_contents = zip(*rows)
+        users.extend(chunk_users)
+        items.extend(map(get, chunk_contents, itertools.repeat(-1)))
+
+    items = np.array(items, dtype=np.int64)
+    known = items >= 0
+    if not known.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, 0
+    items = items[known]
+    _, users = np.unique(np.array(users, dtype=np.int64)[known], return_inverse=True)
+    # Rows arrive newest first
+    recency = -np.arange(len(items))
+
+    # Latest watch of every (user, item) pair
+    pair = users * (int(items.max()) + 1) + items
+    order = np.lexsort((-recency, pair))
+    first = group_starts(pair[order])
+    keep = order[first]
+    users, items, recency = users[keep], items[keep], recency[keep]
+
+    # Most recent titles per user, then most recent viewers per title
+    order = np.lexsort((-recency, users))
+    keep = order[rank_within_groups(users[order]) < MAX_USER_ITEMS]
+    users, items, recency = users[keep], items[keep], recency[keep]
+    order = np.lexsort((-recency, items))
+    keep = order[rank_within_groups(items[order]) < MAX_ITEM_USERS]
+    return items[keep], users[keep], int(users.max()) + 1
+
+
+def build_feature_matrix(signals, n_items, popularity):
+    """Combine per-signal (items, features) into weighted CSR rows and postings.
+
+    Returns (row_ptr, row_features, row_weights) for source titles and
+    (post_ptr, post_items, post_weights) holding, per feature, the most
+    popular titles up to the signal's posting cap.
+    """
+    all_items, all_features, all_weights, all_caps = [], [], [], []
+    offset = 0
+    for name, items, features, n_features in signals:
+        if not len(items):
+            continue
+        # IDF for descriptive features; heavy viewers count less for co-watch
+        if name == 'cowatch':
+            per_user = np.bincount(features, minlength=n_features)
+            weights = 1.0 / np.log2(2.0 + per_user[features])
+        else:
+            df = np.bincount(features, minlength=n_features)
+            weights = np.log1p(n_items / df[features])
+        norms = np.sqrt(np.bincount(items, weights * weights, minlength=n_items))
+        weights = weights / norms[items] * np.sqrt(SIGNAL_WEIGHTS[name])
+
+        all_items.append(items)
+        all_features.append(features + offset)
+        all_weights.append(weights)
+        all_caps.append(np.full(n_features, MAX_POSTINGS[name], dtype=np.int64))
+        offset += n_features
+
+    if not all_items:
+        empty = np.zeros(0, dtype=np.int64)
+        return (np.zeros(n_items + 1, dtype=np.int64), empty, empty.astype(np.float64),
+                np.zeros(1, dtype=np.int64), empty, empty.astype(np.float64))
+
+    items = np.concatenate(all_items)
+    features = np.concatenate(all_features)
+    weights = np.concatenate(all_weights)
+    caps = np.concatenate(all_caps)
+
+    order = np.argsort(items, kind='stable')
+    row_ptr = np.r_[0, np.cumsum(np.bincount(items, minlength=n_items))]
+    row_features, row_weights = features[order], weights[order]
+
+    order = np.lexsort((-popularity[items], features))
+    keep = order[rank_within_groups(features[order]) < caps[features[order]]]
+    post_ptr = np.r_[0, np.cumsum(np.bincount(features[keep], minlength=offset))]
+    return row_ptr, row_features, row_weights, post_ptr, items[keep], weights[keep]
+
+
+def top_neighbors(matrix, n_items, top_k, block_size=BLOCK_SIZE):
+    """Yield (source, neighbor, score) arrays of the top_k neighbours per block"""
+    row_ptr, row_features, row_weights, post_ptr, post_items, post_weights = matrix
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        lo, hi = row_ptr[start], row_ptr[stop]
+        if lo == hi:
+            continue
+        source = np.repeat(np.arange(start, stop), np.diff(row_ptr[start:stop + 1]))
+        features = row_features[lo:hi]
+        weights = row_weights[lo:hi]
+
+        # Expand every (source, feature) entry to the feature's postings
+        counts = post_ptr[features + 1] - post_ptr[features]
+        positions = ragged_arange(post_ptr[features], counts)
+        neighbor = post_items[positions]
+        score = np.repeat(weights, counts) * post_weights[positions]
+        source = np.repeat(source, counts)
+        mask = neighbor != source
+        source, neighbor, score = source[mask], neighbor[mask], score[mask]
+        if not len(source):
+            continue
+
+        # Sum contributions per pair
+        key = (source - start) * n_items + neighbor
+        order = np.argsort(key)
+        key = key[order]
+        starts = group_starts(key)
+        score = np.add.reduceat(score[order], starts)
+        key = key[starts]
+        source, neighbor = key // n_items + start, key % n_items
+
+        # Best top_k per source: one float sort key groups by source and
+        # orders each group by descending score (scores are below span)
+        span = score.max() + 1.0
+        order = np.argsort((source - start) * span - score)
+        order = order[rank_within_groups(source[order]) < top_k]
+        yield source[order], neighbor[order], score[order]
+
+
+def write_neighbors(conn, ids, blocks):
+    """Replace content_neighbors in one transaction; returns neighbours written"""
+    written = 0
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        cursor.execute('DELETE FROM content_neighbors')
+        for source, neighbor, score in blocks:
+            starts = group_starts(source).tolist() + [len(source)]
+            neighbor_ids = [ids[j] for j in neighbor.tolist()]
+            scores = np.round(score, 6).tolist()
+            cursor.executemany(
+                'INSERT INTO content_neighbors (content_id, neighbors) VALUES (?, ?)',
+                ((ids[source[lo]], json.dumps(list(zip(neighbor_ids[lo:hi], scores[lo:hi]))))
+                 for lo, hi in zip(starts, starts[1:])))
+            written += len(source)
+        cursor.execute('''
+            INSERT INTO sync_meta (key, value) VALUES ('neighbors_built_at', ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (str(time.time()),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return written
+
+
+def build_neighbors(conn, top_k=DEFAULT_TOP_K, block_size=BLOCK_SIZE, cowatch_window=0):
+    """Build and store the neighbour lists; returns timing stats"""
+    # Millions of short-lived row tuples otherwise trigger repeated full
+    # garbage collections while loading
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_neighbors(conn, top_k, block_size, cowatch_window)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _build_neighbors(conn, top_k, block_size, cowatch_window):
+    started = time.perf_counter()
+    ids, popularity = load_items(conn)
+    index = {content_id: i for i, content_id in enumerate(ids)}
+    n_items = len(ids)
+
+    signals = []
+    for name, query in SIGNAL_QUERIES.items():
+        signals.append((name,) + load_signal(conn, query, index))
+    signals.append(('cowatch',) + load_cowatch(conn, index, cowatch_window))
+    loaded = time.perf_counter()
+
+    matrix = build_feature_matrix(signals, n_items, popularity)
+    written = write_neighbors(conn, ids, top_neighbors(matrix, n_items, top_k, block_size))
+    finished = time.perf_counter()
+
+    return {
+        'titles': n_items,
+        'watch_pairs': int(len(signals[-1][1])),
+        'neighbors': written,
+        'load_s': round(loaded - started, 2),
+        'build_s': round(finished - loaded, 2),
+        'total_s': round(finished - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build item-to-item recommendation neighbours')
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', DEFAULT_DATABASE_PATH))
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--cowatch-window', type=int, default=0,
+                        help='read only this many of the newest watch rows for co-watch signals (default: all)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        conn.execute('SELECT 1 FROM content_neighbors LIMIT 1')
+    except sqlite3.OperationalError:
+        raise SystemExit(f"❌ {args.db} has no content_neighbors table; start the app once to initialize it")
+
+    window = f"newest {args.cowatch_window} watch rows" if args.cowatch_window else "all watch rows"
+    print(f"🧮 Building recommendation neighbours from {args.db} ({window})...")
+    stats = build_neighbors(conn, args.top_k, args.block_size, args.cowatch_window)
+    conn.close()
+    print(f"✅ {stats['neighbors']} neighbours for {stats['titles']} titles "
+          f"({stats['watch_pairs']} co-watch pairs) in {stats['total_s']}s "
+          f"(load {stats['load_s']}s, build {stats['build_s']}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,53 @@
-# ASGI wrapper for Flask app to work with uvicorn
-from app import app as flask_app
-from werkzeug.middleware.proxy_fix import ProxyFix
+# ASGI entry point for uvicorn. SERVER_MODE selects how the API is served:
+#   wsgi (default) - the Flask app on uvicorn's WSGI adapter, WSGI_THREADS
+#                    request threads
+#   asgi           - the native Starlette app in asgi_app.py (same routes)
+# Both are wrapped in compression.CompressionMiddleware.
+import os
 
-# Wrap Flask app for ASGI
-flask_app.wsgi_app = ProxyFix(flask_app.wsgi_app, x_proto=1, x_host=1)
+from compression import CompressionMiddleware
 
-# Import ASGI adapter
-try:
-    from asgiref.wsgi import WsgiToAsgi
-    app = WsgiToAsgi(flask_app)
-except ImportError:
-    # If asgiref not available, just use Flask directly
-    # Uvicorn can handle WSGI apps
-    app = flask_app
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+# Smallest body worth compressing, and the memory budget for compressed
+# variants of ETag'd responses (set COMPRESSION_MIN_BYTES=0 to compress all)
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_CACHE_MB = int(os.getenv('COMPRESSION_CACHE_MB', 32))
+# Request threads for the Flask app in wsgi mode
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', 8))
+
+if SERVER_MODE == 'asgi':
+    from asgi_app import app
+    app = CompressionMiddleware(app, COMPRESSION_MIN_BYTES, COMPRESSION_CACHE_MB * 1024 * 1024)
+else:
+    from app import app as flask_app
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    # Wrap Flask app for ASGI
+    flask_app.wsgi_app = ProxyFix(flask_app.wsgi_app, x_proto=1, x_host=1)
+
+    # uvicorn's adapter runs requests on its own thread pool. asgiref's
+    # WsgiToAsgi ran them all on one thread and, under asgiref 3.11, failed
+    # about a third of requests reusing a keep-alive connection with
+    # "CurrentThreadExecutor already quit or is broken".
+    from uvicorn.middleware.wsgi import WSGIMiddleware
+    app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+    app = CompressionMiddleware(app, COMPRESSION_MIN_BYTES, COMPRESSION_CACHE_MB * 1024 * 1024)
 
 # Initialize database and sync content on startup
 if __name__ != '__main__':
-    from app import init_database, sync_content_from_json, DATABASE_PATH, JSON_DATA_PATH
-    import os
+    from app import init_database, sync_content_from_json, metrics, view_buffer, DATABASE_PATH, JSON_DATA_PATH
+    from metrics import cache_families
+    
+    def collect_compression_metrics():
+        stats = app.cache.stats()
+        return cache_families({'compression': (stats['hits'], stats['misses'])})
+    
+    metrics.register(collect_compression_metrics)
     
     if not os.path.exists(DATABASE_PATH):
         print("🔨 Initializing database...")
-        init_database()
+    init_database()
     
     if os.path.exists(JSON_DATA_PATH):
         sync_content_from_json()
+    view_buffer.replay_quarantined()
@@ -0,0 +1,165 @@
+# In-memory title index for search-as-you-type suggestions. Built by the
+# catalog sync; serves ranked, typo-tolerant prefix matches without SQLite.
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """Lowercase, strip diacritics and collapse punctuation to single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def max_edits(token):
+    """Typos tolerated for a query token of this length"""
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 5:
+        return 1
+    return 2
+
+
+def prefix_distance(token, word, limit):
+    """Edit distance between token and the closest prefix of word.
+
+    Returns limit + 1 as soon as the distance is known to exceed limit.
+    """
+    n = len(token)
+    width = min(len(word), n + limit)
+    previous = list(range(width + 1))
+    for i in range(1, n + 1):
+        ch = token[i - 1]
+        current = [i]
+        best = i
+        for j in range(1, width + 1):
+            cost = previous[j - 1] + (ch != word[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current.append(cost)
+            if cost < best:
+                best = cost
+        if best > limit:
+            return limit + 1
+        previous = current
+    return min(previous[max(0, n - limit):])
+
+
+class SuggestIndex:
+    """Prefix/edit-distance index over title words for autocomplete.
+
+    Query tokens are matched against the title vocabulary (exact prefixes
+    via bisect over the sorted vocabulary, typos via a bounded prefix edit
+    distance among words sharing the first letter) and matched words are
+    mapped to titles through per-word postings.
+    """
+
+    def __init__(self):
+        self._data = ([], [], [], 0)
+        self._token_cache = {}
+
+    def rebuild(self, entries):
+        """Replace the index contents.
+
+        entries yields (suggestion, title, popularity) where suggestion is
+        the dict returned to clients. The new index is swapped in with a
+        single assignment so concurrent lookups never see a partial build.
+        """
+        docs = []
+        word_docs = defaultdict(set)
+        for suggestion, title, popularity in entries:
+            words = normalize(title).split()
+            if not words:
+                continue
+            doc_id = len(docs)
+            docs.append((suggestion, words[0], len(words), math.log1p(popularity or 0)))
+            for word in words:
+                word_docs[word].add(doc_id)
+        vocabulary = sorted(word_docs)
+        postings = [word_docs[word] for word in vocabulary]
+        self._token_cache = {}
+        self._data = (docs, vocabulary, postings, len(docs))
+
+    def __len__(self):
+        return self._data[3]
+
+    def _match_words(self, data, token):
+        """Vocabulary indexes matching token, mapped to their edit cost"""
+        cache = self._token_cache
+        key = (id(data), token)
+        matches = cache.get(key)
+        if matches is not None:
+            return matches
+
+        vocabulary = data[1]
+        # Exact prefix matches are a contiguous run of the sorted vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        end = bisect.bisect_left(vocabulary, token + '\uffff', start)
+        matches = dict.fromkeys(range(start, end), 0)
+
+        limit = max_edits(token)
+        if limit:
+            first = bisect.bisect_left(vocabulary, token[0])
+            last = bisect.bisect_left(vocabulary, token[0] + '\uffff', first)
+            min_length = len(token) - limit
+            for index in range(first, last):
+                word = vocabulary[index]
+                if start <= index < end or len(word) < min_length:
+                    continue
+                # Every token letter missing from the window costs at least one edit
+                window = word[:len(token) + limit]
+                if sum(ch not in window for ch in token) > limit:
+                    continue
+                cost = prefix_distance(token, word, limit)
+                if cost <= limit:
+                    matches[index] = cost
+
+        if len(cache) > 10000:
+            cache.clear()
+        cache[key] = matches
+        return matches
+
+    def suggest(self, query, limit=8):
+        """Return up to limit suggestions for a partially typed query"""
+        data = self._data
+        docs, vocabulary, postings, size = data
+        tokens = normalize(query).split()
+        if not tokens or not size:
+            return []
+
+        # Per token: doc -> cheapest matching word; every token must match
+        per_token = []
+        for token in tokens:
+            doc_costs = {}
+            for index, cost in self._match_words(data, token).items():
+                for doc_id in postings[index]:
+                    if cost < doc_costs.get(doc_id, 99):
+                        doc_costs[doc_id] = cost
+            if not doc_costs:
+                return []
+            per_token.append(doc_costs)
+
+        per_token.sort(key=len)
+        candidates = per_token[0]
+        scored = []
+        first_token = tokens[0]
+        for doc_id, edits in candidates.items():
+            for doc_costs in per_token[1:]:
+                cost = doc_costs.get(doc_id)
+                if cost is None:
+                    break
+                edits += cost
+            else:
+                suggestion, first_word, length, popularity = docs[doc_id]
+                starts_title = first_word.startswith(first_token)
+                scored.append((edits, not starts_title, -popularity, length, doc_id))
+
+        return [docs[entry[-1]][0] for entry in heapq.nsmallest(limit, scored)]
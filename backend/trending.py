@@ -0,0 +1,194 @@
+# Time-windowed trending for /api/content/trending. Views are counted in
+# hourly buckets covering the longest window, and each window keeps a
+# decayed score per title plus a precomputed top-K list, so a request is a
+# slice of a tuple. Scores use forward decay: a view in hour h adds
+# exp(rate * (h - landmark)), which keeps the ranking equal to an
+# exponentially decayed count without rescoring every title as time passes.
+# Only the bucket that falls out of a window is subtracted when the hour
+# changes.
+import hashlib
+import heapq
+import math
+import threading
+import time
+from collections import Counter
+from operator import itemgetter
+
+SECONDS_PER_HOUR = 3600
+
+# Rescale scores once weights grow past 2**64 so they stay finite
+_RESCALE_AT = 64 * math.log(2)
+
+
+class TrendingWindow:
+    """Decayed per-title scores over the last `hours` hourly buckets"""
+
+    def __init__(self, hours, half_life_hours):
+        self.hours = hours
+        self.rate = math.log(2) / half_life_hours
+        self.landmark = 0
+        self.scores = {}
+        # (top ids, etag), swapped as one reference
+        self.ranked = ((), None)
+
+    def weight(self, hour):
+        return math.exp(self.rate * (hour - self.landmark))
+
+    def add(self, hour, counts):
+        weight = self.weight(hour)
+        scores = self.scores
+        for content_id, count in counts.items():
+            scores[content_id] = scores.get(content_id, 0.0) + count * weight
+
+    def expire(self, hour, counts, oldest_hour):
+        """Remove a bucket's views; titles left without views are dropped"""
+        weight = self.weight(hour)
+        # Any view still in the window adds at least the oldest hour's weight
+        floor = self.weight(oldest_hour) / 2
+        scores = self.scores
+        for content_id, count in counts.items():
+            score = scores.get(content_id, 0.0) - count * weight
+            if score < floor:
+                scores.pop(content_id, None)
+            else:
+                scores[content_id] = score
+
+    def rescale(self, hour):
+        """Move the landmark to `hour` once weights have grown too large"""
+        exponent = self.rate * (hour - self.landmark)
+        if exponent < _RESCALE_AT:
+            return
+        factor = math.exp(-exponent)
+        self.scores = {content_id: score * factor for content_id, score in self.scores.items()}
+        self.landmark = hour
+
+
+class TrendingEngine:
+    """Hourly view buckets feeding one TrendingWindow per window name.
+
+    windows maps a name such as '24h' to (hours, half_life_hours). Views
+    come from user_watches rows handed to ingest(); titles outside the
+    catalog are skipped and short lists are padded with the fallback
+    (lifetime most watched) order.
+    """
+
+    def __init__(self, windows, top_k=100, ttl=30, clock=time.time):
+        self.windows = {name: TrendingWindow(hours, half_life)
+                        for name, (hours, half_life) in windows.items()}
+        self.span = max(window.hours for window in self.windows.values())
+        self.top_k = top_k
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.hour = None
+        self.last_id = 0
+        self.catalog = None
+        self.catalog_version = None
+        self.fallback = ()
+        self.refreshed_at = None
+        self.events = 0
+
+    def current_hour(self):
+        return int(self.clock() // SECONDS_PER_HOUR)
+
+    def cutoff(self):
+        """Unix time of the oldest hour still inside the longest window"""
+        return (self.current_hour() - self.span + 1) * SECONDS_PER_HOUR
+
+    def is_stale(self):
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.ttl
+
+    def set_catalog(self, version, content_ids):
+        """Titles that may be listed; applied by the next ingest()"""
+        with self.lock:
+            self.catalog = set(content_ids)
+            self.catalog_version = version
+
+    def set_fallback(self, content_ids):
+        """Padding order for short lists; applied by the next ingest()"""
+        with self.lock:
+            self.fallback = tuple(content_ids)
+
+    def ingest(self, rows):
+        """Count (id, content_id, unix_time) user_watches rows newer than last_id"""
+        by_hour = {}
+        last_id = self.last_id
+        for row_id, content_id, watched_at in rows:
+            last_id = max(last_id, row_id)
+            if watched_at is None:
+                continue
+            by_hour.setdefault(int(watched_at) // SECONDS_PER_HOUR, Counter())[content_id] += 1
+        with self.lock:
+            self._advance(self.current_hour())
+            for hour, counts in sorted(by_hour.items()):
+                if hour <= self.hour - self.span:
+                    continue
+                # Clock skew between writers must not create future buckets
+                hour = min(hour, self.hour)
+                self.buckets.setdefault(hour, Counter()).update(counts)
+                for window in self.windows.values():
+                    if hour > self.hour - window.hours:
+                        window.add(hour, counts)
+                self.events += sum(counts.values())
+            self.last_id = last_id
+            self.refreshed_at = time.monotonic()
+            self._rank()
+
+    def top(self, name, limit):
+        """(ids, etag) for a window; constant time unless the hour just changed"""
+        window = self.windows[name]
+        hour = self.current_hour()
+        if hour != self.hour:
+            with self.lock:
+                if self._advance(hour):
+                    self._rank()
+        top, etag = window.ranked
+        return top[:limit], etag
+
+    def _advance(self, hour):
+        """Expire buckets that left each window by `hour`; True when anything moved"""
+        if self.hour is None:
+            self.hour = hour
+            for window in self.windows.values():
+                window.landmark = hour
+            return False
+        if hour <= self.hour:
+            return False
+        for window in self.windows.values():
+            # Rescaling first keeps weights finite after a long idle gap
+            window.rescale(hour)
+            oldest = hour - window.hours + 1
+            for bucket_hour, counts in self.buckets.items():
+                if self.hour - window.hours < bucket_hour < oldest:
+                    window.expire(bucket_hour, counts, oldest)
+        for bucket_hour in [h for h in self.buckets if h <= hour - self.span]:
+            del self.buckets[bucket_hour]
+        self.hour = hour
+        return True
+
+    def _rank(self):
+        for window in self.windows.values():
+            scores = window.scores
+            if self.catalog is not None:
+                scores = {content_id: score for content_id, score in scores.items()
+                          if content_id in self.catalog}
+            ranked = [content_id for content_id, _ in
+                      heapq.nlargest(self.top_k, scores.items(), key=itemgetter(1))]
+            if len(ranked) < self.top_k:
+                seen = set(ranked)
+                ranked.extend(content_id for content_id in self.fallback
+                              if content_id not in seen)
+                del ranked[self.top_k:]
+            digest = hashlib.sha1('\n'.join(ranked).encode('utf-8')).hexdigest()[:16]
+            window.ranked = (tuple(ranked), f"trending-{digest}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hour': self.hour,
+                'buckets': len(self.buckets),
+                'events': self.events,
+                'lastWatchId': self.last_id,
+                'windows': {name: len(window.scores) for name, window in self.windows.items()},
+            }
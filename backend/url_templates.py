@@ -0,0 +1,239 @@
+# Template compression for episode streaming/download links. Provider URLs
+# differ only in a few numeric tokens (tmdb/imdb id, season, episode), so
+# each URL is split into a template stored once in url_templates and its
+# parameters, and stored links become [template_id, *params]. URLs without
+# parameters stay plain strings, and links that are not strings at all are
+# wrapped as {"raw": value} so a list from the source file can never pass for
+# an encoded link. Links are expanded again when an episodes response is
+# built.
+import re
+import threading
+from operator import itemgetter
+
+LINK_FIELDS = ('streaming_links', 'download_links')
+
+# Key wrapping non-string link values
+RAW = 'raw'
+
+# Digit runs standing alone between separators, or imdb ids (tt + digits).
+# The separator is consumed rather than looked behind for, which is about
+# twice as fast on long query strings. Both groups are captured so that
+# re.split() returns [text, separator, digits, text, ...].
+_PARAM = re.compile(r'([^A-Za-z0-9](?:tt)?)(\d+)(?![A-Za-z0-9])')
+
+
+def _escape(text):
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def split_url(url):
+    """(template, params) for a URL, or None when it has no parameters.
+
+    The template is a str.format() pattern, so template.format(*params)
+    gives back the URL.
+    """
+    # Digits never contain braces, so escaping up front is the same as
+    # escaping every literal piece
+    pieces = _PARAM.split(_escape(url) if '{' in url or '}' in url else url)
+    if len(pieces) == 1:
+        return None
+    params = pieces[2::3]
+    pieces[2::3] = ['{}'] * len(params)
+    return ''.join(pieces), params
+
+
+def encode_episode(episode, template_id):
+    """Copy of an episode dict with its links template-encoded.
+
+    template_id(template) returns the id for a template, registering it if
+    needed. String links that would not expand back to the exact source URL
+    are kept as they are; other values are wrapped under RAW.
+    """
+    encoded = dict(episode)
+    for field in LINK_FIELDS:
+        links = episode.get(field)
+        if not isinstance(links, dict):
+            continue
+        compact = _encode_shaped_links(links, template_id)
+        if compact is None:
+            compact = {name: _encode_link(url, template_id) for name, url in links.items()}
+        encoded[field] = compact
+    return encoded
+
+
+def _encode_link(url, template_id):
+    split = split_url(url) if isinstance(url, str) else None
+    if split is not None and split[0].format(*split[1]) == url:
+        return [template_id(split[0])] + split[1]
+    if isinstance(url, str):
+        return url
+    return {RAW: url}
+
+
+# Episodes of a title (and titles from the same provider) repeat one set of
+# link templates with different numbers. A links dict is joined into one
+# ASCII string and its digits are masked; whether a digit run is a parameter
+# depends only on the characters around it, so the mask fixes where the
+# parameters are. Per mask those positions are found once with _PARAM, and
+# per mask and literal (non-parameter) digits the templates are worked out
+# once with split_url() and reused. Masks seen only once (download links
+# with random ids, say) are encoded link by link without building a plan.
+# The separator ends in a letter so a URL's leading digits stay literal, and
+# starts with a non-alphanumeric character like the end of a string
+_LINK_JOIN = '\x00a'
+_DIGIT_MASK = bytes.maketrans(b'0123456789', b'0000000000')
+_DIGITS = re.compile(r'[0-9]+')
+# Entries kept per cache before it is cleared
+_SHAPE_CACHE_SIZE = 4096
+_seen_masks = set()
+_link_shapes = {}
+
+
+def _slicer(spans):
+    """Function returning the substrings at spans as a tuple"""
+    if len(spans) > 1:
+        return itemgetter(*[slice(start, end) for start, end in spans])
+    return lambda text: tuple(text[start:end] for start, end in spans)
+
+
+def _link_shape(joined):
+    """(parameter spans, parameter getter, literal getter, {literals: plan})
+    for a joined links string
+    """
+    spans = [match.span(2) for match in _PARAM.finditer(joined)]
+    literal = [match.span() for match in _DIGITS.finditer(joined) if match.span() not in spans]
+    return spans, _slicer(spans), _slicer(literal), {}
+
+
+def _link_plan(joined, spans, params, urls):
+    """[(template or None, parameter count)] per link, or False when
+    split_url() does not agree.
+    """
+    pieces, start = [], 0
+    for param_start, param_end in spans:
+        pieces += [_escape(joined[start:param_start]), '{}']
+        start = param_end
+    pieces.append(_escape(joined[start:]))
+
+    plan, found = [], []
+    for template, url in zip(''.join(pieces).split(_LINK_JOIN), urls):
+        split = split_url(url)
+        if split is None:
+            if template != _escape(url):
+                return False
+            plan.append((None, 0))
+        elif split[0] == template and template.format(*split[1]) == url:
+            plan.append((template, len(split[1])))
+            found += split[1]
+        else:
+            return False
+    return plan if tuple(found) == params else False
+
+
+def _encode_shaped_links(links, template_id):
+    """Encoded links dict through the shape caches, or None to encode link by link"""
+    urls = list(links.values())
+    try:
+        joined = _LINK_JOIN.join(urls)
+    except TypeError:
+        return None
+    if not joined.isascii() or joined.count('\x00') != len(urls) - 1:
+        return None
+    mask = joined.encode().translate(_DIGIT_MASK)
+
+    shape = _link_shapes.get(mask)
+    if shape is None:
+        if mask not in _seen_masks:
+            if len(_seen_masks) >= _SHAPE_CACHE_SIZE:
+                _seen_masks.clear()
+            _seen_masks.add(mask)
+            return None
+        if len(_link_shapes) >= _SHAPE_CACHE_SIZE:
+            _link_shapes.clear()
+        shape = _link_shapes[mask] = _link_shape(joined)
+    spans, param_getter, literal_getter, plans = shape
+    params = param_getter(joined)
+    literals = literal_getter(joined)
+    plan = plans.get(literals)
+    if plan is None:
+        if len(plans) >= _SHAPE_CACHE_SIZE:
+            plans.clear()
+        plan = plans[literals] = _link_plan(joined, spans, params, urls)
+    if plan is False:
+        return None
+
+    compact = {}
+    start = 0
+    for name, url, (template, count) in zip(links, urls, plan):
+        if template is None:
+            compact[name] = url
+        else:
+            compact[name] = [template_id(template), *params[start:start + count]]
+            start += count
+    return compact
+
+
+def template_ids(episode):
+    """Template ids referenced by an encoded episode"""
+    ids = set()
+    for field in LINK_FIELDS:
+        links = episode.get(field)
+        if isinstance(links, dict):
+            ids.update(value[0] for value in links.values() if isinstance(value, list))
+    return ids
+
+
+def _expand_link(value, templates):
+    if isinstance(value, list):
+        return templates[value[0]].format(*value[1:])
+    if isinstance(value, dict):
+        return value[RAW]
+    return value
+
+
+def expand_episode(episode, templates):
+    """Episode dict with encoded links expanded using {id: template}"""
+    for field in LINK_FIELDS:
+        links = episode.get(field)
+        if not isinstance(links, dict):
+            continue
+        episode[field] = {name: _expand_link(value, templates) for name, value in links.items()}
+    return episode
+
+
+class TemplateRegistry:
+    """Writer-side template -> id map for one catalog sync"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        cursor.execute('SELECT template, id FROM url_templates')
+        self.ids = dict(cursor.fetchall())
+
+    def __call__(self, template):
+        template_id = self.ids.get(template)
+        if template_id is None:
+            self.cursor.execute('INSERT INTO url_templates (template) VALUES (?)', (template,))
+            template_id = self.ids[template] = self.cursor.lastrowid
+        return template_id
+
+
+class TemplateCache:
+    """Read-side id -> template map. Templates are never changed once
+    written, so entries stay valid and only unknown ids hit the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.templates = {}
+
+    def lookup(self, cursor, ids):
+        """{id: template} covering ids"""
+        missing = [template_id for template_id in ids if template_id not in self.templates]
+        if missing:
+            placeholders = ','.join('?' for _ in missing)
+            cursor.execute(f'SELECT id, template FROM url_templates WHERE id IN ({placeholders})',
+                           missing)
+            rows = cursor.fetchall()
+            with self.lock:
+                self.templates.update((row[0], row[1]) for row in rows)
+        return self.templates
@@ -0,0 +1,257 @@
+# Write-behind buffer for /api/user/track-view. View increments, watch
+# rows and history updates are aggregated in memory and written by one
+# background thread in a single transaction per flush.
+import json
+import os
+import threading
+import time
+import traceback
+from collections import Counter
+
+# Seconds before retrying a failed flush; doubles per failure in a row
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+
+
+def aggregate(events):
+    """The batch dict flush_fn receives for a list of view events"""
+    views = Counter()
+    watches = []
+    history = {}
+    for user_id, content_id, watch_time, progress, timestamp in events:
+        views[content_id] += 1
+        watches.append((user_id, content_id, watch_time, progress))
+        entries = history.setdefault(user_id, {})
+        # Re-inserting moves the entry to the end, like a fresh watch
+        entries.pop(content_id, None)
+        entries[content_id] = (progress, timestamp)
+    return {'views': views, 'watches': watches, 'history': history}
+
+
+class ViewBuffer:
+    """Aggregates view events and flushes them every interval_ms or max_events.
+
+    flush_fn(batch) receives a dict with:
+      views   - Counter of content_id -> view increments
+      watches - list of (user_id, content_id, watch_time, progress) rows
+      history - {user_id: {content_id: (progress, timestamp)}} in watch order
+    and must apply it atomically. A failed batch is merged back and retried
+    with exponential backoff. After every max_failures failures in a row
+    its events are retried one at a time, in order. Events that still fail on
+    their own are appended to quarantine_path (JSON lines; only logged
+    without one), so one bad event cannot block every later view. If every event fails, the
+    database is assumed to be down and the batch is kept for the next
+    retry. replay_quarantined() queues the quarantined events again.
+
+    after_flush(batch), if given, runs once a batch is written (cache
+    updates and the like). Its failures are logged and never retry the
+    batch. interval_ms <= 0 disables buffering: every record() is flushed
+    inline.
+    """
+
+    def __init__(self, flush_fn, interval_ms=500, max_events=200, after_flush=None,
+                 max_failures=10, quarantine_path=None):
+        self.flush_fn = flush_fn
+        self.after_flush = after_flush
+        self.max_failures = max_failures
+        self.quarantine_path = quarantine_path
+        self.interval = interval_ms / 1000.0
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self._reset()
+        self.retry_at = 0.0
+        self.flushes = 0
+        self.failures = 0
+        self.after_flush_failures = 0
+        self.consecutive_failures = 0
+        self.events_quarantined = 0
+        self.events_replayed = 0
+        self.events_flushed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _reset(self):
+        self.events = []
+        self.users = Counter()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None and not self.stopping:
+                self.thread = threading.Thread(target=self._run, name='view-buffer', daemon=True)
+                self.thread.start()
+
+    def record(self, user_id, content_id, watch_time, progress, timestamp):
+        """Queue one view; never touches the database"""
+        if self.thread is None and self.interval > 0:
+            self.start()
+        with self.lock:
+            self.events.append((user_id, content_id, watch_time, progress, timestamp))
+            self.users[user_id] += 1
+            full = len(self.events) >= self.max_events
+        if self.interval <= 0:
+            self.flush()
+        elif full:
+            self.wakeup.set()
+
+    def has_pending(self, user_id):
+        with self.lock:
+            return user_id in self.users
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(max(self.interval, self.retry_at - time.monotonic()))
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self, force=False):
+        """Write everything buffered so far; returns the number of events written.
+
+        While a failed flush is backing off this does nothing unless force
+        is set. Only the write holds flush_lock. after_flush runs once it is
+        released, so it may wait on other resources (a read connection, for
+        one) without blocking threads that want to flush.
+        """
+        with self.flush_lock:
+            if not force and time.monotonic() < self.retry_at:
+                return 0
+            with self.lock:
+                if not self.events:
+                    return 0
+                events = self.events
+                self._reset()
+
+            start = time.perf_counter()
+            try:
+                batch = aggregate(events)
+                self.flush_fn(batch)
+            except Exception:
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures % self.max_failures:
+                    print(f"⚠️ View buffer flush failed, retrying {len(events)} events:")
+                    traceback.print_exc()
+                    self._merge_back(events)
+                    return 0
+                print(f"⚠️ View buffer flush failed {self.consecutive_failures} times in a row, "
+                      f"retrying {len(events)} events one at a time:")
+                traceback.print_exc()
+                events, batch = self._flush_one_by_one(events)
+                if not events:
+                    return 0
+            self.consecutive_failures = 0
+            self.retry_at = 0.0
+
+            elapsed = (time.perf_counter() - start) * 1000
+            count = len(events)
+            self.flushes += 1
+            self.events_flushed += count
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+
+        # The batch is committed from here on: retrying it would apply it twice
+        if self.after_flush is not None:
+            try:
+                self.after_flush(batch)
+            except Exception:
+                print(f"⚠️ View buffer post-flush update failed after writing {count} events:")
+                traceback.print_exc()
+                self.after_flush_failures += 1
+        return count
+
+    def _flush_one_by_one(self, events):
+        """Write events singly; returns (written events, their batch).
+
+        Events that fail are quarantined, unless every one of them failed.
+        """
+        written, failed = [], []
+        for event in events:
+            try:
+                self.flush_fn(aggregate([event]))
+            except Exception:
+                failed.append(event)
+            else:
+                written.append(event)
+
+        if not written:
+            print(f"⚠️ Every buffered view failed on its own, keeping {len(events)} events for the next retry")
+            self._merge_back(events)
+            return [], None
+        if failed:
+            self._quarantine(failed)
+        return written, aggregate(written)
+
+    def _merge_back(self, events):
+        """Put failed events in front of anything recorded since and back off"""
+        with self.lock:
+            self.events = events + self.events
+            self.users.update(user_id for user_id, *_ in events)
+        delay = min(RETRY_DELAY * 2 ** min(self.consecutive_failures - 1, 10), MAX_RETRY_DELAY)
+        self.retry_at = time.monotonic() + delay
+
+    def _quarantine(self, events):
+        self.events_quarantined += len(events)
+        print(f"⚠️ Quarantining {len(events)} view events that cannot be written"
+              + (f" to {self.quarantine_path}" if self.quarantine_path else ''))
+        if self.quarantine_path is None:
+            return
+        lines = ''.join(json.dumps(event) + '\n' for event in events)
+        with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def replay_quarantined(self):
+        """Queue quarantined events again (called at startup); returns how many"""
+        if self.quarantine_path is None or not os.path.exists(self.quarantine_path):
+            return 0
+        # Claim the file first so views quarantined from now on start a new one
+        claimed = f'{self.quarantine_path}.{os.getpid()}.replay'
+        try:
+            os.replace(self.quarantine_path, claimed)
+        except FileNotFoundError:
+            # Another worker claimed it
+            return 0
+        with open(claimed, encoding='utf-8') as f:
+            events = [tuple(json.loads(line)) for line in f if line.strip()]
+        with self.lock:
+            self.events = events + self.events
+            self.users.update(user_id for user_id, *_ in events)
+        os.remove(claimed)
+        self.events_replayed += len(events)
+        if events:
+            print(f"🔁 Replaying {len(events)} quarantined view events")
+        if self.interval > 0:
+            self.start()
+        else:
+            self.flush()
+        return len(events)
+
+    def stop(self):
+        """Stop the flusher thread and write what is left (used at exit)"""
+        self.stopping = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=max(self.interval * 2, 5))
+        self.flush(force=True)
+
+    def stats(self):
+        with self.lock:
+            depth = len(self.events)
+            distinct = len({event[1] for event in self.events})
+        return {
+            'queueDepth': depth,
+            'distinctContent': distinct,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'afterFlushFailures': self.after_flush_failures,
+            'eventsQuarantined': self.events_quarantined,
+            'eventsReplayed': self.events_replayed,
+            'eventsFlushed': self.events_flushed,
+            'lastFlushMs': round(self.last_flush_ms, 2),
+            'maxFlushMs': round(self.max_flush_ms, 2),
+            'avgFlushMs': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
@@ -0,0 +1,351 @@
+# Micro-benchmarks for the hot paths of backend/app.py on synthetic
+# catalogs shaped like jsons/series-data.json. Not collected by pytest; run
+# it directly:
+#
+#   python tests/bench_backend.py                          # 1k, 10k, 100k titles
+#   python tests/bench_backend.py --sizes 1000 --out bench.json
+#   python tests/bench_backend.py --compare bench-main.json --threshold 0.25
+#
+# Each catalog size runs in a fresh subprocess with DATABASE_PATH and
+# JSON_DATA_PATH pointing into a temporary directory, so app-level caches
+# and pools start cold and the real streaming.db is never touched. The
+# JSON report holds per-benchmark timings (ms) keyed by size; --compare
+# checks the medians against an earlier report and exits 1 on regressions.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, 'backend')
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.2
+# Titles per synthetic catalog file
+FILE_SIZE = 10000
+# Parser process counts timed for catalog parsing alone
+PARSE_WORKERS = (1, 2, 4)
+
+GENRES = ('Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Drama', 'Family', 'Fantasy',
+          'Horror', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller')
+INDUSTRIES = ('Hollywood', 'Bollywood', 'Korean', 'South', 'Anime', 'Gujarati')
+WORDS = ('shadow', 'river', 'empire', 'night', 'storm', 'garden', 'signal', 'winter', 'crown',
+         'echo', 'harbor', 'legend', 'circuit', 'ember', 'frontier', 'mirror', 'orbit', 'summit',
+         'tide', 'voyage', 'cipher', 'falcon', 'lantern', 'meadow', 'phantom', 'quarry', 'relic')
+FIRST_NAMES = ('Alice', 'Ravi', 'Min-jun', 'Lucia', 'Omar', 'Priya', 'Kenji', 'Sofia', 'Arjun',
+               'Hana', 'Mateo', 'Zara', 'Leo', 'Ananya', 'Yuki', 'Noah')
+LAST_NAMES = ('Kapoor', 'Kim', 'Garcia', 'Sato', 'Nair', 'Rossi', 'Haddad', 'Park', 'Singh',
+              'Moreau', 'Silva', 'Tanaka', 'Iyer', 'Novak', 'Osei', 'Berg')
+
+# Provider links with the same shape as the catalog files
+STREAMING_LINKS = {
+    'Vidk': 'https://www.vidking.net/embed/tv/{tmdb}/{season}/{episode}?autoPlay=true&nextEpisode=true&episodeSelector=true',
+    'VidP': 'https://player.vidplus.to/embed/tv/{tmdb}/{season}/{episode}?autoplay=true&autonext=true&nextbutton=true&poster=true&title=true&download=true&watchparty=true&chromecast=true&episodelist=true&servericon=true&setting=true&pip=true&icons=netflix&primarycolor=FF6161&secondarycolor=FF9999&iconcolor=FFFFFF&font=Roboto&fontcolor=FFFFFF&fontsize=20&opacity=0.5',
+    'Videa': 'https://player.videasy.net/tv/{tmdb}/{season}/{episode}',
+    'Vidf': 'https://vidfast.pro/tv/{imdb}/{season}/{episode}',
+    'Mapple': 'https://mappletv.uk/watch/tv/{tmdb}-{season}-{episode}',
+    'Vidme': 'https://vidsrc.me/embed/tv?imdb={imdb}&season={season}&episode={episode}',
+    'Vidsrc': 'https://vidsrc.to/embed/tv/{imdb}/{season}/{episode}',
+}
+MOVIE_LINKS = {
+    'Vidk': 'https://www.vidking.net/embed/movie/{tmdb}',
+    'Videa': 'https://player.videasy.net/movie/{tmdb}',
+    'Vidf': 'https://vidfast.pro/movie/{imdb}',
+    'vidsrc': 'https://vidsrc.to/embed/movie/{imdb}',
+}
+
+
+# ============= SYNTHETIC DATA =============
+
+def random_token(rng, length=15):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(length))
+
+
+def make_item(rng, index, people):
+    """One catalog item; about a third are series with 6-24 episodes"""
+    imdb = f'tt{10000000 + index}'
+    tmdb = 100000 + index
+    title = ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 3)))
+    item = {
+        'id': imdb,
+        'title': f'{title} {index}',
+        'year': str(rng.randint(1970, 2025)),
+        'image': f'https://i.ibb.co/{random_token(rng, 8)}/{imdb}.jpg',
+        'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(12, 40))),
+        'genres': rng.sample(GENRES, rng.randint(1, 3)),
+        'cast': rng.sample(people, 3),
+        'director': ', '.join(rng.sample(people, rng.randint(1, 2))),
+        'rating': f'{rng.uniform(4, 9):.1f}',
+        'industry': rng.choice(INDUSTRIES),
+    }
+    if rng.random() < 0.33:
+        season = rng.randint(1, 5)
+        item['title'] += f' (Season {season})'
+        item['type'] = 'series'
+        item['duration'] = f'{rng.randint(20, 60)}m'
+        item['episodes'] = [{
+            'episode_number': episode,
+            'title': f'Episode {episode}',
+            'streaming_links': {name: url.format(tmdb=tmdb, imdb=imdb, season=season, episode=episode)
+                                for name, url in STREAMING_LINKS.items()},
+            'download_links': {'1080p': f'https://hubcloud.fyi/drive/{random_token(rng)}'},
+        } for episode in range(1, rng.randint(6, 24) + 1)]
+    else:
+        item['type'] = 'movie'
+        item['duration'] = f'{rng.randint(1, 3)}h {rng.randint(0, 59)}m'
+        item['urls'] = {name: url.format(tmdb=tmdb, imdb=imdb) for name, url in MOVIE_LINKS.items()}
+        item['download_links'] = {'1080p': f'https://hubcloud.fyi/drive/{random_token(rng)}'}
+    return item
+
+
+def write_catalog(json_dir, size, seed):
+    """Write `size` synthetic titles as catalog files; returns the title ids"""
+    rng = random.Random(seed)
+    people = [f'{first} {last}' for first in FIRST_NAMES for last in LAST_NAMES]
+    ids = []
+    for start in range(0, size, FILE_SIZE):
+        items = [make_item(rng, index, people) for index in range(start, min(start + FILE_SIZE, size))]
+        ids.extend(item['id'] for item in items)
+        with open(os.path.join(json_dir, f'catalog-{start // FILE_SIZE:03d}.json'), 'w',
+                  encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+    return ids
+
+
+# ============= TIMING =============
+
+def summarize(samples):
+    """Timing stats in milliseconds for a list of durations in seconds"""
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 4),
+        'p50_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'min_ms': round(ordered[0] * 1000, 4),
+    }
+
+
+def measure(fn, repeat, warmup=3, setup=None):
+    """Time fn() repeat times after warmup calls; setup() runs untimed before each call"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f'{response.request.path}: HTTP {response.status_code} {response.data[:200]!r}')
+    return response
+
+
+# ============= WORKER =============
+
+def run_size(work_dir, size, users, repeat, seed):
+    """Benchmark one catalog size in work_dir; runs inside the worker subprocess"""
+    json_dir = os.path.join(work_dir, 'jsons')
+    os.mkdir(json_dir)
+    ids = write_catalog(json_dir, size, seed)
+
+    # app reads these at import time
+    os.environ['DATABASE_PATH'] = os.path.join(work_dir, 'streaming.db')
+    os.environ['JSON_DATA_PATH'] = json_dir
+    os.environ.setdefault('VIEW_FLUSH_INTERVAL_MS', '0')
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+
+    rng = random.Random(seed)
+    results = {}
+    backend.init_database()
+
+    started = time.perf_counter()
+    backend.sync_content_from_json()
+    results['sync_initial'] = summarize([time.perf_counter() - started])
+    results['sync_unchanged'] = measure(backend.sync_content_from_json, max(3, repeat // 20), warmup=1)
+    results['sync_forced'] = measure(lambda: backend.sync_content_from_json(force=True),
+                                     3 if size <= 10000 else 1, warmup=0)
+
+    # Parsing without the single SQLite writer, so worker scaling shows on its own
+    jobs = [(os.path.join(json_dir, name), None) for name in sorted(os.listdir(json_dir))]
+    for workers in PARSE_WORKERS:
+        results[f'parse_files_{workers}w'] = measure(
+            lambda: sum(1 for _ in backend.iter_parsed_files(jobs, workers)),
+            3 if size <= 10000 else 1, warmup=0)
+
+    # parse_json_field on stored genres/cast values, 1000 calls per sample
+    reader = backend.connect_db(readonly=True)
+    fields = [value for row in reader.execute('SELECT genres, "cast" FROM content LIMIT 1000')
+              for value in row]
+    reader.close()
+
+    def parse_fields():
+        for value in fields[:1000]:
+            backend.parse_json_field(value, [])
+    results['parse_json_field_x1000'] = measure(parse_fields, repeat)
+
+    client = backend.app.test_client()
+    tokens = []
+    user_ids = []
+    for n in range(users):
+        email = f'bench{n}@example.com'
+        check(client.post('/api/auth/signup', json={'email': email, 'username': f'bench{n}',
+                                                    'pin': '1234'}), 201)
+        login = check(client.post('/api/auth/login', json={'email': email, 'pin': '1234'})).get_json()
+        tokens.append({'Authorization': f"Bearer {login['token']}"})
+        user_ids.append(login['user']['id'])
+    # Watch histories of 5-30 titles, skewed towards a popular head
+    head = ids[:max(10, size // 50)]
+    for headers in tokens:
+        for _ in range(rng.randint(5, 30)):
+            content_id = rng.choice(head) if rng.random() < 0.5 else rng.choice(ids)
+            check(client.post('/api/user/track-view', json={'contentId': content_id}, headers=headers))
+
+    results['track_view'] = measure(
+        lambda: check(client.post('/api/user/track-view', json={'contentId': rng.choice(ids)},
+                                  headers=rng.choice(tokens))), repeat)
+
+    results['detail_cached'] = measure(
+        lambda: check(client.get(f'/api/content/detail/{rng.choice(head)}')), repeat)
+    detail_id = []
+    results['detail_uncached'] = measure(
+        lambda: check(client.get(f'/api/content/detail/{detail_id[-1]}')), repeat,
+        setup=lambda: (detail_id.append(rng.choice(ids)),
+                       backend.content_cache.invalidate([detail_id[-1]])))
+
+    results['search'] = measure(
+        lambda: check(client.get(f'/api/content/search?q={rng.choice(WORDS)}&limit=20')), repeat)
+    results['search_prefix'] = measure(
+        lambda: check(client.get(f'/api/content/search?q={rng.choice(WORDS)[:3]}&limit=20')), repeat)
+
+    user = []
+    results['recommendations_uncached'] = measure(
+        lambda: check(client.get('/api/user/recommendations', headers=tokens[user[-1]])), repeat,
+        setup=lambda: (user.append(rng.randrange(users)),
+                       backend.recommendation_cache.invalidate(user_ids[user[-1]])))
+    results['recommendations_cached'] = measure(
+        lambda: check(client.get('/api/user/recommendations', headers=rng.choice(tokens))), repeat)
+
+    results['trending'] = measure(
+        lambda: check(client.get('/api/content/trending?limit=20')), repeat)
+
+    backend.view_buffer.stop()
+    return results
+
+
+# ============= REPORT =============
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report, threshold):
+    """Print p50 changes against a baseline report; returns the regressions"""
+    regressions = []
+    print(f"\n{'size':>7}  {'benchmark':<26} {'base p50':>10} {'new p50':>10} {'change':>8}")
+    for size, results in report['results'].items():
+        base_results = baseline.get('results', {}).get(size, {})
+        for name, stats in results.items():
+            base = base_results.get(name)
+            if not base or not base['p50_ms']:
+                continue
+            change = stats['p50_ms'] / base['p50_ms'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((size, name, change))
+            print(f"{size:>7}  {name:<26} {base['p50_ms']:>10.3f} {stats['p50_ms']:>10.3f} "
+                  f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend hot paths on synthetic catalogs')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma-separated catalog sizes (titles)')
+    parser.add_argument('--users', type=int, default=50, help='synthetic users with watch histories')
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='bench-report.json', help='JSON report path')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed p50 slowdown before a benchmark counts as a regression')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        work_dir = tempfile.mkdtemp(prefix=f'bench-{args.worker}-')
+        try:
+            results = run_size(work_dir, args.worker, args.users, args.repeat, args.seed)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        with open(args.worker_out, 'w') as f:
+            json.dump(results, f)
+        return
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'users': args.users,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': {},
+    }
+    for size in [int(size) for size in args.sizes.split(',') if size]:
+        print(f"⏱️  Benchmarking {size} titles...")
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as out:
+            out_path = out.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(size),
+                            '--worker-out', out_path, '--users', str(args.users),
+                            '--repeat', str(args.repeat), '--seed', str(args.seed)],
+                           check=True, stdout=subprocess.DEVNULL)
+            with open(out_path) as f:
+                results = json.load(f)
+        finally:
+            os.unlink(out_path)
+        report['results'][str(size)] = results
+        for name, stats in results.items():
+            print(f"   {name:<26} p50 {stats['p50_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms")
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) slower than the baseline by more than "
+                  f"{args.threshold:.0%}")
+            sys.exit(1)
+        print('✅ No regressions')
+
+
+if __name__ == '__main__':
+    main()
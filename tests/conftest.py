@@ -0,0 +1,39 @@
+# Shared pytest fixtures. backend/app.py is imported once against a
+# throwaway database; the `backend` fixture then points it at a fresh
+# database and catalog folder per test, so the real streaming.db and
+# jsons folder are never touched.
+import importlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, 'backend')
+
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'streaming.db'))
+os.environ.setdefault('JSON_DATA_PATH', tempfile.mkdtemp())
+os.environ.setdefault('VIEW_QUARANTINE_PATH', os.path.join(tempfile.mkdtemp(), 'view_quarantine.jsonl'))
+# Views are written inline so tests can read them back straight away
+os.environ.setdefault('VIEW_FLUSH_INTERVAL_MS', '0')
+
+
+def reset_connections(app):
+    app.db_writer.stop()
+    app.db_pool.close()
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """The app module on an empty database with an empty catalog folder"""
+    app = importlib.import_module('app')
+    reset_connections(app)
+    json_dir = tmp_path / 'jsons'
+    json_dir.mkdir()
+    monkeypatch.setattr(app, 'DATABASE_PATH', str(tmp_path / 'streaming.db'))
+    monkeypatch.setattr(app, 'JSON_DATA_PATH', str(json_dir))
+    app.init_database()
+    yield app
+    reset_connections(app)
@@ -0,0 +1,48 @@
+# Helpers shared by the backend tests: catalog files, sync runs and raw
+# database reads against the database the `backend` fixture set up.
+import json
+import os
+import sqlite3
+
+
+def write_catalog(backend, name, items):
+    """Write a catalog file, moving its mtime on so the next sync re-reads it"""
+    path = os.path.join(backend.JSON_DATA_PATH, name)
+    previous = os.stat(path).st_mtime if os.path.exists(path) else 0
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f)
+    mtime = max(os.stat(path).st_mtime, previous + 1)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def run_sync(backend, force=False):
+    """write_catalog_sync on its own connection; (stats, changed_ids, removed)"""
+    db = backend.connect_db()
+    try:
+        return backend.write_catalog_sync(db, force)
+    finally:
+        db.close()
+
+
+def query(backend, sql, params=()):
+    db = sqlite3.connect(backend.DATABASE_PATH)
+    try:
+        return db.execute(sql, params).fetchall()
+    finally:
+        db.close()
+
+
+def title(content_id, name, **fields):
+    """Minimal catalog item"""
+    item = {'id': content_id, 'title': name, 'year': '2020', 'genres': ['Drama'],
+            'cast': ['Ann Lee'], 'director': 'Sam Roe', 'type': 'movie'}
+    item.update(fields)
+    return item
+
+
+def login(client, email='viewer@example.com', username='viewer', pin='1234'):
+    """Sign up and log in; returns request headers carrying the token"""
+    client.post('/api/auth/signup', json={'email': email, 'username': username, 'pin': pin})
+    token = client.post('/api/auth/login', json={'email': email, 'pin': pin}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,456 @@
+# End-to-end load test for backend/server.py. Starts uvicorn on a temporary
+# SQLite database, drives it with a homepage-heavy traffic mix from asyncio
+# virtual users at increasing concurrency, and reports requests/sec plus
+# per-route latency percentiles and histograms. Not collected by pytest:
+#
+#   python tests/load_backend.py                              # ramp 1,8,32,64
+#   python tests/load_backend.py --ramp 16,64 --stage-seconds 30 --server-mode asgi
+#   python tests/load_backend.py --titles 10000 --record trace.jsonl
+#   python tests/load_backend.py --replay trace.jsonl --speed 2
+#
+# The catalog is backend/jsons unless --titles asks for a synthetic one (see
+# bench_backend.py). SQLite contention shows up as 503s (read pool timeouts)
+# and as "database is locked" lines in the server log, both counted in the
+# report. The HTTP client is a small keep-alive HTTP/1.1 implementation on
+# asyncio streams so the harness needs nothing beyond the backend's own
+# requirements.
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+from bench_backend import BACKEND_DIR, write_catalog
+
+DEFAULT_RAMP = (1, 8, 32, 64)
+# Histogram bucket upper bounds in milliseconds (the last bucket is open)
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+LOCK_MARKERS = ('database is locked', 'SQLITE_BUSY')
+SERVER_START_TIMEOUT = 120
+
+
+# ============= HTTP CLIENT =============
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; reconnects after errors"""
+
+    def __init__(self, host, port, compressed=True):
+        self.host = host
+        self.port = port
+        self.compressed = compressed
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """(status, body bytes) for one request"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 f'Content-Length: {len(payload)}']
+        if self.compressed:
+            lines.append('Accept-Encoding: gzip')
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+            return await self._read_response()
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('server closed the connection')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(chunks)
+        else:
+            data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+# ============= METRICS =============
+
+class RouteStats:
+    """Latencies and status counts for one route label"""
+
+    def __init__(self):
+        self.samples = []
+        self.statuses = {}
+        self.errors = 0
+
+    def add(self, seconds, status):
+        self.samples.append(seconds * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        histogram = [0] * (len(HISTOGRAM_MS) + 1)
+        for value in ordered:
+            histogram[bisect.bisect_left(HISTOGRAM_MS, value)] += 1
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3) if ordered else None
+
+        return {
+            'count': len(ordered),
+            'errors': self.errors,
+            'mean_ms': round(statistics.fmean(ordered), 3) if ordered else None,
+            'p50_ms': percentile(0.5),
+            'p90_ms': percentile(0.9),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(ordered[-1], 3) if ordered else None,
+            'status': {str(status): count for status, count in sorted(self.statuses.items())},
+            'histogram_ms': {(f'<={bound}' if i < len(HISTOGRAM_MS) else f'>{HISTOGRAM_MS[-1]}'): count
+                             for i, (bound, count) in
+                             enumerate(zip(HISTOGRAM_MS + (None,), histogram)) if count},
+        }
+
+
+class Recorder:
+    """Times requests per route; optionally appends them to a trace whose
+    offsets count from trace_origin (shared by all stages of a run)
+    """
+
+    def __init__(self, trace=None, trace_origin=None):
+        self.routes = {}
+        self.trace = trace
+        self.trace_origin = trace_origin
+
+    async def send(self, conn, label, method, path, body=None, user=None, users=None):
+        headers = users[user]['headers'] if user is not None else None
+        if self.trace is not None:
+            self.trace.append({'t': round(time.perf_counter() - self.trace_origin, 4), 'route': label,
+                               'method': method, 'path': path, 'body': body, 'user': user})
+        stats = self.routes.setdefault(label, RouteStats())
+        started = time.perf_counter()
+        try:
+            status, data = await conn.request(method, path, body, headers)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            stats.errors += 1
+            return None, None
+        stats.add(time.perf_counter() - started, status)
+        return status, data
+
+    def summary(self, elapsed):
+        total = sum(len(stats.samples) for stats in self.routes.values())
+        errors = sum(stats.errors for stats in self.routes.values())
+        statuses = {}
+        for stats in self.routes.values():
+            for status, count in stats.statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+        return {
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'rps': round(total / elapsed, 1) if elapsed else 0,
+            'connection_errors': errors,
+            'pool_timeouts_503': statuses.get(503, 0),
+            'server_errors_5xx': sum(count for status, count in statuses.items() if status >= 500),
+            'routes': {label: stats.summary() for label, stats in sorted(self.routes.items())},
+        }
+
+
+# ============= TRAFFIC MIX =============
+
+class Catalog:
+    """Ids, categories and search terms taken from /api/catalog/bundle"""
+
+    def __init__(self, bundle):
+        columns = bundle['columns']
+        rows = [dict(zip(columns, item)) for item in bundle['items']]
+        self.ids = [row['id'] for row in rows]
+        self.categories = sorted({row[key] for row in rows for key in ('industry', 'type')
+                                  if row[key]})
+        self.words = sorted({word.lower() for row in rows for word in (row['title'] or '').split()
+                             if len(word) >= 4 and word.isalpha()}) or ['the']
+
+
+async def homepage(rec, conn, catalog, rng, users):
+    await rec.send(conn, 'hero/carousel', 'GET', '/api/hero/carousel')
+    await rec.send(conn, 'weekly/today', 'GET', '/api/content/weekly/today')
+    await rec.send(conn, 'trending', 'GET', '/api/content/trending?limit=20')
+
+
+async def category_rail(rec, conn, catalog, rng, users):
+    category = urllib.parse.quote(rng.choice(catalog.categories))
+    await rec.send(conn, 'by-category', 'GET', f'/api/content/by-category/{category}?limit=20')
+
+
+async def weekly_day(rec, conn, catalog, rng, users):
+    await rec.send(conn, 'weekly/<day>', 'GET', f'/api/content/weekly/{rng.choice(WEEKDAYS)}')
+
+
+async def detail(rec, conn, catalog, rng, users):
+    await rec.send(conn, 'detail', 'GET', f'/api/content/detail/{rng.choice(catalog.ids)}')
+
+
+async def search_as_you_type(rec, conn, catalog, rng, users):
+    """Suggest on every keystroke from the third character, then one search"""
+    word = rng.choice(catalog.words)
+    for end in range(3, len(word) + 1):
+        await rec.send(conn, 'suggest', 'GET', f'/api/content/suggest?q={urllib.parse.quote(word[:end])}')
+    await rec.send(conn, 'search', 'GET', f'/api/content/search?q={urllib.parse.quote(word)}&limit=20')
+
+
+async def track_view(rec, conn, catalog, rng, users):
+    await rec.send(conn, 'track-view', 'POST', '/api/user/track-view',
+                   {'contentId': rng.choice(catalog.ids), 'watchTime': rng.randint(1, 3600),
+                    'progress': rng.randint(0, 100)}, user=rng.randrange(len(users)), users=users)
+
+
+async def watchlist(rec, conn, catalog, rng, users):
+    user = rng.randrange(len(users))
+    content_id = rng.choice(catalog.ids)
+    await rec.send(conn, 'watchlist', 'GET', '/api/user/watchlist', user=user, users=users)
+    action = 'add' if rng.random() < 0.6 else 'remove'
+    await rec.send(conn, f'watchlist/{action}', 'POST', f'/api/user/watchlist/{action}',
+                   {'contentId': content_id}, user=user, users=users)
+
+
+# (weight, action): most sessions are anonymous homepage and rail loads
+TRAFFIC_MIX = (
+    (30, homepage),
+    (25, category_rail),
+    (5, weekly_day),
+    (15, detail),
+    (10, search_as_you_type),
+    (10, track_view),
+    (5, watchlist),
+)
+
+
+# ============= SERVER =============
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(work_dir, json_dir, port, server_mode, workers):
+    """Launch uvicorn on a fresh database; returns (process, log path)"""
+    env = dict(os.environ, DATABASE_PATH=os.path.join(work_dir, 'streaming.db'),
+               JSON_DATA_PATH=json_dir, SERVER_MODE=server_mode)
+    log_path = os.path.join(work_dir, 'server.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1',
+             '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, errors='replace') as f:
+                raise RuntimeError(f'server exited during startup:\n{f.read()[-2000:]}')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1) as response:
+                if response.status == 200:
+                    return process, log_path
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f'server did not become healthy within {SERVER_START_TIMEOUT}s')
+
+
+def count_lock_errors(log_path):
+    with open(log_path, errors='replace') as f:
+        return sum(1 for line in f if any(marker in line for marker in LOCK_MARKERS))
+
+
+async def create_users(host, port, count):
+    conn = Connection(host, port, compressed=False)
+    users = []
+    for n in range(count):
+        email = f'load{n}@example.com'
+        await conn.request('POST', '/api/auth/signup', {'email': email, 'username': f'load{n}',
+                                                        'pin': '1234'})
+        status, data = await conn.request('POST', '/api/auth/login', {'email': email, 'pin': '1234'})
+        if status != 200:
+            raise RuntimeError(f'login failed for {email}: HTTP {status}')
+        users.append({'headers': {'Authorization': f"Bearer {json.loads(data)['token']}"}})
+    conn.close()
+    return users
+
+
+# ============= RUNNERS =============
+
+async def run_stage(host, port, concurrency, seconds, catalog, users, seed, trace, trace_origin):
+    """Closed-loop stage: `concurrency` virtual users back to back for `seconds`"""
+    rec = Recorder(trace, trace_origin)
+    weights = [weight for weight, _ in TRAFFIC_MIX]
+    actions = [action for _, action in TRAFFIC_MIX]
+    deadline = time.perf_counter() + seconds
+
+    async def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = Connection(host, port)
+        while time.perf_counter() < deadline:
+            action = rng.choices(actions, weights)[0]
+            await action(rec, conn, catalog, rng, users)
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(index) for index in range(concurrency)))
+    summary = rec.summary(time.perf_counter() - started)
+    summary['concurrency'] = concurrency
+    return summary
+
+
+async def replay(host, port, trace, speed, connections, users):
+    """Open-loop replay of a recorded trace at its original pacing divided by speed"""
+    rec = Recorder()
+    queue = asyncio.Queue()
+    for entry in trace:
+        queue.put_nowait(entry)
+    started = time.perf_counter()
+
+    async def sender():
+        conn = Connection(host, port)
+        while not queue.empty():
+            entry = queue.get_nowait()
+            delay = entry['t'] / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await rec.send(conn, entry['route'], entry['method'], entry['path'], entry['body'],
+                           user=entry['user'], users=users)
+        conn.close()
+
+    await asyncio.gather(*(sender() for _ in range(connections)))
+    summary = rec.summary(time.perf_counter() - started)
+    summary['concurrency'] = connections
+    return summary
+
+
+def print_stage(summary):
+    print(f"\n👥 concurrency {summary['concurrency']}: {summary['requests']} requests in "
+          f"{summary['duration_s']}s = {summary['rps']} req/s, "
+          f"{summary['pool_timeouts_503']} pool timeouts, {summary['connection_errors']} connection errors")
+    print(f"   {'route':<18} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}  status")
+    for label, stats in summary['routes'].items():
+        print(f"   {label:<18} {stats['count']:>7} {stats['p50_ms'] or 0:>9.2f} {stats['p90_ms'] or 0:>9.2f} "
+              f"{stats['p99_ms'] or 0:>9.2f} {stats['max_ms'] or 0:>9.2f}  {stats['status']}")
+
+
+async def main_async(args):
+    work_dir = tempfile.mkdtemp(prefix='load-')
+    trace_entries = None
+    if args.replay:
+        with open(args.replay) as f:
+            trace_entries = [json.loads(line) for line in f if line.strip()]
+    try:
+        json_dir = os.path.join(BACKEND_DIR, 'jsons')
+        if args.titles:
+            json_dir = os.path.join(work_dir, 'jsons')
+            os.mkdir(json_dir)
+            write_catalog(json_dir, args.titles, args.seed)
+
+        port = free_port()
+        print(f"🚀 Starting server ({args.server_mode}, {args.workers} worker(s)) on port {port}...")
+        process, log_path = start_server(work_dir, json_dir, port, args.server_mode, args.workers)
+        host = '127.0.0.1'
+        try:
+            user_count = args.users
+            if trace_entries:
+                user_count = max([args.users] + [entry['user'] + 1 for entry in trace_entries
+                                                 if entry['user'] is not None])
+            users = await create_users(host, port, user_count)
+
+            report = {'meta': {'server_mode': args.server_mode, 'workers': args.workers,
+                               'titles': args.titles or 'backend/jsons', 'users': user_count,
+                               'seed': args.seed}, 'stages': []}
+            if trace_entries:
+                report['meta']['replay'] = args.replay
+                summary = await replay(host, port, trace_entries, args.speed, args.connections, users)
+                report['stages'].append(summary)
+                print_stage(summary)
+            else:
+                conn = Connection(host, port, compressed=False)
+                _, data = await conn.request('GET', '/api/catalog/bundle')
+                conn.close()
+                catalog = Catalog(json.loads(data))
+                trace = [] if args.record else None
+                trace_origin = time.perf_counter()
+                for concurrency in args.ramp:
+                    summary = await run_stage(host, port, concurrency, args.stage_seconds, catalog,
+                                              users, args.seed, trace, trace_origin)
+                    report['stages'].append(summary)
+                    print_stage(summary)
+                if args.record:
+                    with open(args.record, 'w') as f:
+                        for entry in trace:
+                            f.write(json.dumps(entry) + '\n')
+                    print(f"\n📼 Recorded {len(trace)} requests to {args.record}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        report['sqlite_lock_errors'] = count_lock_errors(log_path)
+        print(f"\n🔒 SQLite lock errors in server log: {report['sqlite_lock_errors']}")
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Report written to {args.out}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test backend/server.py with a homepage traffic mix')
+    parser.add_argument('--ramp', default=','.join(str(c) for c in DEFAULT_RAMP),
+                        help='comma-separated concurrency per stage')
+    parser.add_argument('--stage-seconds', type=float, default=10)
+    parser.add_argument('--server-mode', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--titles', type=int, help='synthetic catalog size instead of backend/jsons')
+    parser.add_argument('--users', type=int, default=20, help='accounts used for authenticated calls')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='JSON report path')
+    parser.add_argument('--record', help='write every request sent to this JSONL trace')
+    parser.add_argument('--replay', help='replay a JSONL trace instead of the generated mix')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed-up factor')
+    parser.add_argument('--connections', type=int, default=32, help='connections used for replay')
+    args = parser.parse_args()
+    args.ramp = [int(c) for c in args.ramp.split(',') if c]
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
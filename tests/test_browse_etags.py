@@ -0,0 +1,47 @@
+import pytest
+
+from tests.helpers import login, run_sync, title, write_catalog
+
+BROWSE_URLS = ('/api/content/by-genre/Drama', '/api/content/by-person/Ann Lee')
+
+
+@pytest.fixture
+def client(backend):
+    write_catalog(backend, 'a.json', [title('tt1', 'One'), title('tt2', 'Two'), title('tt3', 'Three')])
+    run_sync(backend)
+    return backend.app.test_client()
+
+
+def ids(response):
+    return [card['id'] for card in response.get_json()]
+
+
+@pytest.mark.parametrize('url', BROWSE_URLS)
+def test_unchanged_page_is_not_modified(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+@pytest.mark.parametrize('url', BROWSE_URLS)
+def test_view_flush_changes_etag_with_body(client, url):
+    headers = login(client)
+    client.post('/api/user/track-view', json={'contentId': 'tt2'}, headers=headers)
+    first = client.get(url)
+    assert ids(first)[0] == 'tt2'
+    for _ in range(2):
+        client.post('/api/user/track-view', json={'contentId': 'tt3'}, headers=headers)
+
+    after = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert ids(after)[0] == 'tt3'
+
+
+@pytest.mark.parametrize('url', BROWSE_URLS)
+def test_pages_get_distinct_etags(client, url):
+    first = client.get(url + '?limit=1')
+    second = client.get(url + '?limit=1&offset=1')
+    assert ids(first) != ids(second)
+    assert first.headers['ETag'] != second.headers['ETag']
@@ -0,0 +1,160 @@
+from tests.helpers import query, run_sync, title, write_catalog
+
+
+def content_titles(backend):
+    return dict(query(backend, 'SELECT id, title FROM content'))
+
+
+def providers(backend, content_id):
+    rows = query(backend, 'SELECT source_file FROM sync_items WHERE content_id = ? ORDER BY source_file',
+                 (content_id,))
+    return [row[0] for row in rows]
+
+
+def test_one_edit_writes_one_row(backend):
+    items = [title('tt1', 'One'), title('tt2', 'Two'), title('tt3', 'Three')]
+    write_catalog(backend, 'a.json', items)
+    stats, changed, removed = run_sync(backend)
+    assert stats['synced'] == 3
+
+    items[1] = title('tt2', 'Two, edited')
+    write_catalog(backend, 'a.json', items)
+    stats, changed, removed = run_sync(backend)
+
+    assert stats['synced'] == 1
+    assert changed == {'tt2'}
+    assert removed == []
+    assert content_titles(backend)['tt2'] == 'Two, edited'
+
+
+def test_duplicate_within_file_keeps_last_copy_and_is_not_rewritten(backend):
+    items = [title('tt1', 'First copy'), title('tt2', 'Two'), title('tt1', 'Last copy')]
+    write_catalog(backend, 'a.json', items)
+    run_sync(backend)
+    assert content_titles(backend)['tt1'] == 'Last copy'
+    assert query(backend, "SELECT name FROM content_cast WHERE content_id = 'tt1'") == [('Ann Lee',)]
+
+    items[1] = title('tt2', 'Two, edited')
+    write_catalog(backend, 'a.json', items)
+    stats, changed, _ = run_sync(backend)
+
+    assert stats['synced'] == 1
+    assert changed == {'tt2'}
+    assert content_titles(backend)['tt1'] == 'Last copy'
+
+
+def test_later_file_wins_for_duplicate_providers(backend):
+    write_catalog(backend, 'a.json', [title('tt1', 'From a')])
+    write_catalog(backend, 'b.json', [title('tt1', 'From b', genres=['Comedy'])])
+    run_sync(backend)
+    assert content_titles(backend)['tt1'] == 'From b'
+    assert providers(backend, 'tt1') == ['a.json', 'b.json']
+
+    # Editing the earlier file leaves the winning row alone
+    write_catalog(backend, 'a.json', [title('tt1', 'From a, edited')])
+    stats, changed, _ = run_sync(backend)
+    assert changed == set()
+    assert content_titles(backend)['tt1'] == 'From b'
+    assert query(backend, "SELECT genre FROM content_genres WHERE content_id = 'tt1'") == [('Comedy',)]
+
+
+def test_dropping_duplicate_provider_falls_back_to_remaining_file(backend):
+    write_catalog(backend, 'a.json', [title('tt1', 'From a')])
+    write_catalog(backend, 'b.json', [title('tt1', 'From b', genres=['Comedy']), title('tt2', 'Two')])
+    run_sync(backend)
+
+    write_catalog(backend, 'b.json', [title('tt2', 'Two')])
+    stats, changed, removed = run_sync(backend)
+
+    assert removed == []
+    assert changed == {'tt1'}
+    assert content_titles(backend)['tt1'] == 'From a'
+    assert providers(backend, 'tt1') == ['a.json']
+    assert query(backend, "SELECT genre FROM content_genres WHERE content_id = 'tt1'") == [('Drama',)]
+
+    write_catalog(backend, 'a.json', [])
+    stats, changed, removed = run_sync(backend)
+    assert removed == ['tt1']
+    assert 'tt1' not in content_titles(backend)
+    assert providers(backend, 'tt1') == []
+
+
+def test_incremental_sync_matches_full_sync(backend):
+    write_catalog(backend, 'a.json', [title('tt1', 'A1'), title('tt2', 'A2'), title('tt1', 'A1 again')])
+    write_catalog(backend, 'b.json', [title('tt2', 'B2', cast=['Bo Park']), title('tt3', 'B3')])
+    run_sync(backend)
+    write_catalog(backend, 'b.json', [title('tt3', 'B3, edited')])
+    write_catalog(backend, 'c.json', [title('tt1', 'C1')])
+    run_sync(backend)
+
+    def snapshot():
+        return (query(backend, 'SELECT id, title, genres, "cast" FROM content ORDER BY id'),
+                query(backend, 'SELECT * FROM content_cast ORDER BY content_id, name'),
+                query(backend, 'SELECT * FROM sync_items ORDER BY content_id, source_file'))
+
+    incremental = snapshot()
+    run_sync(backend, force=True)
+    assert snapshot() == incremental
+
+
+def bundle_delta(backend, since):
+    response = backend.app.test_client().get(f'/api/catalog/bundle?since={since}')
+    assert response.status_code == 200
+    body = response.get_json()
+    return body['version'], [row[0] for row in body['changed']], body['removed']
+
+
+def test_bundle_delta_lists_only_modified_titles(backend):
+    items = [title('tt1', 'One'), title('tt2', 'Two'), title('tt2', 'Two')]
+    write_catalog(backend, 'a.json', items)
+    write_catalog(backend, 'b.json', [title('tt3', 'Three')])
+    backend.sync_content_from_json()
+    version, _, _ = bundle_delta(backend, 0)
+
+    # A forced sync rewrites every row without changing any of them
+    backend.sync_content_from_json(force=True)
+    version, changed, removed = bundle_delta(backend, version)
+    assert (changed, removed) == ([], [])
+
+    items[0] = title('tt1', 'One, edited')
+    write_catalog(backend, 'a.json', items)
+    backend.sync_content_from_json()
+    version, changed, removed = bundle_delta(backend, version)
+    assert (changed, removed) == (['tt1'], [])
+
+
+def test_parallel_parsing_matches_serial(backend, monkeypatch):
+    for n in range(3):
+        write_catalog(backend, f'part{n}.json', [
+            title(f'tt{n}{i}', f'Title {n}.{i}', cast=[f'Actor {i}', 'Ann Lee'],
+                  type='series', episodes=[{'season': 1, 'episode': 1, 'url': f'https://example.com/{n}/{i}'}])
+            for i in range(40)])
+    paths = sorted(backend.glob.glob(f'{backend.JSON_DATA_PATH}/*.json'))
+    jobs = [(path, None) for path in paths]
+
+    def by_file(messages):
+        parsed = {}
+        for index, kind, payload in messages:
+            parsed.setdefault(index, []).append((kind, payload))
+        return parsed
+
+    serial = by_file(backend.iter_parsed_files(jobs, workers=1, batch_size=16))
+    parallel = by_file(backend.iter_parsed_files(jobs, workers=2, batch_size=16))
+    assert parallel == serial
+
+    # The same through a forced sync: the pool runs even for small files
+    monkeypatch.setattr(backend, 'SYNC_WORKERS', 2)
+    monkeypatch.setattr(backend, 'SYNC_PARALLEL_MIN_BYTES', 0)
+    stats, _, _ = run_sync(backend, force=True)
+    assert stats['workers'] == 2
+
+    def snapshot():
+        return (query(backend, 'SELECT id, title, genres, "cast", type FROM content ORDER BY id'),
+                query(backend, 'SELECT * FROM content_cast ORDER BY content_id, name'),
+                query(backend, 'SELECT * FROM content_episodes ORDER BY content_id'))
+
+    in_parallel = snapshot()
+    monkeypatch.setattr(backend, 'SYNC_WORKERS', 1)
+    stats, _, _ = run_sync(backend, force=True)
+    assert stats['workers'] == 1
+    assert snapshot() == in_parallel
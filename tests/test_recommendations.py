@@ -0,0 +1,48 @@
+import json
+
+from tests.helpers import query, run_sync, title, write_catalog
+
+
+def store_neighbors(backend, lists):
+    db = backend.connect_db()
+    try:
+        db.executemany('INSERT OR REPLACE INTO content_neighbors (content_id, neighbors) VALUES (?, ?)',
+                       [(content_id, json.dumps(pairs)) for content_id, pairs in lists.items()])
+        db.commit()
+    finally:
+        db.close()
+
+
+def stored_neighbors(backend):
+    return {content_id: json.loads(neighbors)
+            for content_id, neighbors in query(backend, 'SELECT content_id, neighbors FROM content_neighbors')}
+
+
+def test_removed_titles_are_pruned_from_neighbor_lists(backend):
+    items = [title('tt1', 'One'), title('tt2', 'Two'), title('tt3', 'Three')]
+    write_catalog(backend, 'a.json', items)
+    run_sync(backend)
+    store_neighbors(backend, {
+        'tt1': [['tt3', 0.9], ['tt2', 0.5]],
+        'tt2': [['tt1', 0.5]],
+        'tt3': [['tt1', 0.9]],
+    })
+
+    write_catalog(backend, 'a.json', items[:2])
+    _, _, removed = run_sync(backend)
+
+    assert removed == ['tt3']
+    assert stored_neighbors(backend) == {'tt1': [['tt2', 0.5]], 'tt2': [['tt1', 0.5]]}
+
+
+def test_neighbor_recommendations_skip_titles_missing_from_catalog(backend):
+    write_catalog(backend, 'a.json', [title('tt1', 'One'), title('tt2', 'Two'), title('tt3', 'Three')])
+    run_sync(backend)
+    # As left by a neighbour build that ran before tt9 was removed
+    store_neighbors(backend, {'tt1': [['tt9', 0.9], ['tt3', 0.7], ['tt2', 0.5]]})
+
+    db = backend.connect_db()
+    try:
+        assert backend.neighbor_recommendations(db.cursor(), ['tt1']) == ['tt3', 'tt2']
+    finally:
+        db.close()
@@ -0,0 +1,68 @@
+import pytest
+
+from tests.helpers import run_sync, title, write_catalog
+
+CATALOG = [
+    title('tt1', 'The Dark Knight', description='A vigilante in Gotham'),
+    title('tt2', 'Darkness Falls', description='A tooth fairy legend'),
+    title('tt3', 'Knight Rider', description='A talking car'),
+    title('tt4', '100% Love', description='Romance'),
+    title('tt5', "C'est la vie", description='A French comedy'),
+    title('tt6', 'Under_score', description='Snake case'),
+]
+
+
+@pytest.fixture(params=['fts', 'like'])
+def search(request, backend, monkeypatch):
+    """GET /api/content/search through FTS5 and through the LIKE fallback; returns matching ids"""
+    write_catalog(backend, 'a.json', CATALOG)
+    run_sync(backend)
+    monkeypatch.setitem(backend.fts_state, 'available', request.param == 'fts')
+    client = backend.app.test_client()
+
+    def get(q):
+        response = client.get('/api/content/search', query_string={'q': q})
+        assert response.status_code == 200
+        return sorted(card['id'] for card in response.get_json())
+
+    get.mode = request.param
+    return get
+
+
+def test_fts_match_query_quotes_terms():
+    import app
+
+    assert app.fts_match_query('Dark KNIGHT') == '"dark"* "knight"*'
+    # FTS5 operators and syntax characters are never passed through
+    assert app.fts_match_query('dark OR "knight" NEAR(x*') == '"dark"* "or"* "knight"* "near"* "x"*'
+    assert app.fts_match_query('"*^-:()') == ''
+
+
+def test_terms_and_prefixes(search):
+    assert search('dark') == ['tt1', 'tt2']
+    assert search('Dark Knight') == ['tt1']
+    if search.mode == 'fts':
+        # Every term is a prefix, in any order
+        assert search('dar') == ['tt1', 'tt2']
+        assert search('knight da') == ['tt1']
+
+
+def test_quotes_and_operators_do_not_break_search(search):
+    assert search("c'est") == ['tt5']
+    if search.mode == 'fts':
+        assert search('"dark') == ['tt1', 'tt2']
+        assert search('dark AND') == []
+        assert search('NOT knight') == []
+    else:
+        assert search('"dark') == []
+
+
+def test_special_characters_match_literally(search):
+    if search.mode == 'fts':
+        assert search('%') == []
+        assert search('100%') == ['tt4']
+    else:
+        # LIKE wildcards in the query are escaped
+        assert search('%') == ['tt4']
+        assert search('_') == ['tt6']
+        assert search('100%') == ['tt4']
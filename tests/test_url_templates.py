@@ -0,0 +1,89 @@
+import json
+
+from url_templates import encode_episode, expand_episode, split_url, template_ids
+
+from tests.helpers import run_sync, title, write_catalog
+
+
+class Registry:
+    """In-memory stand-in for TemplateRegistry"""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __call__(self, template):
+        return self.ids.setdefault(template, len(self.ids) + 1)
+
+    def templates(self):
+        return {template_id: template for template, template_id in self.ids.items()}
+
+
+def round_trip(episode):
+    registry = Registry()
+    # Stored as JSON text, as in content_episodes.data
+    stored = json.dumps(encode_episode(episode, registry))
+    return json.loads(stored), expand_episode(json.loads(stored), registry.templates())
+
+
+def test_split_url_round_trips():
+    for url in ('https://vidsrc.to/embed/tv/tt0903747/1/2',
+                'https://mappletv.uk/watch/tv/1396-1-2',
+                'https://example.com/{literal}/7?x={{8}}'):
+        split = split_url(url)
+        assert split is not None
+        template, params = split
+        assert template.format(*params) == url
+    assert split_url('https://example.com/watch') is None
+    assert split_url('https://example.com/h264/s01e02') is None
+    assert split_url('https://vidsrc.to/embed/tv/tt0903747/1/2')[1] == ['0903747', '1', '2']
+
+
+def test_links_of_any_type_survive_round_trip():
+    links = {
+        'template': 'https://vidsrc.to/embed/tv/tt0903747/1/2',
+        'plain': 'https://example.com/watch',
+        'list': [1, 2, 3],
+        'object': {'raw': 'nested'},
+        'number': 5,
+        'missing': None,
+    }
+    episode = {'title': 'Pilot', 'streaming_links': links, 'download_links': {'mirror': ['a', 'b']}}
+    encoded, expanded = round_trip(dict(episode))
+
+    assert isinstance(encoded['streaming_links']['template'], list)
+    assert template_ids(encoded) == {1}
+    assert expanded == episode
+
+
+def test_episodes_endpoint_returns_list_links_unchanged(backend):
+    episode = {'title': 'Pilot', 'episode_number': 1,
+               'streaming_links': {'Vidsrc': 'https://vidsrc.to/embed/tv/tt0903747/1/1',
+                                   'Mirrors': ['https://a.example/1', 'https://b.example/1']}}
+    write_catalog(backend, 'a.json', [title('tt0903747', 'Show (Season 1)', type='series',
+                                            episodes=[episode])])
+    run_sync(backend)
+
+    response = backend.app.test_client().get('/api/content/tt0903747/episodes')
+    assert response.status_code == 200
+    assert response.get_json() == [episode]
+
+
+def test_repeated_link_shapes_encode_like_single_links():
+    registry = Registry()
+    for season in (1, 2, 10):
+        for number in range(1, 13):
+            links = {
+                'Vidsrc': f'https://vidsrc.to/embed/tv/tt0903747/{season}/{number}',
+                'Mapple': f'https://mappletv.uk/watch/tv/1396-{season}-{number}',
+                # Literal digits that change between episodes
+                'Hd': f'https://example.com/h264/s{season:02}e{number:02}?c=FF{number}0',
+                'Braces': f'https://example.com/{{id}}/{number}',
+            }
+            encoded = encode_episode({'streaming_links': links}, registry)['streaming_links']
+
+            for name, url in links.items():
+                split = split_url(url)
+                expected = url if split is None else [registry(split[0])] + split[1]
+                assert encoded[name] == expected
+            assert expand_episode({'streaming_links': encoded}, registry.templates()) == {
+                'streaming_links': links}
@@ -0,0 +1,97 @@
+import json
+import time
+
+import pytest
+
+from view_buffer import RETRY_DELAY, ViewBuffer
+
+
+class FlakyWriter:
+    """flush_fn that fails while `down` is set or for batches watching a poisoned title"""
+
+    def __init__(self, poisoned=(), down=False):
+        self.poisoned = set(poisoned)
+        self.down = down
+        self.written = []
+
+    def __call__(self, batch):
+        if self.down or any(content_id in self.poisoned for _, content_id, _, _ in batch['watches']):
+            raise RuntimeError('write failed')
+        self.written.extend(content_id for _, content_id, _, _ in batch['watches'])
+
+
+@pytest.fixture
+def make_buffer(tmp_path):
+    buffers = []
+
+    def make(writer, **kwargs):
+        # A long interval keeps the flusher thread out of the way
+        buffer = ViewBuffer(writer, interval_ms=60000, quarantine_path=str(tmp_path / 'quarantine.jsonl'),
+                            **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.stopping = True
+        buffer.wakeup.set()
+
+
+def record(buffer, *content_ids):
+    for content_id in content_ids:
+        buffer.record(1, content_id, 60, 10, f'2026-01-01T00:00:0{len(buffer.events)}')
+
+
+def test_failed_flush_backs_off_and_keeps_order(make_buffer):
+    writer = FlakyWriter(down=True)
+    buffer = make_buffer(writer)
+    record(buffer, 'a', 'b')
+
+    assert buffer.flush() == 0
+    assert buffer.retry_at - time.monotonic() == pytest.approx(RETRY_DELAY, abs=0.1)
+    record(buffer, 'c')
+    # Still backing off
+    assert buffer.flush() == 0
+    assert buffer.flush(force=True) == 0
+    assert buffer.retry_at - time.monotonic() == pytest.approx(2 * RETRY_DELAY, abs=0.1)
+
+    writer.down = False
+    assert buffer.flush(force=True) == 3
+    assert writer.written == ['a', 'b', 'c']
+    assert buffer.retry_at == 0.0
+
+
+def test_only_events_failing_on_their_own_are_quarantined_and_replayed(make_buffer, tmp_path):
+    writer = FlakyWriter(poisoned={'bad'})
+    buffer = make_buffer(writer, max_failures=2)
+    record(buffer, 'a', 'bad', 'b')
+
+    assert buffer.flush() == 0
+    assert buffer.flush(force=True) == 2
+    assert writer.written == ['a', 'b']
+    assert buffer.stats()['eventsQuarantined'] == 1
+    with open(tmp_path / 'quarantine.jsonl') as f:
+        assert [json.loads(line)[1] for line in f] == ['bad']
+
+    # Once the cause is fixed, the next start writes the quarantined view
+    writer = FlakyWriter()
+    restarted = make_buffer(writer)
+    assert restarted.replay_quarantined() == 1
+    assert restarted.flush() == 1
+    assert writer.written == ['bad']
+    assert not (tmp_path / 'quarantine.jsonl').exists()
+
+
+def test_outage_quarantines_nothing(make_buffer, tmp_path):
+    writer = FlakyWriter(down=True)
+    buffer = make_buffer(writer, max_failures=2)
+    record(buffer, 'a', 'b')
+
+    for _ in range(4):
+        assert buffer.flush(force=True) == 0
+
+    assert buffer.stats()['eventsQuarantined'] == 0
+    assert not (tmp_path / 'quarantine.jsonl').exists()
+    writer.down = False
+    assert buffer.flush(force=True) == 2
+    assert writer.written == ['a', 'b']